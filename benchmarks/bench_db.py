@@ -0,0 +1,142 @@
+"""Before/after benchmark for DatabaseManager write paths.
+
+"before" replays the original access pattern: a fresh sqlite3.connect, commit
+and close for every statement (rollback journal, synchronous=FULL).
+"after" goes through the current DatabaseManager/WorkspaceManager: one shared
+WAL connection and one transaction per operation.
+
+Usage:
+    python -m benchmarks.bench_db [--files 200] [--rounds 5]
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from src.database_manager import DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+
+class LegacyDatabaseManager:
+    """The pre-transaction DatabaseManager: one connection per statement."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+
+    @contextlib.contextmanager
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def execute_query(self, query, params=()):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.lastrowid
+
+
+def legacy_create(db, name, paths):
+    workspace_id = db.execute_query("INSERT INTO workspaces (name) VALUES (?)", (name,))
+    for path in paths:
+        db.execute_query(
+            "INSERT INTO workspace_files (workspace_id, file_path) VALUES (?, ?)",
+            (workspace_id, path)
+        )
+    return workspace_id
+
+
+def legacy_record_start(db, workspace_id, launched):
+    for _, pid, path in launched:
+        db.execute_query(
+            "INSERT INTO active_processes (workspace_id, pid, file_path) VALUES (?, ?, ?)",
+            (workspace_id, pid, path)
+        )
+    db.execute_query(
+        "UPDATE workspaces SET last_activated_at = ?, activate_count = activate_count + 1 WHERE id = ?",
+        (datetime.datetime.utcnow(), workspace_id)
+    )
+
+
+def record_start(manager, workspace_id, launched):
+    # Same bookkeeping start_workspace performs after launching.
+    with manager.db.transaction():
+        now = int(time.time())
+        manager.db.execute_many(
+            "INSERT INTO active_processes (workspace_id, pid, file_path, started_at) VALUES (?, ?, ?, ?)",
+            [row + (now,) for row in launched]
+        )
+        manager.db.execute_query(
+            "UPDATE workspaces SET last_activated_at = ?, activate_count = activate_count + 1 WHERE id = ?",
+            (now, workspace_id)
+        )
+
+
+def run(n_files, rounds):
+    paths = [f"/opt/tools/app_{i}.bin" for i in range(n_files)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # before
+        legacy_path = os.path.join(tmp, "legacy.db")
+        schema = DatabaseManager(legacy_path)
+        schema.initialize_db()
+        schema.close()
+        # the legacy code never enabled WAL; make sure the file is in rollback mode
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        legacy = LegacyDatabaseManager(legacy_path)
+        create_t, start_t = [], []
+        for r in range(rounds):
+            t0 = time.perf_counter()
+            wid = legacy_create(legacy, f"ws{r}", paths)
+            create_t.append(time.perf_counter() - t0)
+            launched = [(wid, 10000 + i, p) for i, p in enumerate(paths)]
+            t0 = time.perf_counter()
+            legacy_record_start(legacy, wid, launched)
+            start_t.append(time.perf_counter() - t0)
+        results["before"] = (statistics.median(create_t), statistics.median(start_t))
+
+        # after
+        manager = WorkspaceManager(DatabaseManager(os.path.join(tmp, "current.db")))
+        create_t, start_t = [], []
+        for r in range(rounds):
+            t0 = time.perf_counter()
+            manager.create_workspace(f"ws{r}", paths)
+            create_t.append(time.perf_counter() - t0)
+            wid = manager.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (f"ws{r}",))[0]
+            launched = [(wid, 10000 + i, p) for i, p in enumerate(paths)]
+            t0 = time.perf_counter()
+            record_start(manager, wid, launched)
+            start_t.append(time.perf_counter() - t0)
+        manager.db.close()
+        results["after"] = (statistics.median(create_t), statistics.median(start_t))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    results = run(args.files, args.rounds)
+    print(f"{args.files} files, median of {args.rounds} rounds")
+    print(f"{'':8}{'create_workspace':>20}{'start bookkeeping':>20}")
+    for label, (create_s, start_s) in results.items():
+        print(f"{label:8}{create_s * 1000:>17.2f} ms{start_s * 1000:>17.2f} ms")
+    before, after = results["before"], results["after"]
+    print(f"{'speedup':8}{before[0] / after[0]:>19.1f}x{before[1] / after[1]:>19.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Cold-start budget check for `qs start`.
+
+Runs `qs start <workspace>` against a scratch database (QS_DB_PATH) with a
+single trivial file and reports:
+
+  * wall time minus a bare `python -c pass`, i.e. what qs itself costs;
+  * cumulative import time of the modules loaded on that path
+    (from `python -X importtime`);
+  * whether typer, rich or psutil were imported (they must not be).
+
+Exits non-zero if the overhead exceeds the budget, so it can gate CI.
+
+The default budget is what a clean tree measures on the reference VM
+(bare interpreter about 20 ms; qs overhead 50-67 ms between runs), not
+the 50 ms the lazy-start work aimed for. That goal is not met: the
+standard library `qs start` needs (typing, json and shlex with re,
+subprocess, sqlite3, datetime) takes about 35 ms to import there before
+any qs module runs. Lower the budget as that floor moves.
+
+Usage:
+    python -m benchmarks.bench_startup [--budget-ms 75] [--runs 15]
+"""
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+FORBIDDEN = ("typer", "rich", "psutil")
+DEFAULT_BUDGET_MS = 75.0
+WORKSPACE = "bench-startup"
+
+
+def run_qs(args, env, extra_flags=()):
+    return subprocess.run(
+        [sys.executable, *extra_flags, str(ROOT / "cli.py"), *args],
+        env=env, capture_output=True, text=True, cwd=ROOT,
+    )
+
+
+def median_wall(cmd, env, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, env=env, capture_output=True, cwd=ROOT)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def import_profile(env):
+    """Returns ({top-level module: cumulative µs}, total µs) for `qs start`."""
+    proc = run_qs(["start", WORKSPACE], env, extra_flags=("-X", "importtime"))
+    modules, total = {}, 0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            depth = len(name) - len(name.lstrip())
+            name = name.strip()
+            modules[name] = int(cumulative)
+            if depth == 1:
+                total += int(cumulative)
+    return modules, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS,
+                        help="Max wall-clock overhead of `qs start` over a bare interpreter.")
+    parser.add_argument("--runs", type=int, default=15)
+    args = parser.parse_args()
+
+    # Under PYTHONDONTWRITEBYTECODE a stale __pycache__ is never refreshed,
+    # and every run would then pay for compiling the edited modules
+    compileall.compile_dir(str(ROOT / "src"), quiet=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, QS_DB_PATH=os.path.join(tmp, "bench.db"))
+        trivial = "cmd /c exit" if os.name == "nt" else "true"
+        setup = (
+            "from src.workspace_manager import WorkspaceManager;"
+            f"WorkspaceManager().create_workspace({WORKSPACE!r}, [{trivial!r}])"
+        )
+        subprocess.run([sys.executable, "-c", setup], env=env, check=True, cwd=ROOT)
+
+        bare = median_wall([sys.executable, "-c", "pass"], env, args.runs)
+        qs = median_wall([sys.executable, str(ROOT / "cli.py"), "start", WORKSPACE], env, args.runs)
+        modules, import_us = import_profile(env)
+
+    overhead_ms = (qs - bare) * 1000
+    print(f"python -c pass      : {bare * 1000:7.1f} ms")
+    print(f"qs start            : {qs * 1000:7.1f} ms")
+    print(f"qs overhead         : {overhead_ms:7.1f} ms  (budget {args.budget_ms:.0f} ms)")
+    print(f"imports (cumulative): {import_us / 1000:7.1f} ms")
+
+    failures = []
+    leaked = [name for name in FORBIDDEN if name in modules]
+    if leaked:
+        failures.append(f"heavy modules imported on the start path: {', '.join(leaked)}")
+    if overhead_ms > args.budget_ms:
+        failures.append(f"cold start overhead {overhead_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
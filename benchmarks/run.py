@@ -0,0 +1,232 @@
+"""Benchmark suite: WorkspaceManager operations and CLI cold start across sizes.
+
+Every case runs against a fresh scratch database and launches the stub app
+(benchmarks/stub_app.py) instead of real applications, so it runs headless
+on Linux. Results are written as JSON and compared against a stored
+baseline; the exit status is non-zero when a case regressed.
+
+Usage:
+    python -m benchmarks.run                       # run, compare with baseline.json
+    python -m benchmarks.run --quick               # smaller sizes
+    python -m benchmarks.run --save-baseline       # record the current numbers
+    python -m benchmarks.run --output results.json --tolerance 0.3
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from src.database_manager import DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+from .workload import populate, stub_command
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+FULL = {"files": [1, 10, 50], "workspaces": [100, 1000, 10000], "children": 2, "repeat": 5}
+QUICK = {"files": [1, 10], "workspaces": [100, 1000], "children": 1, "repeat": 3}
+
+
+def median_time(fn, repeat, setup=None):
+    times = []
+    for i in range(repeat):
+        state = setup(i) if setup else None
+        t0 = time.perf_counter()
+        fn(i, state)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def fresh_manager(tmp, label):
+    return WorkspaceManager(DatabaseManager(os.path.join(tmp, f"{label}.db")))
+
+
+def bench_create(tmp, sizes, repeat):
+    results = {}
+    for files in sizes["files"]:
+        manager = fresh_manager(tmp, f"create-{files}")
+        paths = [stub_command() + f" --n {j}" for j in range(files)]
+        results[f"create_workspace[files={files}]"] = median_time(
+            lambda i, _: manager.create_workspace(f"ws-{i}", paths), repeat
+        )
+        manager.db.close()
+    return results
+
+
+def wait_for_trees(manager, pattern, expected, timeout=10.0):
+    """Waits until the stubs have forked their children, so stop sees whole trees.
+
+    `pattern` is a workspace name or GLOB pattern.
+    """
+    from src.process_control import ProcessTable
+
+    pids = [row[0] for row in manager.db.fetch_all(
+        "SELECT pid FROM active_processes ap JOIN workspaces w ON w.id = ap.workspace_id WHERE w.name GLOB ?",
+        (pattern,),
+    )]
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        table = ProcessTable()
+        # Count python processes only; `sh -c` may or may not exec into the stub
+        found = sum(1 for pid in pids for proc in table.tree(pid) if proc.pid != pid or "python" in proc.name())
+        if found >= expected:
+            return
+        time.sleep(0.05)
+
+
+def bench_start_stop(tmp, sizes, repeat):
+    results = {}
+    for files in sizes["files"]:
+        manager = fresh_manager(tmp, f"startstop-{files}")
+        command = stub_command(children=sizes["children"])
+        manager.create_workspace("ws", [f"{command} --n {j}" for j in range(files)])
+
+        starts, stops = [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            manager.start_workspace("ws")
+            starts.append(time.perf_counter() - t0)
+            wait_for_trees(manager, "ws", files * (1 + sizes["children"]))
+            t0 = time.perf_counter()
+            manager.stop_workspace("ws", grace=5)
+            stops.append(time.perf_counter() - t0)
+        results[f"start_workspace[files={files}]"] = statistics.median(starts)
+        results[f"stop_workspace[files={files},children={sizes['children']}]"] = statistics.median(stops)
+        manager.db.close()
+
+    # Several workspaces in one call: one launch run, one scan, one commit
+    count, files = 5, max(sizes["files"][:2])
+    manager = fresh_manager(tmp, "startstop-batch")
+    command = stub_command(children=sizes["children"])
+    for w in range(count):
+        manager.create_workspace(f"batch-{w}", [f"{command} --n {j}" for j in range(files)])
+    starts, stops = [], []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        manager.start_workspaces(["batch-*"])
+        starts.append(time.perf_counter() - t0)
+        wait_for_trees(manager, "batch-*", count * files * (1 + sizes["children"]))
+        t0 = time.perf_counter()
+        manager.stop_workspaces(everything=True, grace=5)
+        stops.append(time.perf_counter() - t0)
+    results[f"start_workspaces[workspaces={count},files={files}]"] = statistics.median(starts)
+    results[f"stop_workspaces[workspaces={count},files={files},children={sizes['children']}]"] = statistics.median(stops)
+    manager.db.close()
+    return results
+
+
+def bench_list(tmp, sizes, repeat):
+    results = {}
+    for count in sizes["workspaces"]:
+        manager = fresh_manager(tmp, f"list-{count}")
+        populate(manager, count, files=3, usage=count)
+        results[f"list_workspaces[workspaces={count}]"] = median_time(
+            lambda i, _: manager.list_workspaces(), repeat
+        )
+        results[f"list_workspaces_page[workspaces={count},limit=50]"] = median_time(
+            lambda i, _: manager.list_workspaces(limit=50), repeat
+        )
+        manager.db.close()
+    return results
+
+
+def bench_cli(tmp, sizes, repeat):
+    db_path = os.path.join(tmp, "cli.db")
+    manager = WorkspaceManager(DatabaseManager(db_path))
+    populate(manager, max(sizes["workspaces"]), files=3, usage=0)
+    manager.db.close()
+
+    env = dict(os.environ, QS_DB_PATH=db_path, QS_NO_DAEMON="1")
+    cases = {
+        "cli_cold_start[python -c pass]": [sys.executable, "-c", "pass"],
+        "cli_cold_start[qs start <missing>]": [sys.executable, str(ROOT / "cli.py"), "start", "missing"],
+        "cli_cold_start[qs ls --limit 20]": [sys.executable, str(ROOT / "cli.py"), "ls", "--limit", "20"],
+    }
+    results = {}
+    for label, cmd in cases.items():
+        results[label] = median_time(
+            lambda i, _: subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True), repeat * 2
+        )
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Prints a comparison table; returns the names of regressed cases."""
+    regressions = []
+    width = max(len(name) for name in results)
+    print(f"{'case':<{width}}  {'current':>11}  {'baseline':>11}  {'change':>8}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<{width}}  {current * 1000:>8.2f} ms  {'-':>11}  {'new':>8}")
+            continue
+        change = (current - base) / base if base else 0.0
+        flag = ""
+        if change > tolerance and current - base > min_delta:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<{width}}  {current * 1000:>8.2f} ms  {base * 1000:>8.2f} ms  {change:>+7.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="Smaller sizes for a fast check.")
+    parser.add_argument("--only", choices=["create", "startstop", "list", "cli"], action="append",
+                        help="Run only these groups (repeatable).")
+    parser.add_argument("--output", help="Write results JSON here.")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with these results.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown relative to the baseline (0.25 = 25%%).")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="Ignore slowdowns smaller than this, whatever the ratio.")
+    args = parser.parse_args()
+
+    sizes = QUICK if args.quick else FULL
+    groups = {
+        "create": bench_create,
+        "startstop": bench_start_stop,
+        "list": bench_list,
+        "cli": bench_cli,
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, bench in groups.items():
+            if args.only and name not in args.only:
+                continue
+            results.update(bench(tmp, sizes, sizes["repeat"]))
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(document, indent=2) + "\n")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(document, indent=2) + "\n")
+        print(f"Saved baseline to {baseline_path}")
+
+    baseline = json.loads(baseline_path.read_text())["results"] if baseline_path.exists() else {}
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms / 1000)
+    if regressions:
+        print(f"\n{len(regressions)} case(s) regressed beyond {args.tolerance:.0%}.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Stress test: many concurrent `qs` processes against one database.
+
+Runs `--procs` workers side by side, each invoking the CLI `--ops` times
+with a random start / stop / ls / stats command on a small pool of
+workspaces, so the same workspace is often started and stopped by two
+processes at once. Afterwards every workspace is stopped and the database
+is checked:
+
+- no command failed with "database is locked";
+- activate_count adds up to the number of successful starts;
+- no tracked process and no launched stub is left behind;
+- total_usage_seconds, the day rollups and the sessions agree, and no
+  workspace has overlapping sessions (a session closed twice);
+- PRAGMA integrity_check passes.
+
+Prints throughput and per-command latencies; the exit status is non-zero
+when an invariant fails. Linux/macOS only, like the stub app.
+
+Usage:
+    python -m benchmarks.stress                    # 8 processes x 25 commands
+    python -m benchmarks.stress --procs 16 --ops 50 --workspaces 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from src.database_manager import DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+from .workload import populate
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Relative frequency of each command
+COMMANDS = {"start": 4, "stop": 4, "ls": 1, "stats": 1}
+
+# Set in the environment of every `qs` the harness runs, and so inherited by
+# the stubs they launch: how leftovers of this run are recognised
+MARKER = "QS_STRESS_RUN"
+
+
+def run_worker(index, args, env, names, log, lock):
+    rng = random.Random(args.seed * 1000 + index)
+    commands, weights = zip(*COMMANDS.items())
+    for _ in range(args.ops):
+        command = rng.choices(commands, weights)[0]
+        argv = [command]
+        if command in ("start", "stop"):
+            argv.append(rng.choice(names))
+        elif command == "ls":
+            argv += ["--limit", "20"]
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, str(ROOT / "cli.py"), *argv],
+                              env=env, cwd=ROOT, capture_output=True, text=True)
+        elapsed = time.perf_counter() - t0
+        with lock:
+            log.append((command, argv[1:2], proc.returncode, elapsed, proc.stdout + proc.stderr))
+
+
+def leftover_stubs(marker):
+    """PIDs of processes launched during this run that are still alive."""
+    import psutil
+    found = []
+    for proc in psutil.process_iter():
+        try:
+            if proc.environ().get(MARKER) == marker:
+                found.append(proc.pid)
+        except psutil.Error:
+            pass
+    return found
+
+
+def check(db_path, log, marker):
+    """Returns a list of invariant violations."""
+    failures = []
+    locked = [entry for entry in log if "database is locked" in entry[4]]
+    if locked:
+        failures.append(f"{len(locked)} command(s) failed with 'database is locked'")
+
+    conn = sqlite3.connect(db_path)
+    starts = sum(1 for command, _, code, _, _ in log if command == "start" and code == 0)
+    activations = conn.execute("SELECT IFNULL(SUM(activate_count), 0) FROM workspaces").fetchone()[0]
+    if activations != starts:
+        failures.append(f"activate_count sums to {activations}, but {starts} starts succeeded")
+
+    tracked = conn.execute("SELECT COUNT(*) FROM active_processes").fetchone()[0]
+    if tracked:
+        failures.append(f"{tracked} process(es) still tracked after stopping everything")
+    alive = leftover_stubs(marker)
+    if alive:
+        failures.append(f"{len(alive)} launched process(es) still running: {alive[:10]}")
+
+    mismatched = conn.execute("""
+        SELECT COUNT(*) FROM workspaces w
+        WHERE w.total_usage_seconds != (
+            SELECT IFNULL(SUM(duration_seconds), 0) FROM workspace_usage u WHERE u.workspace_id = w.id)
+    """).fetchone()[0]
+    if mismatched:
+        failures.append(f"{mismatched} workspace(s) whose total_usage_seconds disagrees with their sessions")
+    sessions = conn.execute("SELECT COUNT(*) FROM workspace_usage").fetchone()[0]
+    rolled = conn.execute("SELECT IFNULL(SUM(sessions), 0) FROM usage_rollups WHERE period = 'day'").fetchone()[0]
+    if rolled < sessions:
+        failures.append(f"day rollups count {rolled} session(s) for {sessions} recorded")
+
+    overlaps = conn.execute("""
+        SELECT COUNT(*) FROM (
+            SELECT started_at, LAG(ended_at) OVER (PARTITION BY workspace_id ORDER BY started_at, id) AS previous_end
+            FROM workspace_usage
+        ) WHERE started_at < previous_end
+    """).fetchone()[0]
+    if overlaps:
+        failures.append(f"{overlaps} overlapping session(s)")
+
+    integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    if integrity != "ok":
+        failures.append(f"integrity_check: {integrity}")
+    conn.close()
+    return failures
+
+
+def report(log, wall):
+    total = len(log)
+    print(f"{total} commands in {wall:.2f}s ({total / wall:.1f}/s)")
+    for command in COMMANDS:
+        times = sorted(elapsed for name, _, _, elapsed, _ in log if name == command)
+        if not times:
+            continue
+        failed = sum(1 for name, _, code, _, _ in log if name == command and code != 0)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"  {command:<6} {len(times):>5} runs  median {statistics.median(times) * 1000:7.1f} ms"
+              f"  p95 {p95 * 1000:7.1f} ms  non-zero exits {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--procs", type=int, default=8, help="Concurrent CLI processes.")
+    parser.add_argument("--ops", type=int, default=25, help="Commands per process.")
+    parser.add_argument("--workspaces", type=int, default=4, help="Workspaces shared by all processes.")
+    parser.add_argument("--files", type=int, default=2, help="Files per workspace.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database and print its path.")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="qs-stress-")
+    db_path = os.path.join(tmp, "stress.db")
+    manager = WorkspaceManager(DatabaseManager(db_path))
+    populate(manager, args.workspaces, args.files, 0, prefix="stress")
+    names = [name for (name,) in manager.db.fetch_all("SELECT name FROM workspaces ORDER BY name")]
+    manager.db.close()
+
+    env = dict(os.environ, QS_DB_PATH=db_path, QS_NO_DAEMON="1", **{MARKER: tmp})
+    log, lock = [], threading.Lock()
+    workers = [threading.Thread(target=run_worker, args=(i, args, env, names, log, lock))
+               for i in range(args.procs)]
+    t0 = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - t0
+
+    subprocess.run([sys.executable, str(ROOT / "cli.py"), "stop", "--all"],
+                   env=env, cwd=ROOT, capture_output=True)
+    report(log, wall)
+    failures = check(db_path, log, tmp)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    for command, target, code, _, output in log:
+        if code != 0 and "database is locked" in output:
+            print(f"--- {command} {' '.join(target)} (exit {code})\n{output.strip()[-400:]}")
+            break
+    if args.keep:
+        print(f"Database kept at {db_path}")
+    else:
+        import shutil
+        shutil.rmtree(tmp, ignore_errors=True)
+    if failures:
+        sys.exit(1)
+    print("All invariants hold.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Stand-in for a real application in benchmarks.
+
+Starts, optionally forks a tree of idle children, then sleeps until it is
+signalled. Linux/macOS only (uses os.fork and signal.pause).
+
+Usage:
+    python benchmarks/stub_app.py [--children 2] [--depth 1] [--ignore-term]
+"""
+import argparse
+import os
+import signal
+
+
+def spawn_tree(children, depth):
+    if depth <= 0:
+        return
+    for _ in range(children):
+        if os.fork() == 0:
+            spawn_tree(children, depth - 1)
+            idle()
+
+
+def idle():
+    while True:
+        signal.pause()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--children", type=int, default=0, help="Children per process.")
+    parser.add_argument("--depth", type=int, default=1, help="Levels of children.")
+    parser.add_argument("--n", type=int, default=0, help="Instance number; only makes entries distinct.")
+    parser.add_argument("--ignore-term", action="store_true",
+                        help="Ignore SIGTERM, forcing `qs stop` to escalate to kill().")
+    args = parser.parse_args()
+
+    if args.ignore_term:
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    spawn_tree(args.children, args.depth)
+    idle()
+
+
+if __name__ == "__main__":
+    main()
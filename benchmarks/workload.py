@@ -0,0 +1,76 @@
+"""Synthetic workload generator: fills a scratch database for benchmarks.
+
+Creates N workspaces with M files each and K historical usage sessions
+spread over the past year, then rebuilds the usage rollups.
+
+Usage:
+    python -m benchmarks.workload --db /tmp/qs-bench.db --workspaces 1000 --files 5 --usage 100000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from src.database_manager import DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+STUB_APP = Path(__file__).resolve().parent / "stub_app.py"
+
+
+def stub_command(children=0, depth=1, ignore_term=False):
+    """Returns a workspace file entry that launches the stub app."""
+    command = f"{sys.executable} {STUB_APP}"
+    if children:
+        command += f" --children {children} --depth {depth}"
+    if ignore_term:
+        command += " --ignore-term"
+    return command
+
+
+def populate(manager, workspaces, files, usage, prefix="bench", seed=0):
+    """Adds `workspaces` x `files` workspaces and `usage` sessions to the DB."""
+    rng = random.Random(seed)
+    now = int(time.time())
+    command = stub_command()
+    with manager.db.transaction():
+        for i in range(workspaces):
+            manager.create_workspace(f"{prefix}-{i:06d}", [f"{command} --n {j}" for j in range(files)])
+
+        if usage and workspaces:
+            ids = [row[0] for row in manager.db.fetch_all("SELECT id FROM workspaces")]
+            sessions = []
+            for _ in range(usage):
+                started = now - rng.randint(3600, 365 * 86400)
+                duration = rng.randint(60, 8 * 3600)
+                sessions.append((rng.choice(ids), started, started + duration, duration))
+            manager.db.execute_many(
+                "INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds) VALUES (?, ?, ?, ?)",
+                sessions
+            )
+            manager.db.execute_query("""
+                UPDATE workspaces SET total_usage_seconds = (
+                    SELECT IFNULL(SUM(duration_seconds), 0) FROM workspace_usage u WHERE u.workspace_id = workspaces.id
+                )
+            """)
+    if usage:
+        manager.rebuild_usage_rollups()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", required=True, help="Scratch database path (created if missing).")
+    parser.add_argument("--workspaces", type=int, default=1000)
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--usage", type=int, default=0, help="Historical usage sessions in total.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    manager = WorkspaceManager(DatabaseManager(args.db))
+    populate(manager, args.workspaces, args.files, args.usage, seed=args.seed)
+    print(f"Populated {args.db} in {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
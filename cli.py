@@ -1,4 +1,4 @@
-from src.main import app
+from src.entry import main
 
 if __name__ == "__main__":
-    app()
+    main()
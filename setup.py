@@ -10,7 +10,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'qs=src.main:app',
+            'qs=src.entry:main',
         ],
     },
 )
@@ -0,0 +1,34 @@
+"""QuickStart CLI, also usable as a library:
+
+    from src import WorkspaceManager
+
+    manager = WorkspaceManager()
+    workspace = manager.get_workspace("proj")   # Workspace, with its WorkspaceFiles
+    manager.start_workspaces(["proj"])
+    manager.stop_workspaces(["proj"])
+
+A long-lived WorkspaceManager keeps workspace definitions in memory (see
+definitions.py), so repeated starts and stops don't query them again.
+
+The names below are imported on first use, so that importing one module
+of the package (as `qs start` and shell completion do) doesn't pull in
+the rest.
+"""
+
+_EXPORTS = {
+    "WorkspaceManager": ".workspace_manager",
+    "DatabaseManager": ".database_manager",
+    "Workspace": ".models",
+    "WorkspaceFile": ".models",
+    "ResourcePolicy": ".policy",
+}
+
+__all__ = list(_EXPORTS)
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,185 @@
+"""Shell completion of workspace names from a precomputed index.
+
+The index is two small text files next to the database, in
+`<database>-completion/`: `names` lists every workspace name in sorted
+order, `running` the names of workspaces with tracked processes. The
+WorkspaceManager rewrites them (atomically, just before committing) when
+workspaces are created, deleted or imported, and when they start or stop.
+
+Answering a Tab press only reads these files: it doesn't import typer,
+rich, psutil or sqlite3, nor open the database. complete() speaks the
+protocol of the scripts `qs --install-completion` installs (Typer's): the
+shell sets `_QS_COMPLETE=complete_<shell>` and passes the command line in
+COMP_WORDS/COMP_CWORD (bash) or _TYPER_COMPLETE_ARGS (zsh, fish,
+PowerShell).
+"""
+from __future__ import annotations  # builtin generics below; typing isn't imported here
+
+import os
+import sys
+from bisect import bisect_left
+
+from .config import DB_PATH
+
+# Commands whose positional arguments are all workspace names, and those
+# taking a single workspace name first (followed by other arguments)
+MULTI_NAME_COMMANDS = ("start", "stop", "delete", "prewarm")
+FIRST_NAME_COMMANDS = ("show", "check", "timings", "top", "order", "depend", "options", "limit")
+
+def index_dir(db_path) -> str:
+    return f"{db_path}-completion"
+
+def _write_lines(path: str, lines):
+    """Replaces `path` with `lines`, atomically: readers see the old or the new file."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("".join(f"{line}\n" for line in lines))
+    os.replace(tmp, path)
+
+def write_names(conn, db_path):
+    """Rewrites the `names` file from the workspaces table (via `conn`)."""
+    directory = index_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    # The unique index on name hands them out sorted (bytewise, like str order)
+    _write_lines(os.path.join(directory, "names"), (
+        name for (name,) in conn.execute("SELECT name FROM workspaces ORDER BY name") if "\n" not in name
+    ))
+
+def write_running(conn, db_path):
+    """Rewrites the `running` file from active_processes (via `conn`)."""
+    directory = index_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    _write_lines(os.path.join(directory, "running"), (
+        name for (name,) in conn.execute(
+            "SELECT DISTINCT w.name FROM active_processes ap JOIN workspaces w ON w.id = ap.workspace_id"
+        )
+    ))
+
+def has_index(db_path) -> bool:
+    return os.path.exists(os.path.join(index_dir(db_path), "names"))
+
+def _read(path: str) -> str:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return ""
+
+def _matching(data: str, prefix: str) -> list[str]:
+    """The lines of sorted `data` starting with `prefix`.
+
+    They are contiguous: one str.find() locates the first, and only the
+    lines from there on are split and bisected for the end.
+    """
+    data = "\n" + data.rstrip("\n")
+    start = data.find("\n" + prefix)
+    if start < 0:
+        return []
+    lines = data[start + 1:].split("\n")
+    return lines[:bisect_left(lines, prefix + "\U0010ffff")]
+
+def lookup(prefix: str, db_path=None) -> list[tuple[str, bool]]:
+    """Returns (name, running) for the indexed workspace names starting with `prefix`."""
+    directory = index_dir(db_path or DB_PATH)
+    names = _matching(_read(os.path.join(directory, "names")), prefix)
+    if not names:
+        return []
+    running = set(_read(os.path.join(directory, "running")).split("\n"))
+    return [(name, name in running) for name in names]
+
+def complete_names(incomplete: str) -> list[str]:
+    """Typer autocompletion callback for workspace name arguments."""
+    return [name for name, _ in lookup(incomplete)]
+
+def complete_names_with_state(incomplete: str) -> list[tuple[str, str]]:
+    """Like complete_names(), with a running/stopped hint for each name."""
+    return [(name, "running" if running else "stopped") for name, running in lookup(incomplete)]
+
+def _split(line: str) -> list[str]:
+    """Splits a command line into words like a POSIX shell, tolerating an unclosed quote."""
+    words, word, quote, pending = [], [], None, False
+    chars = iter(line)
+    for ch in chars:
+        if quote:
+            if ch == quote:
+                quote = None
+            elif ch == "\\" and quote == '"':
+                word.append(next(chars, ""))
+            else:
+                word.append(ch)
+        elif ch in "'\"":
+            quote, pending = ch, True
+        elif ch == "\\":
+            word.append(next(chars, ""))
+            pending = True
+        elif ch.isspace():
+            if word or pending:
+                words.append("".join(word))
+            word, pending = [], False
+        else:
+            word.append(ch)
+    if word or pending:
+        words.append("".join(word))
+    return words
+
+def _completion_args(shell: str) -> tuple[list[str], str] | None:
+    """The words before the cursor (without the program) and the word being completed."""
+    if shell == "bash":
+        words = _split(os.environ.get("COMP_WORDS", ""))
+        cword = int(os.environ.get("COMP_CWORD", "0") or 0)
+        return words[1:cword], words[cword] if cword < len(words) else ""
+    line = os.environ.get("_TYPER_COMPLETE_ARGS", "")
+    words = _split(line)[1:]
+    if shell in ("powershell", "pwsh"):
+        incomplete = os.environ.get("_TYPER_COMPLETE_WORD_TO_COMPLETE", "")
+        return (words[:-1] if incomplete else words), incomplete
+    if shell in ("zsh", "fish"):
+        if words and not line.endswith(" "):
+            return words[:-1], words[-1]
+        return words, ""
+    return None
+
+def _format(shell: str, items: list[tuple[str, str | None]]) -> str:
+    if shell == "zsh":
+        if not items:
+            return "_files"
+
+        def escape(text: str) -> str:
+            return (text.replace('"', '""').replace("'", "''").replace("$", "\\$")
+                    .replace("`", "\\`").replace(":", r"\\:"))
+        entries = "\n".join(f'"{escape(value)}":"{escape(hint)}"' if hint else f'"{escape(value)}"'
+                            for value, hint in items)
+        return f"_arguments '*: :(({entries}))'"
+    if shell == "fish":
+        return "\n".join(f"{value}\t{hint}" if hint else value for value, hint in items)
+    if shell in ("powershell", "pwsh"):
+        return "\n".join(f"{value}:::{hint or ' '}" for value, hint in items)
+    return "\n".join(value for value, _ in items)
+
+def complete(shell: str) -> bool:
+    """Answers a completion request for a workspace name argument.
+
+    Returns False when the cursor isn't on one (a command name, an option,
+    anything after an option), leaving the request to the full CLI.
+    """
+    parsed = _completion_args(shell)
+    if parsed is None:
+        return False
+    args, incomplete = parsed
+    if args and args[0] == "--trace":
+        args = args[2:]
+    if not args or incomplete.startswith("-") or any(arg.startswith("-") for arg in args):
+        return False
+    command, positional = args[0], len(args) - 1
+    if command not in MULTI_NAME_COMMANDS and not (command in FIRST_NAME_COMMANDS and positional == 0):
+        return False
+
+    with_state = command == "stop"
+    items = [(name, ("running" if running else "stopped") if with_state else None)
+             for name, running in lookup(incomplete)]
+    if shell == "fish" and os.environ.get("_TYPER_COMPLETE_FISH_ACTION") == "is-args":
+        sys.exit(0 if items else 1)
+    output = _format(shell, items)
+    if output:
+        sys.stdout.write(output + "\n")
+    return True
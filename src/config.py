@@ -1,8 +1,9 @@
 import os
-from pathlib import Path
-
 import sys
 
+# Paths are plain strings built with os.path: pathlib costs several
+# milliseconds to import, and this module is on the start and completion paths.
+
 APP_NAME = "QuickStart_cli"
 
 # Determine project root
@@ -13,20 +14,81 @@ if getattr(sys, 'frozen', False):
     # However, we want the data to be persistent, so we shouldn't store it in _MEIPASS (temp)
     # unless it's read-only data.
     # For a persistent DB next to the executable:
-    PROJECT_ROOT = Path(sys.executable).parent
+    PROJECT_ROOT = os.path.dirname(sys.executable)
 else:
     # src/config.py -> src/ -> project_root/
-    PROJECT_ROOT = Path(__file__).resolve().parent.parent
-
-DB_DIR = PROJECT_ROOT / "data"
-DB_PATH = DB_DIR / "quickstart.db"
-
-# Ensure the directory exists
-try:
-    DB_DIR.mkdir(parents=True, exist_ok=True)
-except Exception:
-    # If we can't write to project dir (e.g. installed in read-only location), 
-    # fallback to home dir or raise error. 
-    # For now, we assume user has write access to their own code.
-    print(f"Warning: Could not create data directory at {DB_DIR}. Using current directory.")
-    DB_PATH = Path("quickstart.db")
+    PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Upper bound on files launched concurrently by `qs start`
+MAX_LAUNCH_WORKERS = int(os.environ.get("QS_MAX_WORKERS", "8"))
+
+# Seconds `qs stop` waits after terminate() before escalating to kill(),
+# and how long it then waits for killed processes to disappear
+STOP_GRACE_SECONDS = float(os.environ.get("QS_STOP_TIMEOUT", "3"))
+STOP_KILL_TIMEOUT = 1.0
+
+# Launch/stop timings kept per workspace file for `qs timings`; 0 turns the
+# history off
+TIMING_HISTORY = int(os.environ.get("QS_TIMING_HISTORY", "20"))
+
+# Resource samples kept per workspace by `qs top --record` (a ring buffer:
+# the oldest sample is overwritten once it is full)
+RESOURCE_SAMPLE_SLOTS = int(os.environ.get("QS_SAMPLE_SLOTS", "720"))
+
+# Finished sessions older than this many days are folded into per-day
+# summaries by `qs maintenance` (and the daemon, once a day); 0 keeps them all
+RETENTION_DAYS = int(os.environ.get("QS_RETENTION_DAYS", "365"))
+MAINTENANCE_INTERVAL = 24 * 3600.0
+
+# Page-cache prewarming (`qs prewarm`): files read ahead at a time, and how
+# long after a prewarm a launch still counts as warm in `qs prewarm --report`
+PREWARM_WORKERS = int(os.environ.get("QS_PREWARM_WORKERS", "4"))
+PREWARM_VALID_SECONDS = 3600
+
+# Predictive prewarming: workspaces started in the coming QS_PREWARM_AHEAD
+# minutes of the day on at least PREWARM_MIN_DAYS of the last
+# PREWARM_HISTORY_DAYS days are prewarmed (by the daemon every
+# PREWARM_INTERVAL seconds; 0 minutes turns that off)
+PREWARM_AHEAD_MINUTES = int(os.environ.get("QS_PREWARM_AHEAD", "15"))
+PREWARM_HISTORY_DAYS = 28
+PREWARM_MIN_DAYS = 3
+PREWARM_INTERVAL = 300.0
+
+# Seconds a command waits for another process's write to the database to
+# finish, and for another `qs start`/`stop`/`delete` of the same workspace,
+# before giving up
+DB_BUSY_TIMEOUT = float(os.environ.get("QS_BUSY_TIMEOUT", "10"))
+WORKSPACE_LOCK_TIMEOUT = float(os.environ.get("QS_LOCK_TIMEOUT", "60"))
+
+DB_DIR = os.path.join(PROJECT_ROOT, "data")
+DB_PATH = os.path.join(DB_DIR, "quickstart.db")
+
+# QS_DB_PATH points the tool at another database (scratch DBs, benchmarks)
+if os.environ.get("QS_DB_PATH"):
+    DB_PATH = os.environ["QS_DB_PATH"]
+    DB_DIR = os.path.dirname(DB_PATH)
+
+# Unix socket of the optional `qs daemon`; QS_NO_DAEMON=1 makes every
+# command run in-process even when a daemon is listening
+DAEMON_SOCKET = os.environ.get("QS_SOCKET", os.path.join(DB_DIR, "qs.sock"))
+USE_DAEMON = os.environ.get("QS_NO_DAEMON", "") in ("", "0")
+# Seconds a client waits for the daemon to take a request before doing the
+# work in-process, and then for its reply
+DAEMON_TIMEOUT = float(os.environ.get("QS_DAEMON_TIMEOUT", "2"))
+DAEMON_REPLY_TIMEOUT = float(os.environ.get("QS_DAEMON_REPLY_TIMEOUT", "300"))
+
+def ensure_db_dir(db_path: str) -> str:
+    """Creates the directory holding `db_path` and returns the path to use.
+
+    Called when the database is first opened rather than at import time, so
+    commands that never touch the DB don't pay for it.
+    """
+    try:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        return db_path
+    except Exception:
+        # If we can't write to project dir (e.g. installed in read-only location), 
+        # fallback to home dir or raise error. 
+        # For now, we assume user has write access to their own code.
+        print(f"Warning: Could not create data directory at {os.path.dirname(db_path)}. Using current directory.")
+        return "quickstart.db"
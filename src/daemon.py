@@ -0,0 +1,170 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .config import DAEMON_SOCKET, MAINTENANCE_INTERVAL, PREWARM_AHEAD_MINUTES, PREWARM_INTERVAL
+from .utils import now_epoch, process_create_time
+from .workspace_manager import WorkspaceManager
+
+# How often the daemon looks for exited children, and how often it
+# reconciles processes it didn't launch itself (seconds)
+REAP_INTERVAL = 0.1
+RECONCILE_INTERVAL = 5.0
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"ok": False, "output": "Malformed request.\n", "data": None}
+        else:
+            if request.get("expires", float("inf")) < time.time():
+                # The client gave up waiting and did the work itself
+                return
+            # Tells the client the request is being run, so it won't fall back
+            self.wfile.write(b'{"accepted": true}\n')
+            self.wfile.flush()
+            response = self.server.qs_daemon.dispatch(request)
+        self.wfile.write(json.dumps(response).encode() + b"\n")
+
+class QuickStartDaemon:
+    """Long-lived supervisor that serves `qs` commands over a Unix socket.
+
+    It keeps one WorkspaceManager (and so one DB connection) for its whole
+    lifetime, holds the Popen handle of everything it launches and reaps
+    those children as they exit, recording the exact end of each session.
+    Requests are handled one at a time on the main thread, so the manager
+    is never shared between threads.
+    """
+
+    def __init__(self, socket_path=None, manager: Optional[WorkspaceManager] = None):
+        self.socket_path = str(socket_path or DAEMON_SOCKET)
+        self.manager = manager or WorkspaceManager()
+        # pid -> (Popen, create time) of processes this daemon launched
+        self.children: Dict[int, Tuple[object, Optional[float]]] = {}
+        self.running = False
+
+    def dispatch(self, request: dict) -> dict:
+        """Runs one request, capturing what the manager prints for the client."""
+        handler = getattr(self, f"_cmd_{request.get('cmd')}", None)
+        output = io.StringIO()
+        ok, data = False, None
+        with contextlib.redirect_stdout(output):
+            if handler is None:
+                print(f"Unknown command '{request.get('cmd')}'.")
+            else:
+                try:
+                    ok, data = handler(**(request.get("args") or {}))
+                except Exception as e:
+                    print(f"Error: {e}")
+        return {"ok": ok, "output": output.getvalue(), "data": data}
+
+    def _cmd_ping(self) -> Tuple[bool, dict]:
+        return True, {"pid": os.getpid(), "children": len(self.children)}
+
+    def _cmd_start(self, names: List[str], jobs: Optional[int] = None, cwd: Optional[str] = None,
+                   environ: Optional[Dict[str, str]] = None) -> Tuple[bool, dict]:
+        # Launch with the client's working directory and environment, not the daemon's
+        results = self.manager.start_workspaces(names, max_workers=jobs, cwd=cwd, environ=environ)
+        timings = []
+        for name, path, result in self.manager.last_launch_results:
+            if result.ok and result.handle is not None:
+                # Not yet reaped, so the PID can't have been reused since the launch
+                self.children[result.pid] = (result.handle, process_create_time(result.pid))
+            timings.append([name, path, result.pid, result.latency, result.ready_at, result.error])
+        return bool(results) and all(results.values()), {"results": results, "timings": timings}
+
+    def _cmd_stop(self, names: Optional[List[str]] = None, everything: bool = False,
+                  grace: Optional[float] = None) -> Tuple[bool, dict]:
+        results = self.manager.stop_workspaces(names or (), grace=grace, everything=everything)
+        report = self.manager.last_stop_report
+        self.manager.last_stop_report = None
+        # Stopped children are reaped by the next reap() pass
+        data = {"results": results, "report": None}
+        if report is not None:
+            data["report"] = {
+                "exited": report.exited,
+                "killed": report.killed,
+                "survivors": report.survivors,
+                "errors": report.errors,
+                "elapsed": report.elapsed,
+            }
+        return bool(results) and all(results.values()), data
+
+    def _cmd_active(self) -> Tuple[bool, list]:
+        return True, self.manager.get_active_workspaces()
+
+    def _cmd_shutdown(self) -> Tuple[bool, None]:
+        self.running = False
+        return True, None
+
+    def reap(self):
+        """Records the exit of every launched child that has finished."""
+        for pid, (proc, create_time) in list(self.children.items()):
+            if proc.poll() is None:
+                continue
+            del self.children[pid]
+            self.manager.record_process_exit(pid, create_time, now_epoch())
+
+    def prewarm_predicted(self):
+        """Prewarms the workspaces usually started within the next PREWARM_AHEAD_MINUTES."""
+        names = self.manager.predict_prewarm(PREWARM_AHEAD_MINUTES)
+        if names:
+            self.manager.prewarm_workspaces(names)
+
+    def serve(self):
+        """Listens on the socket until shut down (SIGTERM, SIGINT or `qs daemon --stop`)."""
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+                raise RuntimeError(f"A daemon is already listening on {self.socket_path}.")
+            except OSError:
+                # Left behind by a daemon that didn't exit cleanly
+                os.unlink(self.socket_path)
+            finally:
+                probe.close()
+
+        os.makedirs(os.path.dirname(self.socket_path) or ".", exist_ok=True)
+        old_umask = os.umask(0o177)  # socket is only usable by its owner
+        try:
+            server = socketserver.UnixStreamServer(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(old_umask)
+        server.qs_daemon = self
+        server.timeout = REAP_INTERVAL
+
+        def stop(signum, frame):
+            self.running = False
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.running = True
+        next_reconcile = 0.0
+        next_prewarm = 0.0
+        # First maintenance run a minute in, then once a day
+        next_maintenance = time.monotonic() + 60.0
+        try:
+            while self.running:
+                server.handle_request()
+                self.reap()
+                if time.monotonic() >= next_reconcile:
+                    self.manager.reconcile_processes()
+                    next_reconcile = time.monotonic() + RECONCILE_INTERVAL
+                if PREWARM_AHEAD_MINUTES > 0 and time.monotonic() >= next_prewarm:
+                    self.prewarm_predicted()
+                    next_prewarm = time.monotonic() + PREWARM_INTERVAL
+                if time.monotonic() >= next_maintenance:
+                    self.manager.run_maintenance()
+                    next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+        finally:
+            server.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(self.socket_path)
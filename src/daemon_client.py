@@ -0,0 +1,64 @@
+import os
+import time
+from typing import Optional
+
+from .config import DAEMON_REPLY_TIMEOUT, DAEMON_SOCKET, DAEMON_TIMEOUT, USE_DAEMON
+from .tracing import span
+
+# Kept tiny on purpose: this runs before any command when a daemon may be
+# listening, so it must not pull in typer, rich, psutil or sqlite3. socket
+# and json are only imported once a socket file is there to talk to.
+
+def request(cmd: str, timeout: float = DAEMON_TIMEOUT, **args) -> Optional[dict]:
+    """Sends one command to the running `qs daemon` and returns its reply.
+
+    Returns None when no daemon is reachable, or when it doesn't take the
+    request within `timeout` seconds (it serves one request at a time, so
+    a stuck one blocks the rest). The caller should then do the work
+    in-process: the request carries that deadline, and a daemon reaching
+    it later drops it instead of running it twice. The reply is a dict
+    with `ok`, `output` (text the daemon would have printed) and `data`.
+    """
+    if not USE_DAEMON or not os.path.exists(DAEMON_SOCKET):
+        return None
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    with span("daemon.request", cmd=cmd):
+        return _exchange(cmd, timeout, args)
+
+def _exchange(cmd: str, timeout: float, args: dict) -> Optional[dict]:
+    import json
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(DAEMON_SOCKET))
+            payload = {"cmd": cmd, "args": args, "expires": time.time() + timeout}
+            sock.sendall(json.dumps(payload).encode() + b"\n")
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+                if line and json.loads(line).get("accepted"):
+                    # The daemon is running it now: wait for the outcome
+                    sock.settimeout(DAEMON_REPLY_TIMEOUT)
+                    try:
+                        line = reader.readline()
+                    except socket.timeout:
+                        return {
+                            "ok": False,
+                            "output": f"The qs daemon took the request but did not answer within "
+                                      f"{DAEMON_REPLY_TIMEOUT:.0f}s; see `qs daemon --status`.\n",
+                            "data": None,
+                        }
+        except OSError:
+            # Stale socket file, daemon shutting down, or busy past `timeout`
+            return None
+    finally:
+        sock.close()
+
+    if not line:
+        return None
+    return json.loads(line)
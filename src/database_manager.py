@@ -1,14 +1,25 @@
+import atexit
 import sqlite3
 import contextlib
-from .config import DB_PATH
+import time
+from typing import Callable, Iterable, Optional
+from .config import DB_BUSY_TIMEOUT, DB_PATH, ensure_db_dir
+from .tracing import span
 
-class DatabaseManager:
-    def __init__(self):
-        self.db_path = DB_PATH
+def _add_column(conn: sqlite3.Connection, table: str, column_def: str):
+    """ALTER TABLE ADD COLUMN that tolerates the column already existing.
 
-    def initialize_db(self):
-        """Create tables if they don't exist."""
-        create_workspaces_table = """
+    Databases created before versioned migrations may already have it.
+    """
+    try:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+    except sqlite3.OperationalError:
+        # Column likely already exists
+        pass
+
+def _migration_1(conn: sqlite3.Connection):
+    """Base schema."""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS workspaces (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT UNIQUE NOT NULL,
@@ -16,16 +27,16 @@ class DatabaseManager:
             last_activated_at DATETIME,
             activate_count INTEGER DEFAULT 0
         );
-        """
-        create_files_table = """
+    """)
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS workspace_files (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             workspace_id INTEGER NOT NULL,
             file_path TEXT NOT NULL,
             FOREIGN KEY (workspace_id) REFERENCES workspaces (id) ON DELETE CASCADE
         );
-        """
-        create_processes_table = """
+    """)
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS active_processes (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             workspace_id INTEGER,
@@ -34,8 +45,8 @@ class DatabaseManager:
             started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(workspace_id) REFERENCES workspaces(id)
         );
-        """
-        create_usage_table = """
+    """)
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS workspace_usage (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             workspace_id INTEGER,
@@ -44,50 +55,440 @@ class DatabaseManager:
             duration_seconds INTEGER,
             FOREIGN KEY(workspace_id) REFERENCES workspaces(id)
         );
+    """)
+    _add_column(conn, "workspaces", "total_usage_seconds INTEGER DEFAULT 0")
+
+def _migration_2(conn: sqlite3.Connection):
+    """Launch ordering: stages on workspace_files plus explicit dependency edges."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS workspace_file_deps (
+            file_id INTEGER NOT NULL,
+            depends_on_id INTEGER NOT NULL,
+            PRIMARY KEY (file_id, depends_on_id),
+            FOREIGN KEY (file_id) REFERENCES workspace_files (id) ON DELETE CASCADE,
+            FOREIGN KEY (depends_on_id) REFERENCES workspace_files (id) ON DELETE CASCADE
+        );
+    """)
+    # files in a lower launch_order launch first
+    _add_column(conn, "workspace_files", "launch_order INTEGER DEFAULT 0")
+
+def _migration_3(conn: sqlite3.Connection):
+    """OS create time of tracked processes, to tell them apart from PID reuse."""
+    _add_column(conn, "active_processes", "create_time REAL")
+
+def _migration_4(conn: sqlite3.Connection):
+    """Usage rollups for `qs stats`, seeded from the existing history."""
+    from .rollups import rebuild_rollups
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_workspace_started ON workspace_usage (workspace_id, started_at)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage_rollups (
+            workspace_id INTEGER NOT NULL,
+            period TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (workspace_id, period, bucket)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollups_period_bucket ON usage_rollups (period, bucket)")
+    rebuild_rollups(conn)
+
+def _migration_5(conn: sqlite3.Connection):
+    """Indexes for listing at scale and a trigger-maintained file_count."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_workspace ON workspace_files (workspace_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_processes_workspace ON active_processes (workspace_id)")
+    # Matches the "recent" sort key used by WorkspaceManager.iter_workspaces
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_workspaces_recent ON workspaces (IFNULL(last_activated_at, ''), id)")
+
+    _add_column(conn, "workspaces", "file_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        UPDATE workspaces SET file_count = (
+            SELECT COUNT(*) FROM workspace_files wf WHERE wf.workspace_id = workspaces.id
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_files_count_insert AFTER INSERT ON workspace_files
+        BEGIN
+            UPDATE workspaces SET file_count = file_count + 1 WHERE id = NEW.workspace_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_files_count_delete AFTER DELETE ON workspace_files
+        BEGIN
+            UPDATE workspaces SET file_count = file_count - 1 WHERE id = OLD.workspace_id;
+        END
+    """)
+
+def _migration_6(conn: sqlite3.Connection):
+    """Rolling history of per-file launch and stop timings for `qs timings`."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS launch_timings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            workspace_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            recorded_at DATETIME NOT NULL,
+            seconds REAL NOT NULL,
+            FOREIGN KEY (workspace_id) REFERENCES workspaces (id) ON DELETE CASCADE
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_timings_workspace ON launch_timings (workspace_id, file_path, kind, id)")
+
+def _migration_7(conn: sqlite3.Connection):
+    """Per-file launch options and the launcher resolution cache (src/resolver.py)."""
+    _add_column(conn, "workspace_files", "args TEXT")   # JSON list of extra arguments
+    _add_column(conn, "workspace_files", "cwd TEXT")
+    _add_column(conn, "workspace_files", "env TEXT")    # JSON object of overrides
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS launcher_cache (
+            entry TEXT PRIMARY KEY,
+            target TEXT,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            kind TEXT NOT NULL,
+            argv TEXT NOT NULL
+        ) WITHOUT ROWID;
+    """)
+
+def _migration_8(conn: sqlite3.Connection):
+    """Resource sampling: a fixed-size ring of samples per workspace and per-session peaks/averages."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resource_samples (
+            workspace_id INTEGER NOT NULL,
+            slot INTEGER NOT NULL,
+            sampled_at DATETIME NOT NULL,
+            processes INTEGER NOT NULL,
+            cpu_percent REAL NOT NULL,
+            rss INTEGER NOT NULL,
+            threads INTEGER NOT NULL,
+            fds INTEGER NOT NULL,
+            PRIMARY KEY (workspace_id, slot)
+        ) WITHOUT ROWID;
+    """)
+    # Next ring slot to write is sample_seq modulo the ring size
+    _add_column(conn, "workspaces", "sample_seq INTEGER NOT NULL DEFAULT 0")
+    # Running totals for the open session, folded into workspace_usage when it closes
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS session_resources (
+            workspace_id INTEGER PRIMARY KEY,
+            samples INTEGER NOT NULL,
+            cpu_sum REAL NOT NULL,
+            cpu_peak REAL NOT NULL,
+            rss_sum INTEGER NOT NULL,
+            rss_peak INTEGER NOT NULL
+        );
+    """)
+    _add_column(conn, "workspace_usage", "avg_cpu REAL")
+    _add_column(conn, "workspace_usage", "peak_cpu REAL")
+    _add_column(conn, "workspace_usage", "avg_rss INTEGER")
+    _add_column(conn, "workspace_usage", "peak_rss INTEGER")
+
+def _migration_9(conn: sqlite3.Connection):
+    """Resource policies per workspace (file_id 0) and per file (src/policy.py)."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS resource_policies (
+            workspace_id INTEGER NOT NULL,
+            file_id INTEGER NOT NULL DEFAULT 0,
+            nice INTEGER,
+            ionice_class TEXT,
+            ionice_level INTEGER,
+            cpu_affinity TEXT,
+            rlimit_as INTEGER,
+            rlimit_nofile INTEGER,
+            PRIMARY KEY (workspace_id, file_id)
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_files_policy_delete AFTER DELETE ON workspace_files
+        BEGIN
+            DELETE FROM resource_policies WHERE workspace_id = OLD.workspace_id AND file_id = OLD.id;
+        END
+    """)
+
+def _migration_10(conn: sqlite3.Connection):
+    """Per-day summaries of sessions removed from workspace_usage by `qs maintenance`."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS usage_archive (
+            workspace_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            seconds INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (workspace_id, day)
+        ) WITHOUT ROWID;
+    """)
+
+# Time columns stored as integer UTC epoch seconds since migration 11
+EPOCH_COLUMNS = {
+    "workspaces": ("created_at", "last_activated_at"),
+    "active_processes": ("started_at",),
+    "workspace_usage": ("started_at", "ended_at"),
+    "launch_timings": ("recorded_at",),
+    "resource_samples": ("sampled_at",),
+}
+
+# Rows rewritten per UPDATE by migration 11
+EPOCH_MIGRATION_BATCH = 10000
+
+def _migration_11(conn: sqlite3.Connection):
+    """Timestamps as integer UTC epoch seconds instead of text.
+
+    Rows are rewritten in place, a rowid range at a time; values that are
+    already numbers are left alone. The old CURRENT_TIMESTAMP column
+    defaults stay in the schema (changing them means rebuilding the table),
+    so every insert supplies its time explicitly.
+    """
+    from .rollups import rebuild_rollups
+
+    for table, columns in EPOCH_COLUMNS.items():
+        assignments = ", ".join(
+            f"{column} = CASE WHEN typeof({column}) = 'text' "
+            f"THEN CAST(strftime('%s', {column}) AS INTEGER) ELSE {column} END"
+            for column in columns
+        )
+        if table == "resource_samples":
+            # WITHOUT ROWID, and bounded by the ring size anyway
+            conn.execute(f"UPDATE {table} SET {assignments}")
+            continue
+        low, high = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+        if low is None:
+            continue
+        for start in range(low, high + 1, EPOCH_MIGRATION_BATCH):
+            conn.execute(
+                f"UPDATE {table} SET {assignments} WHERE rowid BETWEEN ? AND ?",
+                (start, start + EPOCH_MIGRATION_BATCH - 1)
+            )
+
+    # The "recent" listing key compared text; unset now sorts as 0
+    conn.execute("DROP INDEX IF EXISTS idx_workspaces_recent")
+    conn.execute("CREATE INDEX idx_workspaces_recent ON workspaces (IFNULL(last_activated_at, 0), id)")
+    # Newest-first session listings and the retention cutoff
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_usage_started ON workspace_usage (started_at)")
+    rebuild_rollups(conn)
+
+def _migration_12(conn: sqlite3.Connection):
+    """Prewarming (src/prewarm.py): when workspaces were last prewarmed, and which launches followed one."""
+    _add_column(conn, "workspaces", "prewarmed_at INTEGER")
+    _add_column(conn, "launch_timings", "prewarmed INTEGER NOT NULL DEFAULT 0")
+
+def _migration_13(conn: sqlite3.Connection):
+    """A counter bumped by every change to workspace definitions (see src/definitions.py)."""
+    conn.execute("CREATE TABLE IF NOT EXISTS definition_version (value INTEGER NOT NULL)")
+    if conn.execute("SELECT COUNT(*) FROM definition_version").fetchone()[0] == 0:
+        conn.execute("INSERT INTO definition_version (value) VALUES (0)")
+
+def _migration_14(conn: sqlite3.Connection):
+    """launcher_cache keyed by (entry, base): relative entries resolve per directory (see src/resolver.py)."""
+    # Only a cache, so it is rebuilt rather than converted
+    conn.execute("DROP TABLE IF EXISTS launcher_cache")
+    conn.execute("""
+        CREATE TABLE launcher_cache (
+            entry TEXT NOT NULL,
+            base TEXT NOT NULL DEFAULT '',
+            target TEXT,
+            mtime_ns INTEGER,
+            inode INTEGER,
+            kind TEXT NOT NULL,
+            argv TEXT NOT NULL,
+            PRIMARY KEY (entry, base)
+        ) WITHOUT ROWID;
+    """)
+
+def _migration_15(conn: sqlite3.Connection):
+    """When each tracked process was last seen running, so sessions end then rather than when noticed."""
+    _add_column(conn, "active_processes", "seen_at INTEGER")
+
+# Applied in order; PRAGMA user_version records how many have run.
+# Append new migrations, never edit or reorder existing ones.
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+    _migration_8,
+    _migration_9,
+    _migration_10,
+    _migration_11,
+    _migration_12,
+    _migration_13,
+    _migration_14,
+    _migration_15,
+]
+
+# Extra attempts when SQLite reports the database as busy even after the
+# busy timeout, and the first backoff between them (doubling, with jitter)
+BUSY_RETRIES = 4
+BUSY_BACKOFF = 0.05
+
+def is_busy_error(error: Exception) -> bool:
+    """True for the "database is locked" / "busy" errors another process causes."""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+def retry_busy(operation: Callable, retries: int = BUSY_RETRIES):
+    """Calls `operation`, retrying with exponential backoff while the database is busy.
+
+    Only for statements that can safely run again: starting a transaction,
+    or a statement outside one.
+    """
+    delay = BUSY_BACKOFF
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not is_busy_error(e):
+                raise
+        import random  # only once contended; keeps it off the start path
+        with span("db.busy_retry", attempt=attempt + 1):
+            time.sleep(delay * random.uniform(0.5, 1.5))
+        delay *= 2
+
+class DatabaseManager:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or DB_PATH
+        # One connection per process (i.e. per CLI invocation), opened lazily.
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tx_depth = 0
+        self._before_commit = {}
+
+    def initialize_db(self):
+        """Brings the schema up to date, running each migration only once.
+
+        The applied schema version is kept in `PRAGMA user_version`, so an
+        up-to-date database costs a single pragma read.
         """
-        with self.get_connection() as conn:
-            conn.execute(create_workspaces_table)
-            conn.execute(create_files_table)
-            conn.execute(create_processes_table)
-            conn.execute(create_usage_table)
-            
-            # Migration to add total_usage_seconds if it doesn't exist
-            try:
-                conn.execute("ALTER TABLE workspaces ADD COLUMN total_usage_seconds INTEGER DEFAULT 0")
-            except sqlite3.OperationalError:
-                # Column likely already exists
-                pass
+        version = self.fetch_one("PRAGMA user_version")[0]
+        if version >= len(MIGRATIONS):
+            return
+
+        with span("db.migrate", from_version=version), self.transaction() as conn:
+            # Another process may have migrated while this one waited for the lock
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for migration in MIGRATIONS[version:]:
+                migration(conn)
+            conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
+    def connect(self) -> sqlite3.Connection:
+        """Returns the shared connection, opening and tuning it on first use."""
+        if self._conn is None:
+            with span("db.connect"):
+                if self.db_path == DB_PATH:
+                    self.db_path = ensure_db_dir(DB_PATH)
+                # isolation_level=None: statements outside transaction() autocommit,
+                # transaction() issues BEGIN/COMMIT itself.
+                # cached_statements: keep prepared statements around for reuse.
+                # timeout: SQLite's busy handler waits this long for another
+                # process's write lock instead of failing straight away.
+                conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256,
+                                       timeout=DB_BUSY_TIMEOUT)
+                # Lets `qs maintenance` hand freed pages back to the OS. Only takes
+                # effect for a brand-new file, and must come before the WAL switch
+                # writes its header; existing ones are converted by a VACUUM.
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                # WAL lets readers run alongside a writer; with WAL, synchronous=NORMAL
+                # only fsyncs at checkpoints while remaining safe against corruption.
+                # Switching a new file needs a moment of exclusive access.
+                retry_busy(lambda: conn.execute("PRAGMA journal_mode=WAL"))
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            atexit.register(self.close)
+        return self._conn
+
+    def close(self):
+        """Closes the shared connection (if open)."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+            self._tx_depth = 0
 
     @contextlib.contextmanager
+    def transaction(self):
+        """Yields the connection inside a single unit of work.
+
+        Everything executed in the block is committed once on exit, or rolled
+        back if the block raises. Nested blocks join the outermost transaction.
+
+        The write lock is taken up front (BEGIN IMMEDIATE), waiting and then
+        retrying while another process holds it. A deferred BEGIN would only
+        ask for it at the first write, and a transaction that has already
+        read can't wait for it then: SQLite fails it with "database is
+        locked" straight away.
+        """
+        conn = self.connect()
+        if self._tx_depth:
+            self._tx_depth += 1
+            try:
+                yield conn
+            finally:
+                self._tx_depth -= 1
+            return
+
+        with span("db.transaction"):
+            retry_busy(lambda: conn.execute("BEGIN IMMEDIATE"))
+            self._tx_depth = 1
+            try:
+                yield conn
+                while self._before_commit:
+                    self._before_commit.pop(next(iter(self._before_commit)))(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                self._tx_depth = 0
+                self._before_commit.clear()
+
+    @property
+    def in_transaction(self) -> bool:
+        """True inside a transaction() block."""
+        return self._tx_depth > 0
+
+    def before_commit(self, key: str, callback: Callable[[sqlite3.Connection], None]):
+        """Runs `callback(conn)` at the end of the current transaction, just before COMMIT.
+
+        It still holds the write lock and sees the transaction's changes.
+        Registering the same `key` again in one transaction runs it only
+        once, so per-row bookkeeping can ask for work done per commit.
+        Outside a transaction the callback runs in one of its own.
+        """
+        if not self._tx_depth:
+            with self.transaction() as conn:
+                callback(conn)
+            return
+        self._before_commit.setdefault(key, callback)
+
     def get_connection(self):
-        """Yields a database connection."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
-        finally:
-            conn.close()
+        """Yields a database connection (alias of transaction())."""
+        return self.transaction()
 
     def execute_query(self, query: str, params: tuple = ()):
-        """Executes a write query."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.lastrowid
+        """Executes a write query (retried while busy when outside a transaction)."""
+        conn = self.connect()
+        with span("db.execute", sql=query):
+            if self._tx_depth:
+                cursor = conn.execute(query, params)
+            else:
+                cursor = retry_busy(lambda: conn.execute(query, params))
+        return cursor.lastrowid
+
+    def execute_many(self, query: str, seq_of_params: Iterable[tuple]):
+        """Executes a write query once per parameter tuple, in one transaction."""
+        with span("db.execute_many", sql=query), self.transaction() as conn:
+            cursor = conn.executemany(query, seq_of_params)
+            return cursor.rowcount
 
     def fetch_all(self, query: str, params: tuple = ()):
         """Executes a read query and returns all results."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchall()
+        with span("db.fetch_all", sql=query):
+            return self.connect().execute(query, params).fetchall()
 
     def fetch_one(self, query: str, params: tuple = ()):
         """Executes a read query and returns one result."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            return cursor.fetchone()
+        with span("db.fetch_one", sql=query):
+            return self.connect().execute(query, params).fetchone()
@@ -0,0 +1,196 @@
+"""In-process read-through cache of workspace definitions (src/models.py).
+
+A long-running host (the daemon, or a service embedding WorkspaceManager)
+starts and stops the same workspaces over and over. Their names, files,
+dependencies and policies rarely change, so after the first lookup they
+are served from memory: a repeated start skips the name lookup and the
+file, dependency and policy queries, and a stop the name lookup.
+
+Every change to a definition, by any process, increments the single row
+of `definition_version` in the transaction making it (see
+WorkspaceManager._definitions_changed()). Before answering, the cache
+checks PRAGMA data_version, which moves whenever another connection has
+committed, and its own process's change count. Only when either moved is
+the version row read, and only when that moved too is the cache dropped.
+Writes to other tables, such as the bookkeeping of starts and stops,
+therefore don't evict anything.
+
+Inside a transaction the cache is bypassed, so it never holds rows that
+could still be rolled back.
+
+Launcher resolutions are kept as well. Like launcher_cache rows, each is
+checked with one stat() per use, so a repeated start doesn't need a
+transaction just to resolve its files.
+"""
+import json
+from typing import Dict, Iterable, List, Tuple
+
+from .database_manager import DatabaseManager
+from .models import Workspace, WorkspaceFile
+from .policy import FIELDS as POLICY_FIELDS, ResourcePolicy
+from .resolver import Resolution, is_current, resolve_all, to_cache_row
+
+class DefinitionCache:
+    """Workspace ids by name and definitions by id, valid until a definition changes."""
+
+    def __init__(self, db: DatabaseManager):
+        self.db = db
+        self.local_changes = 0   # definition changes committed through this process
+        self._ids: Dict[str, int] = {}
+        self._workspaces: Dict[int, Workspace] = {}
+        self._seen = None        # (data_version, local_changes) when last validated
+        self._version = None     # definition_version the contents belong to
+        # (entry, base) -> Resolution; checked with one stat() per use, like launcher_cache rows
+        self._resolutions: Dict[Tuple[str, str], Resolution] = {}
+
+    def changed(self, conn):
+        """Records a definition change; runs just before the changing transaction commits."""
+        conn.execute("UPDATE definition_version SET value = value + 1")
+        self.local_changes += 1
+
+    def clear(self):
+        self._ids.clear()
+        self._workspaces.clear()
+        self._version = None
+
+    def _usable(self) -> bool:
+        """Drops the contents if a definition may have changed; False inside a transaction."""
+        if self.db.in_transaction:
+            return False
+        conn = self.db.connect()
+        seen = (conn.execute("PRAGMA data_version").fetchone()[0], self.local_changes)
+        if seen != self._seen:
+            version = conn.execute("SELECT value FROM definition_version").fetchone()[0]
+            if version != self._version:
+                self.clear()
+                self._version = version
+            self._seen = seen
+        return True
+
+    def ids(self, names: Iterable[str]) -> Dict[str, int]:
+        """Returns {name: id} for the given names that exist."""
+        names = list(names)
+        if not self._usable():
+            return _lookup_ids(self.db, names)
+        missing = [name for name in names if name not in self._ids]
+        if missing:
+            self._ids.update(_lookup_ids(self.db, missing))
+        return {name: self._ids[name] for name in names if name in self._ids}
+
+    def workspaces(self, workspace_ids: Iterable[int]) -> Dict[int, Workspace]:
+        """Returns {id: Workspace} for the given ids that exist."""
+        workspace_ids = list(workspace_ids)
+        if not self._usable():
+            return load_workspaces(self.db, workspace_ids)
+        missing = [workspace_id for workspace_id in workspace_ids if workspace_id not in self._workspaces]
+        if missing:
+            loaded = load_workspaces(self.db, missing)
+            self._workspaces.update(loaded)
+            self._ids.update((workspace.name, workspace.id) for workspace in loaded.values())
+        return {
+            workspace_id: self._workspaces[workspace_id]
+            for workspace_id in workspace_ids if workspace_id in self._workspaces
+        }
+
+    def resolve(self, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Resolution]:
+        """Like resolver.resolve_all(), without a database round trip for entries resolved before.
+
+        Only (entry, base) pairs that are new to this process, or whose file
+        changed, go to resolve_all() (and so to launcher_cache).
+        """
+        resolved, stale = {}, []
+        for key in dict.fromkeys(keys):
+            resolution = self._resolutions.get(key)
+            if resolution is not None and is_current(to_cache_row(resolution)):
+                resolved[key] = resolution
+            else:
+                stale.append(key)
+        if stale:
+            with self.db.transaction() as conn:
+                fresh = resolve_all(conn, stale)
+            self._resolutions.update((key, r) for key, r in fresh.items() if r.ok)
+            resolved.update(fresh)
+        return resolved
+
+def _lookup_ids(db: DatabaseManager, names: List[str]) -> Dict[str, int]:
+    if not names:
+        return {}
+    return dict(db.fetch_all(
+        "SELECT w.name, w.id FROM json_each(?) j JOIN workspaces w ON w.name = j.value", (json.dumps(names),)
+    ))
+
+def load_policies(db: DatabaseManager, workspace_ids: List[int]) -> Dict[int, ResourcePolicy]:
+    """Returns {file_id: effective policy} for files with any policy.
+
+    File id 0 holds a workspace-wide policy; per-file fields override it.
+    Files without their own row get their workspace's policy.
+    """
+    ids = json.dumps(workspace_ids)
+    rows = db.fetch_all(
+        f"SELECT workspace_id, file_id, {', '.join(POLICY_FIELDS)} FROM resource_policies "
+        "WHERE workspace_id IN (SELECT value FROM json_each(?))",
+        (ids,)
+    )
+    if not rows:
+        return {}
+    bases, own = {}, {}
+    for row in rows:
+        if row[1] == 0:
+            bases[row[0]] = ResourcePolicy.from_row(row[2:])
+        else:
+            own[row[1]] = (row[0], ResourcePolicy.from_row(row[2:]))
+    policies = {
+        file_id: bases.get(workspace_id, ResourcePolicy()).merged(policy)
+        for file_id, (workspace_id, policy) in own.items()
+    }
+    if any(not base.is_empty() for base in bases.values()):
+        for workspace_id, file_id in db.fetch_all(
+            "SELECT workspace_id, id FROM workspace_files WHERE workspace_id IN (SELECT value FROM json_each(?))",
+            (ids,)
+        ):
+            if workspace_id in bases:
+                policies.setdefault(file_id, bases[workspace_id])
+    return policies
+
+def load_workspaces(db: DatabaseManager, workspace_ids: List[int]) -> Dict[int, Workspace]:
+    """Reads the definitions of the given workspaces.
+
+    Takes one query each for the workspaces, files, dependencies and
+    policies, however many workspaces are asked for.
+    """
+    if not workspace_ids:
+        return {}
+    ids = json.dumps(workspace_ids)
+    workspaces = dict(db.fetch_all(
+        "SELECT id, name FROM workspaces WHERE id IN (SELECT value FROM json_each(?))", (ids,)
+    ))
+    if not workspaces:
+        return {}
+    depends_on: Dict[int, List[int]] = {}
+    for file_id, depends_on_id in db.fetch_all("""
+        SELECT d.file_id, d.depends_on_id
+        FROM workspace_file_deps d
+        JOIN workspace_files wf ON wf.id = d.file_id
+        WHERE wf.workspace_id IN (SELECT value FROM json_each(?))
+    """, (ids,)):
+        depends_on.setdefault(file_id, []).append(depends_on_id)
+    policies = load_policies(db, workspace_ids)
+
+    files: Dict[int, List[WorkspaceFile]] = {workspace_id: [] for workspace_id in workspaces}
+    for workspace_id, file_id, path, order, args, cwd, env in db.fetch_all(
+        "SELECT workspace_id, id, file_path, launch_order, args, cwd, env FROM workspace_files "
+        "WHERE workspace_id IN (SELECT value FROM json_each(?)) ORDER BY workspace_id, id",
+        (ids,)
+    ):
+        files[workspace_id].append(WorkspaceFile(
+            file_id, path, order or 0,
+            args=json.loads(args) if args else None,
+            cwd=cwd,
+            env=json.loads(env) if env else None,
+            depends_on=tuple(depends_on.get(file_id, ())),
+            policy=policies.get(file_id),
+        ))
+    return {
+        workspace_id: Workspace(workspace_id, name, tuple(files[workspace_id]))
+        for workspace_id, name in workspaces.items()
+    }
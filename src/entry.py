@@ -0,0 +1,103 @@
+import os
+import sys
+
+def _fast_start(args) -> bool:
+    """Handles `qs start <name>...` without importing typer or rich."""
+    if not args or any(arg.startswith("-") for arg in args):
+        return False
+    from . import daemon_client
+    response = daemon_client.request("start", names=args, cwd=os.getcwd(), environ=dict(os.environ))
+    if response is not None:
+        sys.stdout.write(response["output"])
+        results = (response["data"] or {}).get("results") or {}
+    else:
+        from .tracing import span
+        with span("import.workspace_manager"):
+            from .workspace_manager import WorkspaceManager
+        results = WorkspaceManager().start_workspaces(args)
+    if len(results) > 1:
+        from .utils import format_batch_results
+        sys.stdout.write(format_batch_results("Started", results))
+    if results and not all(results.values()):
+        sys.exit(1)
+    return True
+
+def _fast_stop(args) -> bool:
+    """Forwards `qs stop <name>...` / `qs stop --all` to the daemon; the full CLI handles it otherwise."""
+    everything = args == ["--all"]
+    if not args or (not everything and any(arg.startswith("-") for arg in args)):
+        return False
+    from . import daemon_client
+    response = daemon_client.request("stop", names=[] if everything else args, everything=everything)
+    if response is None:
+        return False
+    sys.stdout.write(response["output"])
+    results = (response["data"] or {}).get("results") or {}
+    if everything and not results:
+        print("No workspaces are running.")
+    elif len(results) > 1 or everything:
+        from .utils import format_batch_results
+        sys.stdout.write(format_batch_results("Stopped", results))
+    elif not response["ok"]:
+        print("Failed to stop workspace (or it was not running).")
+    if results and not all(results.values()):
+        sys.exit(1)
+    return True
+
+# Commands simple enough to dispatch without building the typer app. Each
+# handler returns False when it doesn't understand the arguments, in which
+# case the full CLI takes over (options, --help, errors, ...).
+FAST_COMMANDS = {
+    "start": _fast_start,
+    "stop": _fast_stop,
+}
+
+def _completion_shell() -> str:
+    """The shell asking for completions (Typer's `_<PROG>_COMPLETE=complete_<shell>`), or ""."""
+    for key, value in os.environ.items():
+        if value.startswith("complete_") and key.startswith("_") and key.endswith("_COMPLETE"):
+            return value[len("complete_"):]
+    return ""
+
+def _pop_trace_option(argv: list) -> str:
+    """Removes a leading `--trace FILE` / `--trace=FILE` from argv, returning FILE."""
+    if argv and argv[0].startswith("--trace="):
+        return argv.pop(0).split("=", 1)[1]
+    if len(argv) >= 2 and argv[0] == "--trace":
+        del argv[0]
+        return argv.pop(0)
+    return ""
+
+def main():
+    """Console entry point for `qs`.
+
+    `qs --trace FILE <command> ...` (or QS_TRACE=FILE) records per-phase
+    timings to FILE as Chrome trace JSON; FILE "-" prints a summary table
+    to stderr instead.
+    """
+    shell = _completion_shell()
+    if shell:
+        # Workspace names come from the completion index; the rest (command
+        # names, options) is left to Typer
+        from .completion import complete
+        if complete(shell):
+            return
+
+    argv = sys.argv[1:]
+    trace_path = _pop_trace_option(argv) or os.environ.get("QS_TRACE", "")
+    sys.argv[1:] = argv  # the full CLI parses sys.argv itself
+    if trace_path:
+        from . import tracing
+        tracing.enable(trace_path)
+
+    handler = FAST_COMMANDS.get(argv[0]) if argv else None
+    if handler and handler(argv[1:]):
+        return
+
+    from .tracing import span
+    with span("import.cli"):
+        from .main import app
+    app()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Machine-readable output for `qs ls`, `qs show` and `qs stats` (`--format`).
+
+Rows are written one at a time as they come off the database cursor, so
+memory use stays flat however many there are, and neither rich nor the
+table code is imported. Values are raw: times are UTC epoch seconds,
+durations seconds, sizes bytes, and unset values null (empty in CSV/TSV).
+
+- json: a single array of objects
+- ndjson: one object per line
+- csv / tsv: a header row, then one line per row. Booleans are written as
+  true/false, lists and objects as JSON.
+"""
+import csv
+import json
+from typing import IO, Iterable, Sequence
+
+from .transfer import write_records
+
+# "table" is the default, human-readable rich output
+OUTPUT_FORMATS = ("table", "json", "ndjson", "csv", "tsv")
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def write_rows(rows: Iterable[dict], columns: Sequence[str], out: IO[str], fmt: str) -> int:
+    """Writes `rows` (dicts keyed by `columns`) to `out` in `fmt`; returns how many."""
+    if fmt in ("json", "ndjson"):
+        return write_records(({column: row[column] for column in columns} for row in rows), out, fmt)
+    writer = csv.writer(out, delimiter="\t" if fmt == "tsv" else ",", lineterminator="\n")
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow([_cell(row[column]) for column in columns])
+        count += 1
+    return count
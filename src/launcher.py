@@ -0,0 +1,138 @@
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+# Plain __slots__ classes rather than dataclasses: this module sits on the
+# `qs start` cold-start path and `dataclasses` pulls in `inspect`.
+
+class LaunchItem:
+    """One entry to launch.
+
+    `depends_on` holds keys that must launch first; `after` holds keys that
+    only have to be tried first, whether or not they launch. An `exclusive`
+    item is spawned on the calling thread while no other launch is running,
+    for spawns that aren't safe while other threads work (a preexec_fn).
+    """
+    __slots__ = ("key", "depends_on", "after", "exclusive")
+
+    def __init__(self, key: Hashable, depends_on: Optional[List[Hashable]] = None,
+                 after: Optional[List[Hashable]] = None, exclusive: bool = False):
+        self.key = key
+        self.depends_on = depends_on or []
+        self.after = after or []
+        self.exclusive = exclusive
+
+class LaunchResult:
+    __slots__ = ("key", "pid", "latency", "ready_at", "error", "handle")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.pid: Optional[int] = None
+        self.latency = 0.0           # seconds spent spawning this entry
+        self.ready_at = 0.0          # seconds since the launch began
+        self.error: Optional[str] = None
+        self.handle = None           # whatever the spawn function returned
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+class LaunchEngine:
+    """Launches items on a bounded worker pool, honouring dependency edges.
+
+    Items without pending dependencies are launched in parallel (at most
+    `max_workers` at a time); an item is only submitted once everything it
+    depends on has launched and everything it comes after has been tried.
+    If a dependency fails, its dependents are skipped; items merely coming
+    after it still launch.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max(1, max_workers)
+
+    def run(self, items: List[LaunchItem], spawn: Callable[[Hashable], object]) -> List[LaunchResult]:
+        """Launches all items and returns one result per item, in input order.
+
+        `spawn(key)` must start the item and return an object with a `pid`
+        attribute (e.g. a `subprocess.Popen`). Whatever it raises fails only
+        that item: the exception's message becomes the result's error.
+        """
+        keys = {item.key for item in items}
+        exclusive = {item.key for item in items if item.exclusive}
+        results: Dict[Hashable, LaunchResult] = {item.key: LaunchResult(item.key) for item in items}
+        pending: Dict[Hashable, set] = {}
+        required: Dict[Hashable, set] = {}
+        dependents: Dict[Hashable, List[Hashable]] = {key: [] for key in keys}
+        for item in items:
+            required[item.key] = {dep for dep in item.depends_on if dep in keys and dep != item.key}
+            deps = required[item.key] | {dep for dep in item.after if dep in keys and dep != item.key}
+            pending[item.key] = deps
+            for dep in deps:
+                dependents[dep].append(item.key)
+
+        t0 = time.perf_counter()
+
+        def launch(key: Hashable) -> LaunchResult:
+            result = results[key]
+            start = time.perf_counter()
+            try:
+                handle = spawn(key)
+                result.handle = handle
+                result.pid = getattr(handle, "pid", None)
+            except Exception as e:
+                # Popen raises more than OSError (ValueError for a null
+                # byte, TypeError for a bad env...); none may stop the run
+                result.error = str(e) or type(e).__name__
+            end = time.perf_counter()
+            result.latency = end - start
+            result.ready_at = end - t0
+            return result
+
+        def settled(key: Hashable):
+            # Releases the items waiting on `key`, skipping those that needed it
+            failed = not results[key].ok
+            for child in dependents[key]:
+                if child not in pending:
+                    continue
+                if failed and key in required[child]:
+                    skip(child, "a dependency failed to launch")
+                else:
+                    pending[child].discard(key)
+
+        def skip(key: Hashable, reason: str):
+            results[key].error = reason
+            pending.pop(key, None)
+            settled(key)
+
+        if len(items) == 1:
+            # A single entry needs no pool, and concurrent.futures (which
+            # imports logging) then stays off the cold-start path
+            return [launch(items[0].key)]
+
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = set()
+            while pending or running:
+                ready = [k for k, deps in pending.items() if not deps]
+                for key in ready:
+                    if key not in exclusive:
+                        del pending[key]
+                        running.add(pool.submit(launch, key))
+
+                if not running:
+                    held = [key for key in ready if key in exclusive]
+                    if held:
+                        # Every worker is idle: safe to fork from this thread
+                        del pending[held[0]]
+                        settled(launch(held[0]).key)
+                        continue
+                    # Nothing launchable but items remain: a dependency cycle
+                    for key in pending:
+                        results[key].error = "dependency cycle"
+                    break
+
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    settled(future.result().key)
+
+        return [results[item.key] for item in items]
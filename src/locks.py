@@ -0,0 +1,106 @@
+"""Advisory per-workspace locks shared by every process using a database.
+
+`qs start`, `stop` and `delete` hold the locks of the workspaces they act on
+from reading their rows until their bookkeeping is committed. Two commands
+on the same workspace therefore run one after the other: a stop waits for
+a concurrent start to record its processes, then stops them too.
+
+Each workspace has a lock file in `<database>-locks/`, locked with flock()
+(msvcrt.locking() on Windows). The OS drops the lock when its holder exits,
+so a crashed command never leaves a workspace locked. `delete` removes the
+lock files of the workspaces it deletes.
+"""
+import contextlib
+import os
+import time
+from typing import Iterable, Iterator, List
+
+from .config import WORKSPACE_LOCK_TIMEOUT
+from .tracing import span
+
+# First and longest pause between attempts on a busy lock
+_POLL_START = 0.01
+_POLL_MAX = 0.2
+
+if os.name == "nt":
+    import msvcrt
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def _unlock(fd: int):
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _try_lock(fd: int) -> bool:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _unlock(fd: int):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+def lock_dir(db_path) -> str:
+    return f"{db_path}-locks"
+
+def _lock_path(directory: str, workspace_id: int) -> str:
+    return os.path.join(directory, f"{workspace_id}.lock")
+
+def remove_locks(db_path, workspace_ids: Iterable[int]):
+    """Removes the lock files of deleted workspaces; call while holding their locks.
+
+    A command already waiting on one gets it once the deleter is done and
+    then finds the workspace gone. Workspace ids aren't reused, so no later
+    workspace shares the file. Windows can't remove a file that is open;
+    such a lock file stays.
+    """
+    directory = lock_dir(db_path)
+    for workspace_id in workspace_ids:
+        try:
+            os.unlink(_lock_path(directory, workspace_id))
+        except OSError:
+            pass
+
+@contextlib.contextmanager
+def workspace_locks(db_path, workspace_ids: Iterable[int],
+                    timeout: float = WORKSPACE_LOCK_TIMEOUT) -> Iterator[List[int]]:
+    """Locks the given workspaces for the duration of the block.
+
+    Locks are taken in ascending id order, so commands locking overlapping
+    sets can't deadlock. Yields the ids that were locked; those another
+    process still held after `timeout` seconds (in total) are left out.
+    """
+    wanted = sorted(set(workspace_ids))
+    directory = lock_dir(db_path)
+    os.makedirs(directory, exist_ok=True)
+    deadline = time.monotonic() + timeout
+    held = []  # (workspace_id, fd)
+    try:
+        with span("locks.acquire", workspaces=len(wanted)):
+            for workspace_id in wanted:
+                fd = os.open(_lock_path(directory, workspace_id), os.O_RDWR | os.O_CREAT, 0o644)
+                delay = _POLL_START
+                while not _try_lock(fd):
+                    if time.monotonic() >= deadline:
+                        os.close(fd)
+                        fd = None
+                        break
+                    time.sleep(delay)
+                    delay = min(delay * 2, _POLL_MAX)
+                if fd is not None:
+                    held.append((workspace_id, fd))
+        yield [workspace_id for workspace_id, _ in held]
+    finally:
+        for _, fd in reversed(held):
+            try:
+                _unlock(fd)
+            finally:
+                os.close(fd)
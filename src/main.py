@@ -1,47 +1,138 @@
+import itertools
+import os
 import typer
-from rich.console import Console
-from rich.table import Table
-from typing import Optional
-from .workspace_manager import WorkspaceManager
-from .utils import open_file_picker, utc_to_local_str
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional
+from . import daemon_client
+from .completion import complete_names, complete_names_with_state
+from .config import PREWARM_AHEAD_MINUTES
+
+# rich, psutil and the manager are imported lazily so that commands which
+# don't need them (notably `start`) keep cold start short.
 
 app = typer.Typer(help="QuickStart CLI - Manage and launch your workspaces.")
-console = Console()
-manager = WorkspaceManager()
+_manager = None
+_console = None
+
+def get_manager():
+    """Returns the WorkspaceManager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        from .workspace_manager import WorkspaceManager
+        _manager = WorkspaceManager()
+    return _manager
+
+def get_console():
+    """Returns the rich Console, creating it on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+# `ls` prints this many rows per table so large listings stream out
+# instead of being buffered into one giant Table
+LS_CHUNK_ROWS = 1000
+
+FORMAT_HELP = "table, or json, ndjson, csv or tsv for scripts (raw values, epoch times)."
+
+# Fields written by the machine-readable --format of each listing
+LS_COLUMNS = ("name", "running", "file_count", "created_at", "last_activated_at",
+              "activate_count", "total_usage_seconds", "cursor")
+SHOW_COLUMNS = ("name", "path", "launch_order", "args", "cwd", "depends_on", "pids", "started_at")
+SESSION_COLUMNS = ("name", "started_at", "ended_at", "duration_seconds",
+                   "avg_cpu", "peak_cpu", "avg_rss", "peak_rss")
+
+def check_format(fmt: str):
+    """Exits with an error unless `fmt` is one of formats.OUTPUT_FORMATS."""
+    from .formats import OUTPUT_FORMATS
+    if fmt not in OUTPUT_FORMATS:
+        typer.echo(f"--format must be one of: {', '.join(OUTPUT_FORMATS)}.", err=True)
+        raise typer.Exit(1)
+
+def fail(message: str, fmt: str = "table"):
+    """Prints an error (plainly on stderr for machine formats) and exits with 1."""
+    if fmt == "table":
+        get_console().print(f"[red]{message}[/red]")
+    else:
+        typer.echo(message, err=True)
+    raise typer.Exit(1)
+
+def emit_rows(rows, columns, fmt: str):
+    """Streams rows to stdout in a machine-readable format, without rich."""
+    import sys
+    from .formats import write_rows
+    try:
+        write_rows(rows, columns, sys.stdout, fmt)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        discard_stdout()
+
+def discard_stdout():
+    """Points stdout at /dev/null after the reader (`| head`) stopped early.
+
+    Keeps the exit-time flush of what's still buffered quiet.
+    """
+    import sys
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
 
 @app.command()
-def ls():
+def ls(
+    limit: Optional[int] = typer.Option(None, "--limit", "-l", help="Show at most N workspaces."),
+    offset: int = typer.Option(0, "--offset", help="Skip the first N workspaces."),
+    after: Optional[str] = typer.Option(None, "--after", help="Continue after the cursor printed by a previous page."),
+    sort: str = typer.Option("recent", "--sort", help="recent, name or created."),
+    prefix: Optional[str] = typer.Option(None, "--prefix", "-p", help="Only names starting with this."),
+    fmt: str = typer.Option("table", "--format", "-f", help=FORMAT_HELP),
+):
     """List all workspaces."""
-    workspaces = manager.list_workspaces()
-    if not workspaces:
+    check_format(fmt)
+    manager = get_manager()
+    response = daemon_client.request("active")
+    if response is not None:
+        active_workspaces = set(response["data"])
+    else:
+        active_workspaces = set(manager.get_active_workspaces())
+
+    try:
+        workspaces = manager.iter_workspaces(limit=limit, offset=offset, after=after, sort=sort, prefix=prefix)
+        first = next(workspaces, None)
+    except ValueError as e:
+        fail(str(e), fmt)
+    if fmt != "table":
+        rows = () if first is None else itertools.chain([first], workspaces)
+        emit_rows(({**wk, "running": wk["name"] in active_workspaces} for wk in rows), LS_COLUMNS, fmt)
+        return
+
+    from rich.table import Table
+    from .utils import format_duration, format_local_time
+
+    console = get_console()
+    if first is None:
         console.print("[yellow]No workspaces found.[/yellow]")
         return
 
-    table = Table(title="Workspaces")
-    table.add_column("Name", style="cyan", no_wrap=True)
-    table.add_column("Status", style="yellow")
-    table.add_column("Files", justify="right", style="magenta")
-    table.add_column("Created", style="green")
-    table.add_column("Last Activated", style="blue")
-    table.add_column("Count", justify="right")
-    table.add_column("Total Usage", justify="right", style="white")
-
-    active_workspaces = manager.get_active_workspaces()
-    for wk in workspaces:
+    def new_table(with_header: bool) -> Table:
+        table = Table(title="Workspaces" if with_header else None, show_header=with_header)
+        table.add_column("Name", style="cyan", no_wrap=True)
+        table.add_column("Status", style="yellow")
+        table.add_column("Files", justify="right", style="magenta")
+        table.add_column("Created", style="green")
+        table.add_column("Last Activated", style="blue")
+        table.add_column("Count", justify="right")
+        table.add_column("Total Usage", justify="right", style="white")
+        return table
+
+    table = new_table(with_header=True)
+    shown = 0
+    last = None
+    for wk in itertools.chain([first], workspaces):
         status = "[green]Running[/green]" if wk['name'] in active_workspaces else "Stopped"
-        last_active = utc_to_local_str(wk['last_activated_at'])
-        created_at = utc_to_local_str(wk['created_at'])
+        last_active = format_local_time(wk['last_activated_at'])
+        created_at = format_local_time(wk['created_at'])
         
-        # Format usage
-        total_seconds = int(wk.get('total_usage_seconds', 0))
-        m, s = divmod(total_seconds, 60)
-        h, m = divmod(m, 60)
-        if h > 0:
-            usage_str = f"{h}h {m}m"
-        elif m > 0:
-            usage_str = f"{m}m {s}s"
-        else:
-            usage_str = f"{s}s"
+        usage_str = format_duration(wk.get('total_usage_seconds', 0))
 
         table.add_row(
             wk['name'],
@@ -52,12 +143,64 @@ def ls():
             str(wk['activate_count']),
             usage_str
         )
+        shown += 1
+        last = wk
+        if table.row_count >= LS_CHUNK_ROWS:
+            console.print(table)
+            table = new_table(with_header=False)
 
-    console.print(table)
+    if table.row_count:
+        console.print(table)
+    if limit is not None and shown == limit:
+        import shlex
+        from rich.markup import escape
+
+        # Same filters as this page, or the cursor points into another listing
+        command = f"qs ls --sort {sort} --limit {limit} --after {last['cursor']}"
+        if prefix:
+            command += f" --prefix {shlex.quote(prefix)}"
+        console.print(f"[dim]Next page: {escape(command)}[/dim]")
+
+@app.command()
+def show(
+    name: str = typer.Argument(..., autocompletion=complete_names),
+    fmt: str = typer.Option("table", "--format", "-f", help=FORMAT_HELP),
+):
+    """Show a workspace's files and the PIDs of those running."""
+    check_format(fmt)
+    files = get_manager().get_workspace_files(name)
+    if files is None:
+        raise typer.Exit(1)
+    if fmt != "table":
+        emit_rows(files, SHOW_COLUMNS, fmt)
+        return
+
+    from rich.table import Table
+    from .utils import format_local_time
+
+    table = Table(title=f"Workspace '{name}'")
+    table.add_column("Order", justify="right", style="magenta")
+    table.add_column("File", style="cyan")
+    table.add_column("Working directory", style="blue")
+    table.add_column("PIDs", style="green")
+    table.add_column("Started", style="white")
+    for row in files:
+        path = row["path"] + (" " + " ".join(row["args"]) if row["args"] else "")
+        table.add_row(
+            "-" if row["launch_order"] is None else str(row["launch_order"]),
+            path,
+            row["cwd"] or "-",
+            " ".join(map(str, row["pids"])) or "-",
+            format_local_time(row["started_at"]),
+        )
+    get_console().print(table)
 
 @app.command()
 def build():
     """Create a new workspace interactively."""
+    from .utils import open_file_picker
+
+    console = get_console()
     name = typer.prompt("Enter workspace name (unique, no spaces)")
     if " " in name:
         console.print("[red]Error: Workspace name cannot contain spaces.[/red]")
@@ -87,32 +230,662 @@ def build():
                     return
 
     if files:
-        if manager.create_workspace(name, files):
+        if get_manager().create_workspace(name, files):
             console.print(f"[bold green]Workspace '{name}' created successfully![/bold green]")
         else:
             console.print("[bold red]Failed to create workspace. Name might be taken.[/bold red]")
 
 @app.command()
-def start(name: str):
-    """Start a workspace."""
+def start(
+    names: List[str] = typer.Argument(..., help="Workspace names or glob patterns such as 'proj-*'.",
+                                      autocompletion=complete_names),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", help="Max files launched concurrently."),
+    timings: bool = typer.Option(False, "--timings", help="Show per-file launch latency."),
+):
+    """Start one or more workspaces."""
     # Silent success implies no output unless error
     # The manager handles printing errors
-    manager.start_workspace(name)
+    response = daemon_client.request("start", names=names, jobs=jobs, cwd=os.getcwd(), environ=dict(os.environ))
+    if response is not None:
+        print(response["output"], end="")
+        data = response["data"] or {}
+        results, rows = data.get("results") or {}, data.get("timings") or []
+    else:
+        manager = get_manager()
+        results = manager.start_workspaces(names, max_workers=jobs)
+        rows = [
+            (name, path, r.pid, r.latency, r.ready_at, r.error)
+            for name, path, r in manager.last_launch_results
+        ]
+
+    if timings and rows:
+        from rich.table import Table
+
+        for name, group in itertools.groupby(rows, key=lambda row: row[0]):
+            table = Table(title=f"Launch timings: {name}")
+            table.add_column("File", style="cyan")
+            table.add_column("PID", justify="right")
+            table.add_column("Spawn", justify="right", style="magenta")
+            table.add_column("Ready at", justify="right", style="green")
+            for _, path, pid, latency, ready_at, error in group:
+                table.add_row(
+                    path,
+                    str(pid) if error is None else "[red]failed[/red]",
+                    f"{latency * 1000:.1f} ms",
+                    f"{ready_at * 1000:.1f} ms",
+                )
+            get_console().print(table)
+
+    if len(results) > 1:
+        from .utils import format_batch_results
+        print(format_batch_results("Started", results), end="")
+    if results and not all(results.values()):
+        raise typer.Exit(1)
 
 @app.command()
-def stop(name: str):
-    """Stop a workspace (terminate running processes)."""
-    if not manager.stop_workspace(name):
+def order(name: str = typer.Argument(..., autocompletion=complete_names), file_path: str = typer.Argument(...),
+          stage: int = typer.Argument(...)):
+    """Set the launch stage of a file (lower stages start first).
+
+    A file that fails to launch doesn't hold back later stages; use `qs depend` for files that need it.
+    """
+    if not get_manager().set_launch_order(name, file_path, stage):
+        get_console().print("[red]Failed to set launch order.[/red]")
+
+@app.command()
+def depend(
+    name: str = typer.Argument(..., autocompletion=complete_names),
+    file_path: str = typer.Argument(...),
+    on: str = typer.Option(..., "--on", help="File that must be launched first."),
+    remove: bool = typer.Option(False, "--remove", help="Remove the dependency instead."),
+):
+    """Make a file launch only after another file of the same workspace."""
+    if not get_manager().set_dependency(name, file_path, on, remove=remove):
+        get_console().print("[red]Failed to update dependency.[/red]")
+
+@app.command()
+def options(
+    name: str = typer.Argument(..., autocompletion=complete_names),
+    file_path: str = typer.Argument(...),
+    arg: Optional[List[str]] = typer.Option(None, "--arg", "-a", help="Extra argument (repeatable); replaces the current ones."),
+    cwd: Optional[str] = typer.Option(None, "--cwd", help="Working directory ('' to clear)."),
+    env: Optional[List[str]] = typer.Option(None, "--env", "-e", help="KEY=VALUE override (repeatable); replaces the current ones."),
+    reset: bool = typer.Option(False, "--reset", help="Clear all options first."),
+):
+    """Set the arguments, working directory and environment a file launches with."""
+    console = get_console()
+    overrides = None
+    if env:
+        overrides = {}
+        for pair in env:
+            key, sep, value = pair.partition("=")
+            if not sep or not key:
+                console.print(f"[red]--env expects KEY=VALUE, got '{pair}'.[/red]")
+                raise typer.Exit(1)
+            overrides[key] = value
+
+    current = get_manager().set_file_options(name, file_path, args=arg or None, cwd=cwd, env=overrides, reset=reset)
+    if current is None:
+        console.print("[red]Failed to update options.[/red]")
+        raise typer.Exit(1)
+    console.print(f"args: {current['args']}")
+    console.print(f"cwd:  {current['cwd'] or '-'}")
+    console.print(f"env:  {current['env']}")
+
+@app.command()
+def limit(
+    name: str = typer.Argument(..., autocompletion=complete_names),
+    file_path: Optional[str] = typer.Option(None, "--file", "-f", help="Set the policy of this file instead of the workspace."),
+    nice: Optional[int] = typer.Option(None, "--nice", help="Niceness, -20 (favoured) to 19 (background)."),
+    ionice: Optional[str] = typer.Option(None, "--ionice", help="I/O class: idle, best-effort[:0-7] or realtime[:0-7]."),
+    cpus: Optional[str] = typer.Option(None, "--cpus", help="CPUs to run on, e.g. 0-3,6."),
+    max_memory: Optional[str] = typer.Option(None, "--max-memory", help="Address-space limit (RLIMIT_AS), e.g. 4G."),
+    max_files: Optional[int] = typer.Option(None, "--max-files", help="Open-file limit (RLIMIT_NOFILE)."),
+    clear: bool = typer.Option(False, "--clear", help="Remove the stored policy first."),
+    live: bool = typer.Option(False, "--live", help="Also apply the policy to the running processes now."),
+):
+    """Set resource limits, priority and CPU affinity for a workspace or file."""
+    from .policy import parse_cpus, parse_ionice, parse_size
+
+    console = get_console()
+    values = {}
+    try:
+        if nice is not None:
+            values["nice"] = nice
+        if ionice is not None:
+            values["ionice_class"], values["ionice_level"] = parse_ionice(ionice)
+        if cpus is not None:
+            values["cpu_affinity"] = parse_cpus(cpus)
+        if max_memory is not None:
+            values["rlimit_as"] = parse_size(max_memory)
+        if max_files is not None:
+            values["rlimit_nofile"] = max_files
+    except ValueError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
+
+    manager = get_manager()
+    if values or clear:
+        if manager.set_policy(name, file_path, clear=clear, **values) is None:
+            console.print("[red]Failed to update the policy.[/red]")
+            raise typer.Exit(1)
+
+    policies = manager.get_policies(name)
+    if policies is None:
+        raise typer.Exit(1)
+    if not policies:
+        console.print(f"No resource policy for '{name}'.")
+    for path, policy in policies:
+        console.print(f"[cyan]{path or name}[/cyan]: {policy.describe()}")
+
+    if live:
+        result = manager.apply_policies_live(name)
+        for pid, error in result["errors"].items():
+            console.print(f"[red]Process {pid}: {error}[/red]")
+        console.print(f"Applied to {result['applied']} running processes.")
+        if result["errors"]:
+            raise typer.Exit(1)
+
+@app.command()
+def check(name: str = typer.Argument(..., autocompletion=complete_names)):
+    """Check that every file of a workspace can be launched, without launching it."""
+    from rich.table import Table
+
+    console = get_console()
+    report = get_manager().check_workspace(name)
+    if report is None:
+        raise typer.Exit(1)
+
+    table = Table(title=f"Check '{name}'")
+    table.add_column("File", style="cyan")
+    table.add_column("Kind", style="blue")
+    table.add_column("Launches as / problem")
+    problems = 0
+    for row in report:
+        if row["error"]:
+            problems += 1
+            detail = f"[red]{row['error']}[/red]"
+        else:
+            detail = " ".join(row["command"])
+        table.add_row(row["file_path"], row["kind"] or "-", detail)
+    console.print(table)
+    if problems:
+        console.print(f"[red]{problems} of {len(report)} files cannot be launched.[/red]")
+        raise typer.Exit(1)
+
+@app.command()
+def stop(
+    names: Optional[List[str]] = typer.Argument(None, help="Workspace names or glob patterns such as 'proj-*'.",
+                                                autocompletion=complete_names_with_state),
+    everything: bool = typer.Option(False, "--all", "-a", help="Stop every running workspace."),
+    timeout: Optional[float] = typer.Option(None, "--timeout", "-t", help="Seconds to wait before killing (default QS_STOP_TIMEOUT or 3)."),
+    report: bool = typer.Option(False, "--report", help="Show which processes exited and when."),
+):
+    """Stop one or more workspaces (terminate running processes)."""
+    console = get_console()
+    if not names and not everything:
+        console.print("[red]Give workspace names or patterns, or --all.[/red]")
+        raise typer.Exit(1)
+    names = [] if everything else names
+
+    response = daemon_client.request("stop", names=names, everything=everything, grace=timeout)
+    if response is not None:
+        print(response["output"], end="")
+        data = response["data"] or {}
+        results, stop_report = data.get("results") or {}, data.get("report")
+        if stop_report:
+            stop_report = SimpleNamespace(**stop_report)
+            stop_report.exited = {int(pid): t for pid, t in stop_report.exited.items()}
+            stop_report.errors = {int(pid): e for pid, e in stop_report.errors.items()}
+    else:
+        manager = get_manager()
+        results = manager.stop_workspaces(names, grace=timeout, everything=everything)
+        stop_report = manager.last_stop_report
+
+    if everything and not results:
+        console.print("No workspaces are running.")
+        return
+    if len(results) == 1 and not everything and not all(results.values()):
         console.print("[red]Failed to stop workspace (or it was not running).[/red]")
+        raise typer.Exit(1)
+
+    if report and stop_report:
+        from rich.table import Table
+
+        title = ", ".join(results) if len(results) <= 3 else f"{len(results)} workspaces"
+        table = Table(title=f"Stop report: {title} ({stop_report.elapsed * 1000:.0f} ms)")
+        table.add_column("PID", justify="right", style="cyan")
+        table.add_column("Outcome", style="yellow")
+        table.add_column("Exited at", justify="right", style="green")
+        for pid, exited_at in sorted(stop_report.exited.items(), key=lambda item: item[1]):
+            outcome = "killed" if pid in stop_report.killed else "terminated"
+            table.add_row(str(pid), outcome, f"{exited_at * 1000:.1f} ms")
+        for pid in stop_report.survivors:
+            table.add_row(str(pid), "[red]still running[/red]", "-")
+        for pid, error in stop_report.errors.items():
+            table.add_row(str(pid), f"[red]{error}[/red]", "-")
+        console.print(table)
+
+    if len(results) > 1 or everything:
+        from .utils import format_batch_results
+        print(format_batch_results("Stopped", results), end="")
+        if not all(results.values()):
+            raise typer.Exit(1)
 
 @app.command()
-def delete(name: str):
-    """Delete a workspace."""
-    if typer.confirm(f"Are you sure you want to delete workspace '{name}'?"):
-        if manager.delete_workspace(name):
-            console.print(f"[green]Workspace '{name}' deleted.[/green]")
+def delete(
+    names: Optional[List[str]] = typer.Argument(None, help="Workspace names or glob patterns such as 'proj-*'.",
+                                                autocompletion=complete_names),
+    idle: Optional[int] = typer.Option(None, "--idle", help="Only workspaces not started in this many days (alone: all of them)."),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Don't ask for confirmation."),
+):
+    """Delete one or more workspaces."""
+    from .utils import now_epoch
+
+    console = get_console()
+    if not names and idle is None:
+        console.print("[red]Give workspace names or patterns, or --idle DAYS.[/red]")
+        raise typer.Exit(1)
+    idle_before = now_epoch() - idle * 86400 if idle is not None else None
+
+    manager = get_manager()
+    found, missing = manager.resolve_workspaces(names or (), everything=not names, idle_before=idle_before)
+    for pattern in missing:
+        console.print(f"[yellow]No workspace matches '{pattern}'.[/yellow]")
+    if not found:
+        if not names:
+            console.print("No workspaces match.")
+        raise typer.Exit(1 if missing else 0)
+
+    if len(found) == 1:
+        question = f"Are you sure you want to delete workspace '{next(iter(found))}'?"
+    else:
+        shown = ", ".join(itertools.islice(found, 10)) + (", ..." if len(found) > 10 else "")
+        question = f"Are you sure you want to delete {len(found)} workspaces ({shown})?"
+    if not yes and not typer.confirm(question):
+        return
+
+    results = manager.delete_workspaces(list(found))
+    if len(results) == 1:
+        if all(results.values()):
+            console.print(f"[green]Workspace '{next(iter(results))}' deleted.[/green]")
         else:
             console.print("[red]Failed to delete workspace.[/red]")
+    else:
+        from .utils import format_batch_results
+        print(format_batch_results("Deleted", results), end="")
+    if missing or not all(results.values()):
+        raise typer.Exit(1)
+
+@app.command()
+def stats(
+    by: Optional[str] = typer.Option(None, "--by", help="Break down by day, week or month."),
+    since: Optional[datetime] = typer.Option(None, "--since", formats=["%Y-%m-%d"], help="First day to include (UTC)."),
+    until: Optional[datetime] = typer.Option(None, "--until", formats=["%Y-%m-%d"], help="Last day to include (UTC)."),
+    workspace: Optional[str] = typer.Option(None, "--workspace", "-w", help="Only this workspace."),
+    top: Optional[int] = typer.Option(None, "--top", "-n", help="Only the N most used workspaces."),
+    rebuild: bool = typer.Option(False, "--rebuild", help="Recompute the rollups from raw sessions first."),
+    sessions: bool = typer.Option(False, "--sessions", help="List individual sessions with their resource use."),
+    limit: int = typer.Option(50, "--limit", "-l", help="With --sessions, list at most N sessions."),
+    fmt: str = typer.Option("table", "--format", "-f", help=FORMAT_HELP),
+):
+    """Show workspace usage statistics."""
+    from .rollups import PERIODS
+
+    check_format(fmt)
+    if by and by not in PERIODS:
+        fail(f"--by must be one of: {', '.join(PERIODS)}.", fmt)
+
+    if sessions and top is not None:
+        fail("--top ranks workspaces; limit --sessions with --limit.", fmt)
+
+    manager = get_manager()
+    if sessions:
+        rows = manager.iter_sessions(
+            name=workspace,
+            since=since.date() if since else None,
+            until=until.date() if until else None,
+            limit=limit,
+        )
+        if fmt != "table":
+            emit_rows(rows, SESSION_COLUMNS, fmt)
+            return
+        rows = list(rows)
+
+        from rich.table import Table
+        from .utils import format_bytes, format_duration, format_local_time
+
+        console = get_console()
+        if not rows:
+            console.print("[yellow]No sessions recorded.[/yellow]")
+            return
+        table = Table(title="Sessions")
+        table.add_column("Workspace", style="cyan", no_wrap=True)
+        table.add_column("Started", style="blue")
+        table.add_column("Duration", justify="right")
+        table.add_column("Avg CPU", justify="right", style="magenta")
+        table.add_column("Peak CPU", justify="right", style="magenta")
+        table.add_column("Avg RSS", justify="right", style="green")
+        table.add_column("Peak RSS", justify="right", style="green")
+        for row in rows:
+            sampled = row["peak_cpu"] is not None
+            table.add_row(
+                row["name"],
+                format_local_time(row["started_at"]),
+                format_duration(row["duration_seconds"]),
+                f"{row['avg_cpu']:.1f}%" if sampled else "-",
+                f"{row['peak_cpu']:.1f}%" if sampled else "-",
+                format_bytes(row["avg_rss"]) if sampled else "-",
+                format_bytes(row["peak_rss"]) if sampled else "-",
+            )
+        console.print(table)
+        return
+
+    if rebuild:
+        manager.rebuild_usage_rollups()
+
+    rows = manager.iter_usage_stats(
+        period=by,
+        since=since.date() if since else None,
+        until=until.date() if until else None,
+        name=workspace,
+        top=top,
+    )
+    if fmt != "table":
+        emit_rows(rows, ("name", "bucket", "sessions", "seconds") if by else ("name", "sessions", "seconds"), fmt)
+        return
+    rows = list(rows)
+
+    from rich.table import Table
+    from .utils import format_duration
+
+    console = get_console()
+    if not rows:
+        console.print("[yellow]No usage recorded.[/yellow]")
+        return
+
+    table = Table(title=f"Usage by {by}" if by else "Usage")
+    table.add_column("Workspace", style="cyan", no_wrap=True)
+    if by:
+        table.add_column(by.capitalize(), style="blue")
+    table.add_column("Sessions", justify="right", style="magenta")
+    table.add_column("Usage", justify="right", style="white")
+    for row in rows:
+        cells = [row["name"]] + ([row["bucket"]] if by else [])
+        table.add_row(*cells, str(row["sessions"]), format_duration(row["seconds"]))
+    console.print(table)
+
+@app.command()
+def maintenance(
+    retention: Optional[int] = typer.Option(None, "--retention", "-r", help="Keep raw sessions this many days (default QS_RETENTION_DAYS or 365; 0 keeps all)."),
+    archive: Optional[str] = typer.Option(None, "--archive", help="Append archived sessions to this NDJSON file (.gz to compress)."),
+    full: bool = typer.Option(False, "--full", help="Full VACUUM and ANALYZE instead of the incremental versions."),
+):
+    """Archive old usage history and compact the database."""
+    from .utils import format_bytes
+
+    console = get_console()
+    report = get_manager().run_maintenance(retention_days=retention, archive_path=archive, full=full)
+    if report is None:
+        raise typer.Exit(1)
+
+    if report.archived:
+        where = f" (written to {archive})" if archive else ""
+        console.print(f"Archived {report.archived} sessions into per-day summaries{where}.")
+    if report.orphans or report.cache_pruned:
+        removed = sum(report.orphans.values()) + report.cache_pruned
+        console.print(f"Removed {removed} leftover rows ({report.cache_pruned} stale launcher cache entries).")
+    if report.vacuum == "converted":
+        console.print("Switched the database to incremental auto-vacuum.")
+    console.print(
+        f"[green]Database: {format_bytes(report.size_before)} -> {format_bytes(report.size_after)} "
+        f"in {report.elapsed:.2f}s.[/green]"
+    )
+
+@app.command()
+def export(
+    path: str = typer.Argument("-", help="File to write, '-' for stdout."),
+    fmt: str = typer.Option("ndjson", "--format", "-f", help="ndjson (one workspace per line) or json."),
+    usage: bool = typer.Option(False, "--usage", help="Include usage history."),
+):
+    """Export workspaces for `qs import`."""
+    import sys
+    from .transfer import FORMATS, open_text, write_records
+
+    if fmt not in FORMATS:
+        get_console().print(f"[red]--format must be one of: {', '.join(FORMATS)}.[/red]")
+        raise typer.Exit(1)
+    records = get_manager().iter_export_records(include_usage=usage)
+    if path == "-":
+        try:
+            write_records(records, sys.stdout, fmt)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            discard_stdout()
+        return
+    with open_text(path, "w") as out:
+        count = write_records(records, out, fmt)
+    get_console().print(f"[green]Exported {count} workspaces to {path}.[/green]")
+
+@app.command("import")
+def import_(
+    path: str = typer.Argument(..., help="File to read, '-' for stdin."),
+    fmt: Optional[str] = typer.Option(None, "--format", "-f", help="ndjson or json (detected if omitted)."),
+    on_conflict: str = typer.Option("skip", "--on-conflict", help="skip, merge or upsert existing workspaces."),
+):
+    """Import workspaces exported with `qs export`."""
+    import sys
+    from .transfer import CONFLICT_POLICIES, FORMATS, open_text, read_records
+
+    console = get_console()
+    if fmt is not None and fmt not in FORMATS:
+        console.print(f"[red]--format must be one of: {', '.join(FORMATS)}.[/red]")
+        raise typer.Exit(1)
+    if on_conflict not in CONFLICT_POLICIES:
+        console.print(f"[red]--on-conflict must be one of: {', '.join(CONFLICT_POLICIES)}.[/red]")
+        raise typer.Exit(1)
+
+    manager = get_manager()
+    try:
+        if path == "-":
+            counts = manager.import_workspaces(read_records(sys.stdin, fmt), on_conflict)
+        else:
+            with open_text(path) as source:
+                counts = manager.import_workspaces(read_records(source, fmt), on_conflict)
+    except (OSError, ValueError) as e:
+        console.print(f"[red]Import failed, nothing was imported: {e}[/red]")
+        raise typer.Exit(1)
+    console.print(
+        f"[green]Imported: {counts['created']} created, {counts['updated']} updated, "
+        f"{counts['skipped']} skipped.[/green]"
+    )
+
+@app.command()
+def timings(name: str = typer.Argument(..., autocompletion=complete_names)):
+    """Show recorded launch and stop timings of a workspace's files."""
+    from rich.table import Table
+
+    console = get_console()
+    rows = get_manager().get_timing_history(name)
+    if rows is None:
+        raise typer.Exit(1)
+    if not rows:
+        console.print(f"[yellow]No timings recorded for '{name}' yet.[/yellow]")
+        return
+
+    table = Table(title=f"Timings for '{name}'")
+    table.add_column("File", style="cyan")
+    table.add_column("Phase", style="blue")
+    table.add_column("Runs", justify="right", style="magenta")
+    for column in ("Last", "Mean", "Best", "Worst"):
+        table.add_column(column, justify="right", style="white")
+    table.add_column("Trend", justify="right")
+    for row in rows:
+        trend = row["trend"]
+        if trend is None:
+            trend_text = "-"
+        else:
+            color = "red" if trend > 0.25 else "green" if trend < -0.25 else "white"
+            trend_text = f"[{color}]{trend:+.0%}[/{color}]"
+        table.add_row(
+            row["file_path"], row["kind"], str(row["runs"]),
+            *(f"{row[key] * 1000:.1f} ms" for key in ("last", "mean", "best", "worst")),
+            trend_text,
+        )
+    console.print(table)
+
+@app.command()
+def top(
+    name: Optional[str] = typer.Argument(None, help="Only this workspace.", autocompletion=complete_names),
+    interval: float = typer.Option(2.0, "--interval", "-i", help="Seconds between refreshes."),
+    once: bool = typer.Option(False, "--once", help="Print one sample and exit."),
+    record: bool = typer.Option(False, "--record", help="Store samples (ring buffer) and per-session peak/average."),
+):
+    """Live CPU, memory, thread and descriptor use of running workspaces."""
+    import time
+    from rich.live import Live
+    from rich.table import Table
+    from .utils import format_bytes
+
+    manager = get_manager()
+    manager.reconcile_processes()
+    interval = max(interval, 0.1)
+
+    def render(samples) -> Table:
+        table = Table(title=f"Workspaces (every {interval:g}s, Ctrl+C to quit)" if not once else "Workspaces")
+        table.add_column("Workspace / file", style="cyan")
+        table.add_column("PID", justify="right", style="dim")
+        table.add_column("Procs", justify="right")
+        table.add_column("CPU", justify="right", style="magenta")
+        table.add_column("RSS", justify="right", style="green")
+        table.add_column("Threads", justify="right")
+        table.add_column("FDs", justify="right")
+
+        def cells(usage):
+            return (str(usage.processes), f"{usage.cpu_percent:.1f}%", format_bytes(usage.rss),
+                    str(usage.threads), str(usage.fds))
+
+        for entry in samples:
+            table.add_row(f"[bold]{entry['name']}[/bold]", "", *cells(entry["usage"]))
+            for tree in entry["trees"]:
+                table.add_row(f"  {tree['file_path']}", str(tree["pid"]), *cells(tree["usage"]))
+        if not samples:
+            table.add_row("[yellow]No running workspaces.[/yellow]", "", "", "", "", "", "")
+        return table
+
+    # CPU% is measured between two samples, so the first one only primes it
+    manager.sample_resources(name)
+    if once:
+        time.sleep(min(interval, 0.5))
+        get_console().print(render(manager.sample_resources(name, record=record)))
+        return
+
+    try:
+        with Live(render([]), console=get_console(), auto_refresh=False) as live:
+            while True:
+                time.sleep(interval)
+                live.update(render(manager.sample_resources(name, record=record)), refresh=True)
+    except KeyboardInterrupt:
+        pass
+
+@app.command()
+def prewarm(
+    names: Optional[List[str]] = typer.Argument(None, help="Workspace names or glob patterns.",
+                                                autocompletion=complete_names),
+    predict: bool = typer.Option(False, "--predict", help="Prewarm the workspaces usually started within --ahead minutes from now."),
+    ahead: int = typer.Option(PREWARM_AHEAD_MINUTES, "--ahead", help="Minutes to look ahead with --predict."),
+    libs: bool = typer.Option(False, "--libs", help="Also read ahead the shared libraries of executables (Linux, via ldd)."),
+    jobs: Optional[int] = typer.Option(None, "--jobs", "-j", help="Max files read ahead concurrently."),
+    report: bool = typer.Option(False, "--report", help="Compare spawn times (fork/exec) after a prewarm with cold ones instead."),
+):
+    """Read workspace files into the OS page cache so the next start is warm."""
+    from .utils import format_bytes
+
+    console = get_console()
+    manager = get_manager()
+    if report:
+        from rich.table import Table
+
+        rows = manager.get_prewarm_report(names or ())
+        if not rows:
+            console.print("[yellow]No launch timings recorded yet.[/yellow]")
+            return
+        table = Table(
+            title="Spawn time per file: cold vs. after a prewarm",
+            caption="Fork/exec only; the app's own loading afterwards isn't timed.",
+        )
+        table.add_column("Workspace", style="cyan", no_wrap=True)
+        table.add_column("Cold runs", justify="right", style="magenta")
+        table.add_column("Cold", justify="right")
+        table.add_column("Warm runs", justify="right", style="magenta")
+        table.add_column("Warm", justify="right")
+        table.add_column("Delta", justify="right")
+        for row in rows:
+            delta = row["delta"]
+            if delta is None:
+                delta_text = "-"
+            else:
+                color = "green" if delta < -0.05 else "red" if delta > 0.05 else "white"
+                delta_text = f"[{color}]{delta:+.0%}[/{color}]"
+            table.add_row(
+                row["name"],
+                str(row["cold_runs"]),
+                f"{row['cold_mean'] * 1000:.1f} ms" if row["cold_mean"] is not None else "-",
+                str(row["warm_runs"]),
+                f"{row['warm_mean'] * 1000:.1f} ms" if row["warm_mean"] is not None else "-",
+                delta_text,
+            )
+        console.print(table)
+        return
+
+    names = list(names or [])
+    if predict:
+        predicted = manager.predict_prewarm(ahead)
+        if not predicted and not names:
+            console.print(f"[yellow]No workspace usually started in the next {ahead} minutes needs prewarming.[/yellow]")
+            return
+        names += [name for name in predicted if name not in names]
+    if not names:
+        console.print("[red]Name the workspaces to prewarm, or pass --predict.[/red]")
+        raise typer.Exit(1)
+
+    result = manager.prewarm_workspaces(names, libraries=libs, max_workers=jobs)
+    if result is None:
+        raise typer.Exit(1)
+    for path, error in result.errors.items():
+        console.print(f"[yellow]Could not read '{path}': {error}[/yellow]")
+    console.print(
+        f"[green]Prewarmed {', '.join(result.workspaces)}: {result.files} files, "
+        f"{format_bytes(result.bytes)} in {result.elapsed * 1000:.0f} ms.[/green]"
+    )
+
+@app.command()
+def daemon(
+    stop: bool = typer.Option(False, "--stop", help="Shut down the running daemon."),
+    status: bool = typer.Option(False, "--status", help="Report whether a daemon is running."),
+):
+    """Run the resident supervisor that serves start/stop/ls over a local socket."""
+    console = get_console()
+    if stop or status:
+        response = daemon_client.request("shutdown" if stop else "ping", timeout=5)
+        if response is None:
+            console.print("[yellow]No daemon is running.[/yellow]")
+        elif status:
+            data = response["data"]
+            console.print(f"Daemon running (pid {data['pid']}, {data['children']} tracked children).")
+        return
+
+    import socket
+    if not hasattr(socket, "AF_UNIX"):
+        console.print("[red]The daemon needs Unix domain sockets, which this platform lacks.[/red]")
+        raise typer.Exit(1)
+
+    from .daemon import QuickStartDaemon
+    try:
+        QuickStartDaemon(manager=get_manager()).serve()
+    except RuntimeError as e:
+        console.print(f"[red]{e}[/red]")
+        raise typer.Exit(1)
 
 if __name__ == "__main__":
     app()
@@ -0,0 +1,181 @@
+"""Keeping the database small and fast after years of use (`qs maintenance`).
+
+One run:
+
+1. drops rows left behind by workspaces that no longer exist, and
+   launcher_cache entries no workspace file refers to;
+2. folds finished sessions older than the retention window into per-day
+   usage_archive rows, optionally appending them to a (gzip) NDJSON
+   archive in `qs import` format first. Rollups and `qs stats` are
+   unaffected: they are rebuilt from raw sessions plus these summaries;
+3. gives freed pages back to the OS: an incremental vacuum, or a full
+   VACUUM the first time (to switch older databases to incremental
+   auto-vacuum), with `full`, and after archiving a large share of the
+   sessions (old sessions are spread over most pages, so deleting them
+   frees little until the table is rebuilt);
+4. refreshes the query planner statistics (PRAGMA optimize, or a full
+   ANALYZE with `full`) and truncates the WAL file.
+"""
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from .rollups import session_buckets
+from .tracing import span
+from .transfer import RESOURCE_FIELDS, open_text, write_records
+from .utils import format_utc_iso, now_epoch
+
+# Sessions archived per transaction, so a first run over a large history
+# doesn't hold the write lock for long
+ARCHIVE_BATCH = 5000
+
+# Archiving more than this share of the remaining sessions triggers a full VACUUM
+REBUILD_SHARE = 0.25
+
+# Tables keyed by workspace_id, cleared of rows whose workspace is gone
+_WORKSPACE_TABLES = ("workspace_usage", "usage_rollups", "usage_archive", "launch_timings",
+                     "resource_samples", "session_resources", "resource_policies",
+                     "active_processes", "workspace_files")
+
+UPSERT_ARCHIVE = """
+INSERT INTO usage_archive (workspace_id, day, sessions, seconds) VALUES (?, ?, ?, ?)
+ON CONFLICT (workspace_id, day) DO UPDATE SET
+    sessions = sessions + excluded.sessions,
+    seconds = seconds + excluded.seconds
+"""
+
+class MaintenanceReport:
+    """What a maintenance run did; sizes are bytes of the DB file plus its WAL."""
+    __slots__ = ("orphans", "cache_pruned", "archived", "vacuum", "size_before", "size_after", "elapsed")
+
+    def __init__(self):
+        self.orphans: Dict[str, int] = {}  # table -> rows removed
+        self.cache_pruned = 0
+        self.archived = 0                  # sessions folded into usage_archive
+        self.vacuum = "incremental"        # "incremental", "full" or "converted"
+        self.size_before = 0
+        self.size_after = 0
+        self.elapsed = 0.0
+
+def database_size(path) -> int:
+    total = 0
+    for suffix in ("", "-wal"):
+        try:
+            total += os.path.getsize(f"{path}{suffix}")
+        except OSError:
+            pass
+    return total
+
+def prune_orphans(conn, report: MaintenanceReport):
+    """Removes rows of deleted workspaces and unreferenced launcher_cache entries."""
+    for table in _WORKSPACE_TABLES:
+        count = conn.execute(
+            f"DELETE FROM {table} WHERE workspace_id NOT IN (SELECT id FROM workspaces)"
+        ).rowcount
+        if count:
+            report.orphans[table] = count
+    count = conn.execute(
+        "DELETE FROM workspace_file_deps WHERE file_id NOT IN (SELECT id FROM workspace_files) "
+        "OR depends_on_id NOT IN (SELECT id FROM workspace_files)"
+    ).rowcount
+    if count:
+        report.orphans["workspace_file_deps"] = count
+    report.cache_pruned = conn.execute(
+        "DELETE FROM launcher_cache WHERE entry NOT IN (SELECT file_path FROM workspace_files)"
+    ).rowcount
+
+def archive_sessions(db, cutoff: int, report: MaintenanceReport, out=None):
+    """Folds sessions that started before `cutoff` into usage_archive, ARCHIVE_BATCH at a time.
+
+    With `out` (a text stream) the removed sessions are first written to it
+    as `qs import` records, one per workspace and batch.
+    """
+    last_id = 0
+    while True:
+        with db.transaction() as conn:
+            rows = conn.execute(f"""
+                SELECT u.id, u.workspace_id, w.name, u.started_at, u.ended_at, u.duration_seconds,
+                       u.{", u.".join(RESOURCE_FIELDS)}
+                FROM workspace_usage u JOIN workspaces w ON w.id = u.workspace_id
+                WHERE u.id > ? AND u.started_at < ?
+                ORDER BY u.id
+                LIMIT ?
+            """, (last_id, cutoff, ARCHIVE_BATCH)).fetchall()
+            if not rows:
+                return
+
+            days: Dict[tuple, list] = {}
+            records: Dict[str, dict] = {}
+            for _, workspace_id, name, started_at, ended_at, duration, *resources in rows:
+                # Rows without a usable end are dropped, as rebuild_rollups() ignores them
+                if isinstance(started_at, int) and isinstance(ended_at, int):
+                    for _, day, sessions, seconds in session_buckets(started_at, ended_at, ("day",)):
+                        entry = days.setdefault((workspace_id, day), [0, 0])
+                        entry[0] += sessions
+                        entry[1] += seconds
+                if out is not None:
+                    session = {"started_at": format_utc_iso(started_at), "ended_at": format_utc_iso(ended_at),
+                               "duration_seconds": duration}
+                    session.update((field, value) for field, value in zip(RESOURCE_FIELDS, resources)
+                                   if value is not None)
+                    records.setdefault(name, {"name": name, "files": [], "usage": []})["usage"].append(session)
+
+            if out is not None:
+                # Written before the rows go; a failed commit leaves duplicates
+                # in the archive, never gaps
+                write_records(records.values(), out)
+                out.flush()
+            conn.executemany(UPSERT_ARCHIVE, [(wid, day, n, secs) for (wid, day), (n, secs) in days.items()])
+            conn.execute(
+                "DELETE FROM workspace_usage WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps([row[0] for row in rows]),)
+            )
+            report.archived += len(rows)
+            last_id = rows[-1][0]
+
+def run(db, retention_days: int, archive_path: Optional[str] = None, full: bool = False) -> MaintenanceReport:
+    """Runs every maintenance step against a DatabaseManager; see the module docstring."""
+    report = MaintenanceReport()
+    t0 = time.perf_counter()
+    conn = db.connect()
+    report.size_before = database_size(db.db_path)
+
+    with span("maintenance.prune"), db.transaction() as tx:
+        prune_orphans(tx, report)
+
+    if retention_days > 0:
+        cutoff = now_epoch() - retention_days * 86400
+        with span("maintenance.archive"):
+            if archive_path:
+                # Appending to a .gz adds a gzip member; readers see one stream
+                with open_text(archive_path, "a") as out:
+                    archive_sessions(db, cutoff, report, out)
+            else:
+                archive_sessions(db, cutoff, report)
+
+    with span("maintenance.vacuum"):
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Switching an existing database needs one full rebuild
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            report.vacuum = "converted"
+        elif full or report.archived > REBUILD_SHARE * conn.execute(
+            "SELECT COUNT(*) FROM workspace_usage"
+        ).fetchone()[0]:
+            conn.execute("VACUUM")
+            report.vacuum = "full"
+        else:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+
+    with span("maintenance.analyze"):
+        if full:
+            conn.execute("ANALYZE")
+        else:
+            conn.execute("PRAGMA analysis_limit=1000")
+            conn.execute("PRAGMA optimize")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    report.size_after = database_size(db.db_path)
+    report.elapsed = time.perf_counter() - t0
+    return report
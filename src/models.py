@@ -0,0 +1,44 @@
+"""Typed records of workspace definitions, as handed out by the library API.
+
+A definition is what `qs start` needs to launch a workspace: its files,
+their launch options, dependencies and resource policies. Usage figures
+(activation counts, sessions) change with every start and are not part
+of it; see WorkspaceManager.iter_workspaces() and get_sessions().
+
+Instances are shared by the definition cache (src/definitions.py):
+treat them as read-only.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from .policy import ResourcePolicy
+
+class WorkspaceFile:
+    """One entry of a workspace: a program, document or command line."""
+    __slots__ = ("id", "path", "launch_order", "args", "cwd", "env", "depends_on", "policy")
+
+    def __init__(self, id: int, path: str, launch_order: int = 0, args: Optional[List[str]] = None,
+                 cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                 depends_on: Tuple[int, ...] = (), policy: Optional[ResourcePolicy] = None):
+        self.id = id
+        self.path = path
+        self.launch_order = launch_order
+        self.args = args or []            # extra arguments
+        self.cwd = cwd
+        self.env = env or {}              # overrides of the inherited environment
+        self.depends_on = depends_on      # ids of files that must launch first
+        self.policy = policy              # effective policy (workspace-wide merged with own)
+
+    def __repr__(self) -> str:
+        return f"WorkspaceFile(id={self.id}, path={self.path!r}, launch_order={self.launch_order})"
+
+class Workspace:
+    """A workspace definition; `files` are in the order they were added."""
+    __slots__ = ("id", "name", "files")
+
+    def __init__(self, id: int, name: str, files: Tuple[WorkspaceFile, ...] = ()):
+        self.id = id
+        self.name = name
+        self.files = files
+
+    def __repr__(self) -> str:
+        return f"Workspace(id={self.id}, name={self.name!r}, files={len(self.files)})"
@@ -0,0 +1,242 @@
+"""Resource policies (niceness, I/O priority, CPU affinity, rlimits) for launched files.
+
+A policy can be set for a whole workspace and overridden per file, field by
+field. It is applied in the child between fork and exec, so everything the
+application spawns inherits it, and can be re-applied to running process
+trees. Linux supports every field; elsewhere unsupported ones are skipped.
+"""
+import json
+import os
+import sys
+from typing import Callable, List, Optional
+
+FIELDS = ("nice", "ionice_class", "ionice_level", "cpu_affinity", "rlimit_as", "rlimit_nofile")
+
+# Names accepted by `qs limit --ionice`, with their ioprio class numbers
+IONICE_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+# ioprio_set(2) syscall numbers; the standard library has no wrapper
+_IOPRIO_SET_SYSCALLS = {"x86_64": 251, "i686": 289, "i386": 289, "aarch64": 30,
+                        "armv7l": 314, "ppc64le": 273, "s390x": 282}
+
+def _ioprio_setter(ioclass: int, level: int) -> Optional[Callable[[], None]]:
+    """Returns a function setting the calling process's I/O priority, or None if unsupported."""
+    if not sys.platform.startswith("linux"):
+        return None
+    number = _IOPRIO_SET_SYSCALLS.get(os.uname().machine)
+    if number is None:
+        return None
+    import ctypes
+    libc = ctypes.CDLL(None, use_errno=True)
+    value = (ioclass << 13) | level  # IOPRIO_PRIO_VALUE
+
+    def set_ioprio():
+        if libc.syscall(number, 1, 0, value) != 0:  # IOPRIO_WHO_PROCESS, self
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+    return set_ioprio
+
+class ResourcePolicy:
+    """One policy; fields left as None are not enforced."""
+    __slots__ = FIELDS
+
+    def __init__(self, nice: Optional[int] = None, ionice_class: Optional[str] = None,
+                 ionice_level: Optional[int] = None, cpu_affinity: Optional[List[int]] = None,
+                 rlimit_as: Optional[int] = None, rlimit_nofile: Optional[int] = None):
+        self.nice = nice
+        self.ionice_class = ionice_class
+        self.ionice_level = ionice_level
+        self.cpu_affinity = cpu_affinity
+        self.rlimit_as = rlimit_as          # bytes of address space
+        self.rlimit_nofile = rlimit_nofile  # open file descriptors
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "ResourcePolicy":
+        """Builds a policy from the FIELDS columns of resource_policies."""
+        values = dict(zip(FIELDS, row))
+        if values["cpu_affinity"]:
+            values["cpu_affinity"] = json.loads(values["cpu_affinity"])
+        return cls(**values)
+
+    def to_row(self) -> tuple:
+        return tuple(
+            json.dumps(value) if field == "cpu_affinity" and value is not None else value
+            for field, value in self.as_dict().items()
+        )
+
+    def as_dict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, field) is None for field in FIELDS)
+
+    def merged(self, override: Optional["ResourcePolicy"]) -> "ResourcePolicy":
+        """This policy with every field `override` sets replaced by its value."""
+        values = self.as_dict()
+        if override is not None:
+            values.update((k, v) for k, v in override.as_dict().items() if v is not None)
+        return ResourcePolicy(**values)
+
+    def describe(self) -> str:
+        parts = []
+        if self.nice is not None:
+            parts.append(f"nice {self.nice}")
+        if self.ionice_class is not None:
+            level = f":{self.ionice_level}" if self.ionice_level is not None and self.ionice_class != "idle" else ""
+            parts.append(f"ionice {self.ionice_class}{level}")
+        if self.cpu_affinity:
+            parts.append(f"cpus {format_cpus(self.cpu_affinity)}")
+        if self.rlimit_as is not None:
+            parts.append(f"max memory {format_size(self.rlimit_as)}")
+        if self.rlimit_nofile is not None:
+            parts.append(f"max files {self.rlimit_nofile}")
+        return ", ".join(parts) or "none"
+
+    def preexec_fn(self) -> Optional[Callable[[], None]]:
+        """Returns a function applying the policy in a freshly forked child, or None.
+
+        preexec_fn isn't safe while other threads are working (the child
+        could block on a lock one of them held at fork), so the launcher
+        spawns files with a policy on its own thread while no other launch
+        is running. Everything is still computed up front and the child
+        only makes plain system calls. The I/O class is set with a raw ioprio_set
+        syscall; where its number isn't known, needs_ionice_after_spawn()
+        tells the caller to set it from the parent instead.
+        """
+        if os.name == "nt" or self.is_empty():
+            return None
+        import resource
+
+        nice = self.nice
+        cpus = self.cpu_affinity if hasattr(os, "sched_setaffinity") else None
+        limits = []
+        for field, limit_id in (("rlimit_as", getattr(resource, "RLIMIT_AS", None)),
+                                ("rlimit_nofile", resource.RLIMIT_NOFILE)):
+            value = getattr(self, field)
+            if value is not None and limit_id is not None:
+                hard = resource.getrlimit(limit_id)[1]
+                limits.append((limit_id, (value if hard == resource.RLIM_INFINITY else min(value, hard), hard)))
+        set_ioprio = None
+        if self.ionice_class is not None:
+            level = 0 if self.ionice_class == "idle" else (self.ionice_level if self.ionice_level is not None else 4)
+            set_ioprio = _ioprio_setter(IONICE_CLASSES[self.ionice_class], level)
+        if nice is None and not cpus and not limits and set_ioprio is None:
+            return None
+
+        def apply():
+            if nice is not None:
+                os.setpriority(os.PRIO_PROCESS, 0, nice)
+            if set_ioprio is not None:
+                set_ioprio()
+            if cpus:
+                os.sched_setaffinity(0, cpus)
+            for limit_id, value in limits:
+                resource.setrlimit(limit_id, value)
+        return apply
+
+    def needs_ionice_after_spawn(self) -> bool:
+        """True if the I/O class can't be set before exec on this machine."""
+        if self.ionice_class is None or not sys.platform.startswith("linux"):
+            return False
+        return os.uname().machine not in _IOPRIO_SET_SYSCALLS
+
+    def apply_ionice(self, pid: int):
+        """Sets the I/O scheduling class of `pid` from outside (Linux only; no-op otherwise)."""
+        if self.ionice_class is None:
+            return
+        import psutil
+        if not hasattr(psutil.Process, "ionice") or not hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+            return
+        ioclass = IONICE_CLASSES[self.ionice_class]
+        level = None if self.ionice_class == "idle" else self.ionice_level
+        psutil.Process(pid).ionice(ioclass, level)
+
+    def apply_to(self, proc) -> None:
+        """Applies the policy to a running psutil.Process; raises psutil.Error."""
+        import psutil
+        if self.nice is not None:
+            proc.nice(self.nice)
+        if self.ionice_class is not None and hasattr(proc, "ionice"):
+            level = None if self.ionice_class == "idle" else self.ionice_level
+            proc.ionice(IONICE_CLASSES[self.ionice_class], level)
+        if self.cpu_affinity and hasattr(proc, "cpu_affinity"):
+            proc.cpu_affinity(self.cpu_affinity)
+        if hasattr(proc, "rlimit"):
+            for value, limit_id in ((self.rlimit_as, getattr(psutil, "RLIMIT_AS", None)),
+                                    (self.rlimit_nofile, getattr(psutil, "RLIMIT_NOFILE", None))):
+                if value is not None and limit_id is not None:
+                    hard = proc.rlimit(limit_id)[1]
+                    proc.rlimit(limit_id, (value if hard == psutil.RLIM_INFINITY else min(value, hard), hard))
+
+def policy_from_dict(values: dict) -> ResourcePolicy:
+    """Builds a policy from an export record's "policy" object; raises ValueError."""
+    unknown = set(values) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"unknown policy fields: {', '.join(sorted(unknown))}")
+    policy = ResourcePolicy(**values)
+    if policy.ionice_class is not None and policy.ionice_class not in IONICE_CLASSES:
+        raise ValueError(f"invalid ionice_class '{policy.ionice_class}'")
+    return policy
+
+def parse_cpus(text: str) -> List[int]:
+    """Parses a CPU list such as "0-3,6" into [0, 1, 2, 3, 6]."""
+    cpus = set()
+    try:
+        for part in text.split(","):
+            part = part.strip()
+            if "-" in part:
+                first, last = part.split("-", 1)
+                cpus.update(range(int(first), int(last) + 1))
+            elif part:
+                cpus.add(int(part))
+    except ValueError:
+        raise ValueError(f"Invalid CPU list '{text}' (expected e.g. 0-3,6).")
+    if not cpus or min(cpus) < 0:
+        raise ValueError(f"Invalid CPU list '{text}' (expected e.g. 0-3,6).")
+    return sorted(cpus)
+
+def format_cpus(cpus: List[int]) -> str:
+    """Formats [0, 1, 2, 3, 6] back as "0-3,6"."""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(a) if a == b else f"{a}-{b}" for a, b in ranges)
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+def parse_size(text: str) -> int:
+    """Parses a byte size such as "512M" or "4G" (binary units)."""
+    value = text.strip().upper()
+    for suffix in ("IB", "B"):
+        if value.endswith(suffix):
+            value = value[:-len(suffix)]
+            break
+    unit = value[-1:] if value[-1:] in _SIZE_UNITS else ""
+    try:
+        number = float(value[:-1] if unit else value)
+    except ValueError:
+        raise ValueError(f"Invalid size '{text}' (expected e.g. 512M or 4G).")
+    return int(number * _SIZE_UNITS[unit])
+
+def format_size(count: int) -> str:
+    for unit in ("T", "G", "M", "K"):
+        if count >= _SIZE_UNITS[unit] and count % _SIZE_UNITS[unit] == 0:
+            return f"{count // _SIZE_UNITS[unit]}{unit}"
+    return str(count)
+
+def parse_ionice(text: str) -> tuple:
+    """Parses "idle", "best-effort" or "best-effort:4" into (class, level).
+
+    The level defaults to 4, the kernel's default; idle has no levels (0).
+    """
+    name, _, level = text.partition(":")
+    if name not in IONICE_CLASSES:
+        raise ValueError(f"Invalid I/O class '{name}' (expected one of: {', '.join(IONICE_CLASSES)}).")
+    if not level:
+        return name, 0 if name == "idle" else 4
+    if name == "idle" or not level.isdigit() or not 0 <= int(level) <= 7:
+        raise ValueError(f"Invalid I/O priority '{text}' (levels 0-7, none for idle).")
+    return name, int(level)
@@ -0,0 +1,151 @@
+"""Reading workspace files into the OS page cache before they are launched (`qs prewarm`).
+
+A cold launch waits on the disk for the program, its shared libraries and
+the documents it opens. prewarm() asks the kernel to read those files
+ahead with posix_fadvise(POSIX_FADV_WILLNEED), which only queues the reads
+and returns, from a bounded pool of threads. Where fadvise is missing
+(macOS, Windows) the files are read through instead. With `libraries`,
+the shared libraries of ELF executables (as listed by ldd) are included.
+
+predict() picks the workspaces worth prewarming now from workspace_usage:
+those started in the coming minutes of the day (local time) on enough of
+the recent days. Each prewarm is recorded on the workspace, and launches
+that follow one are marked in launch_timings, so `qs prewarm --report`
+can compare them with cold launches.
+"""
+import os
+import subprocess
+import time
+from typing import Dict, Iterable, List, Optional
+
+from .config import PREWARM_HISTORY_DAYS, PREWARM_MIN_DAYS, PREWARM_VALID_SECONDS, PREWARM_WORKERS
+from .resolver import SHELL, Resolution
+from .tracing import span
+
+# Read size of the fallback when the OS has no posix_fadvise()
+_READ_CHUNK = 1 << 20
+
+class PrewarmReport:
+    """What a prewarm did; `bytes` is the total size of the files read ahead."""
+    __slots__ = ("workspaces", "files", "bytes", "errors", "elapsed")
+
+    def __init__(self):
+        self.workspaces: List[str] = []
+        self.files = 0
+        self.bytes = 0
+        self.errors: Dict[str, str] = {}  # path -> reason
+        self.elapsed = 0.0
+
+def targets(resolution: Resolution, args: Iterable[str] = (), cwd: Optional[str] = None) -> List[str]:
+    """The files a launch of `resolution` with `args` reads.
+
+    That is the program, script or document, plus arguments naming files
+    (relative to `cwd`). For `#!/usr/bin/env interpreter` scripts the
+    interpreter is looked up on PATH. Shell command lines are opaque and
+    yield nothing.
+    """
+    if not resolution.ok or resolution.kind == SHELL:
+        return []
+    argv = resolution.argv
+    found = [path for path in (os.path.join(cwd or "", arg) for arg in [*argv, *args]) if os.path.isfile(path)]
+    if len(argv) > 1 and os.path.basename(argv[0]) == "env":
+        import shutil
+        interpreter = shutil.which(argv[1])
+        if interpreter:
+            found.append(interpreter)
+    return [os.path.realpath(path) for path in found]
+
+def shared_libraries(path: str) -> List[str]:
+    """The shared libraries the dynamic loader maps for ELF executable `path` (Linux).
+
+    Asks ldd; anything that isn't a dynamically linked ELF file, or a
+    system without ldd, gives an empty list.
+    """
+    try:
+        with open(path, "rb") as f:
+            if f.read(4) != b"\x7fELF":
+                return []
+        output = subprocess.run(["ldd", path], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    libraries = []
+    for line in output.splitlines():
+        parts = line.split()
+        if "=>" in parts:
+            parts = parts[parts.index("=>") + 1:]
+        if parts and parts[0].startswith("/"):
+            libraries.append(os.path.realpath(parts[0]))
+    return libraries
+
+def read_ahead(path: str) -> int:
+    """Starts reading `path` into the page cache; returns its size in bytes."""
+    fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        size = os.fstat(fd).st_size
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, size, os.POSIX_FADV_WILLNEED)
+        else:
+            while os.read(fd, _READ_CHUNK):
+                pass
+        return size
+    finally:
+        os.close(fd)
+
+def prewarm(paths: Iterable[str], libraries: bool = False,
+            max_workers: int = PREWARM_WORKERS) -> PrewarmReport:
+    """Reads `paths` (and with `libraries` their shared libraries) ahead, at most `max_workers` at a time."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    report = PrewarmReport()
+    t0 = time.perf_counter()
+    paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        if libraries:
+            with span("prewarm.libraries", files=len(paths)):
+                for found in pool.map(shared_libraries, list(paths)):
+                    paths.extend(found)
+                paths = list(dict.fromkeys(paths))
+
+        def one(path: str):
+            try:
+                return path, read_ahead(path), None
+            except OSError as e:
+                return path, 0, e.strerror or type(e).__name__
+
+        with span("prewarm.read_ahead", files=len(paths)):
+            for path, size, error in pool.map(one, paths):
+                if error is None:
+                    report.files += 1
+                    report.bytes += size
+                else:
+                    report.errors[path] = error
+    report.elapsed = time.perf_counter() - t0
+    return report
+
+def predict(conn, now: int, ahead_minutes: int, history_days: int = PREWARM_HISTORY_DAYS,
+            min_days: int = PREWARM_MIN_DAYS) -> List[str]:
+    """Names of the workspaces usually started within `ahead_minutes` of `now`.
+
+    A workspace qualifies when, on at least `min_days` of the last
+    `history_days` days, a session started between now and now +
+    `ahead_minutes` in local time of day. Running workspaces and those
+    prewarmed recently, and not launched since, are left out. The most
+    regular come first.
+    """
+    local = time.localtime(now)
+    minute = local.tm_hour * 60 + local.tm_min
+    rows = conn.execute("""
+        SELECT w.name
+        FROM workspace_usage u JOIN workspaces w ON w.id = u.workspace_id
+        WHERE u.started_at >= ?
+          AND (CAST(strftime('%H', u.started_at, 'unixepoch', 'localtime') AS INTEGER) * 60
+               + CAST(strftime('%M', u.started_at, 'unixepoch', 'localtime') AS INTEGER)
+               - ? + 1440) % 1440 < ?
+          AND NOT EXISTS (SELECT 1 FROM active_processes ap WHERE ap.workspace_id = w.id)
+          AND (w.prewarmed_at IS NULL OR w.prewarmed_at < ?
+               OR w.prewarmed_at < IFNULL(w.last_activated_at, 0))
+        GROUP BY w.id
+        HAVING COUNT(DISTINCT date(u.started_at, 'unixepoch', 'localtime')) >= ?
+        ORDER BY COUNT(DISTINCT date(u.started_at, 'unixepoch', 'localtime')) DESC, w.name
+    """, (now - history_days * 86400, minute, ahead_minutes, now - PREWARM_VALID_SECONDS, min_days)).fetchall()
+    return [name for (name,) in rows]
@@ -0,0 +1,207 @@
+import time
+from typing import Dict, Iterable, List, Optional
+
+import psutil
+
+from .config import STOP_KILL_TIMEOUT
+from .tracing import span
+
+class ProcessTable:
+    """A single snapshot of the OS process table, indexed by pid and parent.
+
+    Building every tracked tree from one snapshot avoids rescanning /proc
+    (which `Process.children(recursive=True)` does) once per tracked PID.
+    """
+
+    def __init__(self):
+        self.processes: Dict[int, psutil.Process] = {}
+        self.children: Dict[int, List[int]] = {}
+        with span("psutil.scan"):
+            for proc in psutil.process_iter(["ppid"]):
+                self.processes[proc.pid] = proc
+                self.children.setdefault(proc.info["ppid"], []).append(proc.pid)
+
+    def get(self, pid: int) -> Optional[psutil.Process]:
+        return self.processes.get(pid)
+
+    def tree(self, pid: int) -> List[psutil.Process]:
+        """Returns the process and all of its descendants (empty if it's gone)."""
+        if pid not in self.processes:
+            return []
+        result, stack, seen = [], [pid], set()
+        while stack:
+            current = stack.pop()
+            if current in seen or current not in self.processes:
+                continue
+            seen.add(current)
+            result.append(self.processes[current])
+            stack.extend(self.children.get(current, ()))
+        return result
+
+# Slack when comparing a recorded create time with the one the OS reports
+CREATE_TIME_TOLERANCE = 1.0
+
+def is_same_process(create_time: Optional[float], recorded_create_time: Optional[float],
+                    launched_at: Optional[float]) -> bool:
+    """Tells whether a live process is the one we recorded, not a PID reuse.
+
+    Rows with a recorded create time must match it. Older rows without one
+    only have the launch timestamp: a process created after that can't be ours.
+    """
+    if create_time is None:
+        return False
+    if recorded_create_time is not None:
+        return abs(create_time - recorded_create_time) <= CREATE_TIME_TOLERANCE
+    if launched_at is not None:
+        return create_time <= launched_at + CREATE_TIME_TOLERANCE
+    return True
+
+def live_create_times(pids: Iterable[int]) -> Dict[int, float]:
+    """Returns {pid: create_time} for those of `pids` that are still running.
+
+    One listing of the process table decides which PIDs exist; only those
+    that do are inspected further. Zombies count as not running.
+    """
+    wanted = set(pids)
+    result = {}
+    with span("psutil.live_create_times", pids=len(wanted)):
+        for pid in wanted.intersection(psutil.pids()):
+            try:
+                proc = psutil.Process(pid)
+                with proc.oneshot():
+                    if proc.status() != psutil.STATUS_ZOMBIE:
+                        result[pid] = proc.create_time()
+            except psutil.Error:
+                pass
+    return result
+
+class TreeUsage:
+    """Resources used by one process tree at a sampling instant."""
+    __slots__ = ("processes", "cpu_percent", "rss", "threads", "fds")
+
+    def __init__(self):
+        self.processes = 0
+        self.cpu_percent = 0.0   # summed over the tree; 100 = one full core
+        self.rss = 0             # bytes
+        self.threads = 0
+        self.fds = 0             # open descriptors (handles on Windows)
+
+    def add(self, other: "TreeUsage"):
+        self.processes += other.processes
+        self.cpu_percent += other.cpu_percent
+        self.rss += other.rss
+        self.threads += other.threads
+        self.fds += other.fds
+
+def sample_tree(table: ProcessTable, pid: int) -> TreeUsage:
+    """Reads CPU, memory, thread and descriptor use of the tree rooted at `pid`.
+
+    Each process is read under oneshot(), so its /proc files are parsed once.
+    CPU% is measured since the previous sample of the same process:
+    process_iter() hands back the same Process objects on every scan, so
+    the first sample of a process reads 0.
+    """
+    usage = TreeUsage()
+    for proc in table.tree(pid):
+        try:
+            with proc.oneshot():
+                cpu = proc.cpu_percent(None)
+                rss = proc.memory_info().rss
+                threads = proc.num_threads()
+                fds = proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+        except psutil.Error:
+            continue
+        usage.processes += 1
+        usage.cpu_percent += cpu
+        usage.rss += rss
+        usage.threads += threads
+        usage.fds += fds
+    return usage
+
+class StopReport:
+    """Outcome of terminate_trees(); times are seconds since signalling began."""
+    __slots__ = ("exited", "killed", "survivors", "errors", "elapsed")
+
+    def __init__(self):
+        self.exited: Dict[int, float] = {}    # pid -> when it exited
+        self.killed: List[int] = []           # pids that needed SIGKILL
+        self.survivors: List[int] = []        # pids still alive after kill()
+        self.errors: Dict[int, str] = {}      # pid -> why it couldn't be signalled
+        self.elapsed = 0.0
+
+def terminate_trees(root_pids: Iterable[int], grace: float,
+                    table: Optional[ProcessTable] = None) -> StopReport:
+    """Terminates the process trees rooted at `root_pids`, escalating to kill().
+
+    All trees are signalled at once and waited on together: processes get
+    `grace` seconds to exit after terminate(), then the rest are killed.
+    Returns as soon as every process has exited. A zombie counts as exited,
+    because only its parent can reap it.
+    """
+    table = table or ProcessTable()
+    report = StopReport()
+
+    targets: Dict[int, psutil.Process] = {}
+    for pid in root_pids:
+        for proc in table.tree(pid):
+            targets[proc.pid] = proc
+
+    t0 = time.perf_counter()
+
+    def on_exit(proc: psutil.Process):
+        report.exited[proc.pid] = time.perf_counter() - t0
+
+    def signal(procs: List[psutil.Process], kill: bool) -> List[psutil.Process]:
+        signalled = []
+        for proc in procs:
+            try:
+                if kill:
+                    proc.kill()
+                else:
+                    proc.terminate()
+                signalled.append(proc)
+            except psutil.NoSuchProcess:
+                on_exit(proc)
+            except psutil.AccessDenied as e:
+                report.errors[proc.pid] = str(e)
+        return signalled
+
+    def still_running(procs: List[psutil.Process]) -> List[psutil.Process]:
+        # A zombie has exited but waits for its parent to reap it; that's
+        # as stopped as we can make it.
+        running = []
+        for proc in procs:
+            try:
+                if proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE:
+                    running.append(proc)
+                    continue
+            except psutil.NoSuchProcess:
+                pass
+            on_exit(proc)
+        return running
+
+    def wait(procs: List[psutil.Process], timeout: float) -> List[psutil.Process]:
+        # Like psutil.wait_procs(), which would wait on zombies until their
+        # parent reaps them (and would reap the daemon's own children behind
+        # the backs of their Popen handles)
+        deadline = time.perf_counter() + timeout
+        delay = 0.001
+        alive = still_running(procs)
+        while alive:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.04)
+            alive = still_running(alive)
+        return alive
+
+    with span("psutil.terminate", processes=len(targets)):
+        alive = wait(signal(list(targets.values()), kill=False), grace)
+    if alive:
+        report.killed = [proc.pid for proc in alive]
+        with span("psutil.kill", processes=len(alive)):
+            report.survivors = [proc.pid for proc in wait(signal(alive, kill=True), STOP_KILL_TIMEOUT)]
+
+    report.elapsed = time.perf_counter() - t0
+    return report
@@ -0,0 +1,200 @@
+"""Working out how to launch a workspace file without going through a shell.
+
+Each entry is classified once as one of:
+
+* executable: a file we may exec directly
+* script:     a non-executable file with a `#!` line, run with that interpreter
+* document:   anything else that exists (files, folders), handed to the
+              document opener (QS_OPEN_WITH, else xdg-open / open)
+* command:    not a path but a command line such as `code --new-window`, whose
+              program is looked up on PATH
+* shell:      a command line using shell syntax (pipes, `&&`, `$VAR`, ...),
+              the only kind still run through the shell
+
+Classifications are cached in the `launcher_cache` table together with the
+mtime and inode of the file they were derived from; a cached entry is
+reused for as long as one stat() of that file still matches. A relative
+entry means something else in every directory, so it is resolved against
+the directory it launches in (see base_dir()) and cached per directory.
+"""
+import json
+import os
+import shlex
+import stat
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+EXECUTABLE = "executable"
+SCRIPT = "script"
+DOCUMENT = "document"
+COMMAND = "command"
+SHELL = "shell"
+
+# Characters that only make sense to a shell; entries using them keep
+# going through one
+SHELL_CHARS = set("|&;<>()$`*?[]{}!~") if os.name != "nt" else set("|&<>^%")
+
+class Resolution:
+    """How to launch one entry. `error` is set when it can't be launched."""
+    __slots__ = ("entry", "base", "kind", "argv", "target", "mtime_ns", "inode", "error", "cached")
+
+    def __init__(self, entry: str, kind: Optional[str] = None, argv: Optional[List[str]] = None,
+                 target: Optional[str] = None, mtime_ns: Optional[int] = None,
+                 inode: Optional[int] = None, error: Optional[str] = None, base: str = ""):
+        self.entry = entry
+        self.base = base              # directory a relative entry was resolved in ("" if absolute)
+        self.kind = kind
+        self.argv = argv or []        # program and leading arguments (not the opener)
+        self.target = target          # file whose stat() validates the cache entry
+        self.mtime_ns = mtime_ns
+        self.inode = inode
+        self.error = error
+        self.cached = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def command(self, args: Iterable[str] = ()) -> List[str]:
+        """The argv to exec, with the document opener and extra `args` applied."""
+        args = list(args)
+        if self.kind == DOCUMENT:
+            return document_opener() + self.argv + args
+        return self.argv + args
+
+@lru_cache(maxsize=1)
+def document_opener() -> List[str]:
+    """Command that opens documents, from QS_OPEN_WITH or the platform default."""
+    configured = os.environ.get("QS_OPEN_WITH")
+    if configured:
+        return shlex.split(configured)
+    if sys.platform == "darwin":
+        return ["open"]
+    if os.name == "nt":
+        return []  # handled by the shell's `start` association
+    return ["xdg-open"]
+
+def _which(program: str, search_path: Optional[str] = None) -> Optional[str]:
+    import shutil
+    return shutil.which(program, path=search_path)
+
+def _read_shebang(path: str) -> Optional[List[str]]:
+    try:
+        with open(path, "rb") as f:
+            head = f.readline(256)
+    except OSError:
+        return None
+    if not head.startswith(b"#!"):
+        return None
+    # Like the kernel: interpreter plus at most one argument
+    parts = head[2:].decode("utf-8", "replace").strip().split(None, 1)
+    return parts or None
+
+def base_dir(entry: str, cwd: Optional[str] = None) -> str:
+    """The directory a relative `entry` launched in `cwd` is resolved against.
+
+    That is `cwd` made absolute, or the current directory; "" for entries
+    that are absolute paths. (entry, base_dir) pairs key launcher_cache.
+    """
+    if os.path.isabs(os.path.expanduser(entry)):
+        return ""
+    return os.path.abspath(cwd or os.curdir)
+
+def classify(entry: str, base: str = "", search_path: Optional[str] = None) -> Resolution:
+    """Classifies an entry from scratch (stat, maybe a shebang read or PATH lookup).
+
+    A relative entry is taken relative to `base` (see base_dir()).
+    Commands are looked up on `search_path` (a PATH value), by default
+    this process's PATH.
+    """
+    resolution = _classify(entry, base, search_path)
+    resolution.base = base
+    return resolution
+
+def _classify(entry: str, base: str, search_path: Optional[str]) -> Resolution:
+    path = os.path.abspath(os.path.join(base, os.path.expanduser(entry)))
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+
+    if st is not None:
+        stamp = {"target": path, "mtime_ns": st.st_mtime_ns, "inode": st.st_ino}
+        if stat.S_ISDIR(st.st_mode):
+            return Resolution(entry, DOCUMENT, [path], **stamp)
+        if os.name == "nt":
+            exts = os.environ.get("PATHEXT", ".COM;.EXE;.BAT;.CMD").lower().split(";")
+            kind = EXECUTABLE if os.path.splitext(path)[1].lower() in exts else DOCUMENT
+            return Resolution(entry, kind, [path], **stamp)
+        if os.access(path, os.X_OK):
+            return Resolution(entry, EXECUTABLE, [path], **stamp)
+        shebang = _read_shebang(path)
+        if shebang:
+            return Resolution(entry, SCRIPT, shebang + [path], **stamp)
+        return Resolution(entry, DOCUMENT, [path], **stamp)
+
+    if any(ch in SHELL_CHARS for ch in entry):
+        return Resolution(entry, SHELL, [entry])
+
+    try:
+        argv = shlex.split(entry, posix=os.name != "nt")
+    except ValueError as e:
+        return Resolution(entry, error=f"cannot parse command line: {e}")
+    program = _which(argv[0], search_path) if argv else None
+    if program is None:
+        return Resolution(entry, error="no such file or command")
+    st = os.stat(program)
+    return Resolution(entry, COMMAND, [program] + argv[1:], target=program,
+                      mtime_ns=st.st_mtime_ns, inode=st.st_ino)
+
+def is_current(row: tuple) -> bool:
+    """Tells whether a launcher_cache row still matches its target file (one stat)."""
+    _, _, target, mtime_ns, inode, _, _ = row
+    if target is None:
+        return True
+    try:
+        st = os.stat(target)
+    except OSError:
+        return False
+    return st.st_mtime_ns == mtime_ns and st.st_ino == inode
+
+def from_cache_row(row: tuple) -> Resolution:
+    entry, base, target, mtime_ns, inode, kind, argv = row
+    resolution = Resolution(entry, kind, json.loads(argv), target, mtime_ns, inode, base=base)
+    resolution.cached = True
+    return resolution
+
+def to_cache_row(resolution: Resolution) -> tuple:
+    return (resolution.entry, resolution.base, resolution.target, resolution.mtime_ns, resolution.inode,
+            resolution.kind, json.dumps(resolution.argv))
+
+UPSERT_CACHE = """
+INSERT INTO launcher_cache (entry, base, target, mtime_ns, inode, kind, argv) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (entry, base) DO UPDATE SET
+    target = excluded.target, mtime_ns = excluded.mtime_ns, inode = excluded.inode,
+    kind = excluded.kind, argv = excluded.argv
+"""
+
+def resolve_all(conn, keys: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Resolution]:
+    """Resolves (entry, base_dir) pairs, reusing valid launcher_cache rows and refreshing the rest.
+
+    Costs one SELECT, one stat() per entry with a valid cache row, and a
+    full classify() only for new or changed entries.
+    """
+    keys = list(dict.fromkeys(keys))
+    entries = list(dict.fromkeys(entry for entry, _ in keys))
+    marks = ",".join("?" * len(entries))
+    rows = conn.execute(
+        f"SELECT entry, base, target, mtime_ns, inode, kind, argv FROM launcher_cache WHERE entry IN ({marks})",
+        entries
+    ).fetchall() if entries else []
+
+    wanted = set(keys)
+    resolved = {row[:2]: from_cache_row(row) for row in rows if row[:2] in wanted and is_current(row)}
+    fresh = [classify(entry, base) for entry, base in keys if (entry, base) not in resolved]
+    successful = [to_cache_row(r) for r in fresh if r.ok]
+    if successful:
+        conn.executemany(UPSERT_CACHE, successful)
+    resolved.update(((r.entry, r.base), r) for r in fresh)
+    return resolved
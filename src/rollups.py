@@ -0,0 +1,98 @@
+import datetime
+from typing import Dict, Iterator, Tuple
+
+from .utils import epoch_to_utc
+
+# Usage rollups: per workspace, per period bucket, the number of sessions
+# started in the bucket and the seconds of use that fall inside it.
+# Buckets are UTC: day "2024-05-31", ISO week "2024-W22", month "2024-05".
+PERIODS = ("day", "week", "month")
+
+def bucket_key(period: str, moment: datetime.datetime) -> str:
+    """Returns the bucket of `period` that `moment` falls in."""
+    if period == "day":
+        return moment.strftime("%Y-%m-%d")
+    if period == "week":
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    if period == "month":
+        return moment.strftime("%Y-%m")
+    raise ValueError(f"Unknown period '{period}'")
+
+def _next_boundary(period: str, moment: datetime.datetime) -> datetime.datetime:
+    day = datetime.datetime(moment.year, moment.month, moment.day)
+    if period == "day":
+        return day + datetime.timedelta(days=1)
+    if period == "week":
+        return day + datetime.timedelta(days=7 - day.weekday())
+    if moment.month == 12:
+        return datetime.datetime(moment.year + 1, 1, 1)
+    return datetime.datetime(moment.year, moment.month + 1, 1)
+
+def session_buckets(started_at: int, ended_at: int,
+                    periods: Tuple[str, ...] = PERIODS) -> Iterator[Tuple[str, str, int, int]]:
+    """Splits a session (epoch seconds) into (period, bucket, sessions, seconds) contributions.
+
+    Seconds are spread over every bucket the session overlaps; the session
+    itself is counted once, in the bucket it started in. The day buckets of
+    a session add up exactly to its week and month buckets.
+    """
+    start, end = epoch_to_utc(started_at), epoch_to_utc(ended_at)
+    for period in periods:
+        cursor, first = start, True
+        while cursor < end:
+            boundary = min(_next_boundary(period, cursor), end)
+            yield period, bucket_key(period, cursor), int(first), int((boundary - cursor).total_seconds())
+            cursor, first = boundary, False
+        if first:
+            # Zero-length session: still counts as one
+            yield period, bucket_key(period, start), 1, 0
+
+def accumulate(totals: Dict[tuple, list], workspace_id: int, started_at: int, ended_at: int):
+    """Adds a session to an in-memory {(workspace_id, period, bucket): [sessions, seconds]} map."""
+    for period, bucket, sessions, seconds in session_buckets(started_at, ended_at):
+        entry = totals.setdefault((workspace_id, period, bucket), [0, 0])
+        entry[0] += sessions
+        entry[1] += seconds
+
+UPSERT_ROLLUP = """
+INSERT INTO usage_rollups (workspace_id, period, bucket, sessions, seconds)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (workspace_id, period, bucket) DO UPDATE SET
+    sessions = sessions + excluded.sessions,
+    seconds = seconds + excluded.seconds
+"""
+
+def rebuild_rollups(conn):
+    """Recomputes every rollup from the raw workspace_usage rows.
+
+    Sessions already folded into usage_archive by `qs maintenance` count
+    through their per-day summaries, which also determine their week and
+    month. Streams the sessions through a cursor; memory grows with the
+    number of buckets, not the number of sessions.
+    """
+    totals: Dict[tuple, list] = {}
+    cursor = conn.execute("SELECT workspace_id, started_at, ended_at FROM workspace_usage")
+    for workspace_id, started_at, ended_at in cursor:
+        # Skips unset ends, and text timestamps when migration 4 runs
+        # before migration 11 has converted them (11 rebuilds again)
+        if isinstance(started_at, int) and isinstance(ended_at, int):
+            accumulate(totals, workspace_id, started_at, ended_at)
+
+    # Migration 4 rebuilds before usage_archive exists
+    archived = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'usage_archive'").fetchone()
+    for workspace_id, day, sessions, seconds in conn.execute(
+        "SELECT workspace_id, day, sessions, seconds FROM usage_archive"
+    ) if archived else ():
+        moment = datetime.datetime.strptime(day, "%Y-%m-%d")
+        for period in PERIODS:
+            entry = totals.setdefault((workspace_id, period, bucket_key(period, moment)), [0, 0])
+            entry[0] += sessions
+            entry[1] += seconds
+
+    conn.execute("DELETE FROM usage_rollups")
+    conn.executemany(
+        "INSERT INTO usage_rollups (workspace_id, period, bucket, sessions, seconds) VALUES (?, ?, ?, ?, ?)",
+        [(*key, sessions, seconds) for key, (sessions, seconds) in totals.items()]
+    )
+    return len(totals)
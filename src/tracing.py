@@ -0,0 +1,119 @@
+"""Opt-in tracing of where a command spends its time.
+
+Enabled with `qs --trace FILE ...` or the QS_TRACE environment variable.
+Code marks phases with `span()`:
+
+    with span("spawn", path=path):
+        ...
+
+While tracing is off `span()` returns a shared no-op context manager, so an
+instrumented phase costs one function call and a global lookup. This module
+only imports the standard library and stays cheap on the start path.
+"""
+import sys
+import threading
+import time
+from typing import List, Optional
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer.events.append((self.name, self.start, end, threading.get_ident(), self.args))
+        return False
+
+class Tracer:
+    """Collects finished spans as (name, start, end, thread id, args)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.origin = time.perf_counter()
+        self.events: List[tuple] = []  # list.append is atomic, so worker threads can share it
+
+    def chrome_trace(self) -> dict:
+        """The spans as Chrome trace_event JSON (chrome://tracing, Perfetto)."""
+        import os
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": {key: str(value) for key, value in args.items()},
+            }
+            for name, start, end, tid, args in self.events
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self) -> str:
+        """Total/mean/max time per span name, slowest total first."""
+        totals = {}
+        for name, start, end, _, _ in self.events:
+            count, total, longest = totals.get(name, (0, 0.0, 0.0))
+            duration = end - start
+            totals[name] = (count + 1, total + duration, max(longest, duration))
+
+        width = max([len(name) for name in totals] + [4])
+        lines = [f"{'span':<{width}}  {'count':>6}  {'total ms':>9}  {'mean ms':>8}  {'max ms':>8}"]
+        for name, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{name:<{width}}  {count:>6}  {total * 1000:>9.2f}  {total / count * 1000:>8.3f}  {longest * 1000:>8.2f}"
+            )
+        lines.append(f"wall time: {(time.perf_counter() - self.origin) * 1000:.2f} ms")
+        return "\n".join(lines)
+
+    def write(self):
+        """Writes the trace: a summary table for "-", Chrome JSON otherwise."""
+        if self.path == "-":
+            sys.stderr.write(self.summary() + "\n")
+            return
+        import json
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+_tracer: Optional[Tracer] = None
+
+def enable(path: str) -> Tracer:
+    """Starts collecting spans; they are written to `path` when the process exits."""
+    global _tracer
+    if _tracer is None:
+        import atexit
+        _tracer = Tracer(path)
+        atexit.register(_tracer.write)
+    return _tracer
+
+def enabled() -> bool:
+    return _tracer is not None
+
+def span(name: str, **args):
+    """Context manager timing the enclosed block as `name` (no-op when disabled)."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args)
@@ -0,0 +1,237 @@
+"""Reading and writing workspace records for `qs export` / `qs import`.
+
+A record describes one workspace:
+
+    {"name": "proj", "created_at": "2024-01-02T10:00:00Z", "last_activated_at": null,
+     "activate_count": 3, "total_usage_seconds": 5400,
+     "files": [{"path": "/usr/bin/code", "launch_order": 0, "depends_on": [],
+                "args": ["--new-window"], "cwd": "/home/me/proj", "env": {"DEBUG": "1"},
+                "policy": {"nice": 5}}],
+     "policy": {"cpu_affinity": [0, 1], "rlimit_as": 4294967296},
+     "usage": [{"started_at": "...", "ended_at": "...", "duration_seconds": 5400,
+                "avg_cpu": 12.5, "peak_cpu": 180.0, "avg_rss": 734003200, "peak_rss": 912261120}]}
+
+Only `name` and `files` are required; a file may also be given as a plain
+path string. Records are streamed one at a time in both directions, as
+NDJSON (one record per line) or as a single JSON array, so memory use
+doesn't grow with the size of the file. Paths ending in `.gz` are
+read and written gzip-compressed.
+"""
+import datetime
+import json
+from typing import IO, Iterable, Iterator, Optional
+
+FORMATS = ("ndjson", "json")
+CONFLICT_POLICIES = ("skip", "merge", "upsert")
+
+# Per-session resource figures recorded by `qs top --record` (optional)
+RESOURCE_FIELDS = ("avg_cpu", "peak_cpu", "avg_rss", "peak_rss")
+
+_READ_CHUNK = 1 << 16
+
+# A JSON element cut off by the end of the buffer fails to decode at most
+# this many characters before it (a partial literal, number or \uXXXX escape)
+_TRUNCATION_SLACK = 16
+
+def open_text(path: str, mode: str = "r") -> IO[str]:
+    """Opens `path` for text I/O ("r", "w" or "a"), through gzip if it ends in .gz."""
+    if path.endswith(".gz"):
+        import gzip
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def write_records(records: Iterable[dict], out: IO[str], fmt: str = "ndjson") -> int:
+    """Writes records to `out` as NDJSON or a JSON array; returns how many."""
+    count = 0
+    if fmt == "json":
+        out.write("[")
+        for record in records:
+            out.write(",\n" if count else "\n")
+            out.write(json.dumps(record, ensure_ascii=False))
+            count += 1
+        out.write("\n]\n" if count else "]\n")
+    else:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    return count
+
+def read_records(stream: IO[str], fmt: Optional[str] = None) -> Iterator[dict]:
+    """Yields the raw records of an NDJSON or JSON-array stream.
+
+    Without `fmt` the format is detected from the first character: `[`
+    means a JSON array, anything else NDJSON.
+    """
+    head = stream.read(_READ_CHUNK)
+    stripped = head.lstrip()
+    if fmt is None:
+        fmt = "json" if stripped.startswith("[") else "ndjson"
+    if fmt == "json":
+        return _read_json_array(stream, stripped)
+    return _read_ndjson(stream, head)
+
+def _read_ndjson(stream: IO[str], head: str) -> Iterator[dict]:
+    buffer = head
+    line_no = 0
+    while True:
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield _decode_line(line, line_no)
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            break
+        buffer += chunk
+    if buffer.strip():
+        yield _decode_line(buffer, line_no + 1)
+
+def _decode_line(line: str, line_no: int) -> dict:
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Line {line_no}: invalid JSON ({e.msg}).")
+    if not isinstance(record, dict):
+        raise ValueError(f"Line {line_no}: expected a JSON object.")
+    return record
+
+def _read_json_array(stream: IO[str], buffer: str) -> Iterator[dict]:
+    """Decodes the elements of a top-level JSON array one at a time."""
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of workspace records.")
+    decoder = json.JSONDecoder()
+    pos = 1
+    eof = False
+
+    def refill() -> bool:
+        # Drops the consumed prefix and appends the next chunk
+        nonlocal buffer, pos, eof
+        chunk = "" if eof else stream.read(_READ_CHUNK)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+        return not eof
+
+    def next_token() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not refill():
+                raise ValueError("Unexpected end of input inside the JSON array.")
+
+    index = 0
+    while True:
+        token = next_token()
+        if token == "]":
+            return
+        if index:
+            if token != ",":
+                raise ValueError(f"Record {index + 1}: expected ',' between records.")
+            pos += 1
+            next_token()
+
+        # Elements must be objects, so a truncated element never decodes:
+        # keep reading until it does. Truncation fails within a few
+        # characters of the end of the buffer (or in a string still open
+        # there); an error further back is in the data, so it is reported
+        # without reading the rest of the input.
+        while True:
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError as e:
+                truncated = len(buffer) - e.pos <= _TRUNCATION_SLACK or e.msg.startswith("Unterminated string")
+                if not truncated or not refill():
+                    raise ValueError(f"Record {index + 1}: invalid JSON ({e.msg}).")
+        index += 1
+        if not isinstance(record, dict):
+            raise ValueError(f"Record {index}: expected a JSON object.")
+        yield record
+
+def _parse_timestamp(value, what: str, position: int) -> Optional[int]:
+    """Parses an ISO 8601 timestamp into the UTC epoch seconds the DB stores.
+
+    Timestamps without an offset are taken to be UTC.
+    """
+    if value is None:
+        return None
+    try:
+        moment = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError(f"Record {position}: invalid {what} timestamp '{value}'.")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return int(moment.timestamp())
+
+def _parse_policy(values, name: str, position: int):
+    """Returns a ResourcePolicy for a record's "policy" object, or None."""
+    if not values:
+        return None
+    from .policy import policy_from_dict
+    try:
+        if not isinstance(values, dict):
+            raise ValueError("expected an object")
+        return policy_from_dict(values)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Record {position} ('{name}'): invalid policy: {e}.")
+
+def normalize_record(raw: dict, position: int) -> dict:
+    """Validates a raw record and fills in defaults; raises ValueError if malformed.
+
+    Timestamps become UTC epoch seconds and usage sessions
+    (started_at, ended_at, duration_seconds, resources) tuples, where
+    `resources` holds the RESOURCE_FIELDS values (None when absent).
+    """
+    name = raw.get("name")
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"Record {position}: 'name' must be a non-empty string.")
+
+    files = []
+    for entry in raw.get("files") or []:
+        if isinstance(entry, str):
+            entry = {"path": entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get("path"), str) or not entry["path"]:
+            raise ValueError(f"Record {position} ('{name}'): every file needs a 'path'.")
+        policy = _parse_policy(entry.get("policy"), name, position)
+        args = entry.get("args") or []
+        env = entry.get("env") or {}
+        if not isinstance(args, list) or not isinstance(env, dict):
+            raise ValueError(f"Record {position} ('{name}'): 'args' must be a list and 'env' an object.")
+        files.append({
+            "path": entry["path"],
+            "launch_order": int(entry.get("launch_order") or 0),
+            "depends_on": [str(dep) for dep in entry.get("depends_on") or []],
+            "args": [str(arg) for arg in args],
+            "cwd": entry.get("cwd") or None,
+            "env": {str(key): str(value) for key, value in env.items()},
+            "policy": policy,
+        })
+
+    usage = raw.get("usage")
+    if usage is not None:
+        if not isinstance(usage, list):
+            raise ValueError(f"Record {position} ('{name}'): 'usage' must be a list.")
+        sessions = []
+        for session in usage:
+            if not isinstance(session, dict) or not session.get("started_at") or not session.get("ended_at"):
+                raise ValueError(f"Record {position} ('{name}'): usage sessions need started_at and ended_at.")
+            started_at = _parse_timestamp(session["started_at"], "started_at", position)
+            ended_at = _parse_timestamp(session["ended_at"], "ended_at", position)
+            resources = tuple(session.get(field) for field in RESOURCE_FIELDS)
+            sessions.append((started_at, ended_at, ended_at - started_at, resources))
+        usage = sessions
+
+    total = raw.get("total_usage_seconds")
+    return {
+        "name": name,
+        "created_at": _parse_timestamp(raw.get("created_at"), "created_at", position),
+        "last_activated_at": _parse_timestamp(raw.get("last_activated_at"), "last_activated_at", position),
+        "activate_count": int(raw.get("activate_count") or 0),
+        "total_usage_seconds": int(total) if total is not None else None,
+        "files": files,
+        "policy": _parse_policy(raw.get("policy"), name, position),
+        "usage": usage,  # [(started_at, ended_at, duration_seconds, resources)] or None
+    }
@@ -1,28 +1,113 @@
 import os
 import sys
+import time
 import datetime
+from typing import Optional
 
-def utc_to_local_str(utc_dt_str: str) -> str:
-    """Converts a UTC datetime string from DB to a local formatted string."""
-    if not utc_dt_str:
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+def now_epoch() -> int:
+    """The current time as stored in the DB: integer UTC epoch seconds."""
+    return int(time.time())
+
+def epoch_to_utc(epoch: int) -> datetime.datetime:
+    """Converts stored epoch seconds to a naive UTC datetime."""
+    return _EPOCH + datetime.timedelta(seconds=epoch)
+
+def utc_to_epoch(moment: datetime.datetime) -> int:
+    """Converts a naive UTC datetime (or date) to epoch seconds."""
+    if not isinstance(moment, datetime.datetime):
+        moment = datetime.datetime.combine(moment, datetime.time())
+    return int((moment - _EPOCH).total_seconds())
+
+def format_local_time(epoch) -> str:
+    """Formats stored epoch seconds as local time, "-" when unset.
+
+    A single localtime() call per value; there is nothing left to parse.
+    """
+    if epoch is None:
         return "-"
-    
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(epoch))
+
+def format_utc_iso(epoch) -> Optional[str]:
+    """Formats stored epoch seconds as ISO 8601 UTC ("2024-01-02T10:00:00Z"), None when unset."""
+    if epoch is None:
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(epoch))
+
+def format_duration(total_seconds: int) -> str:
+    """Formats seconds as a short human-readable duration, e.g. "2h 15m"."""
+    m, s = divmod(int(total_seconds or 0), 60)
+    h, m = divmod(m, 60)
+    if h > 0:
+        return f"{h}h {m}m"
+    elif m > 0:
+        return f"{m}m {s}s"
+    return f"{s}s"
+
+def format_bytes(count: int) -> str:
+    """Formats a byte count with a binary unit, e.g. "512.0 MiB"."""
+    value = float(count or 0)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TiB"
+
+def format_batch_results(verb: str, results: dict) -> str:
+    """Summarises {workspace: succeeded} of a multi-workspace command, one line each."""
+    lines = [f"  {'ok' if ok else 'failed':<6}  {name}" for name, ok in results.items()]
+    done = sum(1 for ok in results.values() if ok)
+    lines.append(f"{verb} {done} of {len(results)} workspaces.")
+    return "\n".join(lines) + "\n"
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Packs a listing position into an opaque, shell-safe token."""
+    import base64, json
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> tuple:
+    """Inverse of encode_cursor(); raises ValueError for malformed tokens."""
+    import base64, binascii, json
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        sort_value, row_id = json.loads(raw)
+        return sort_value, int(row_id)
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor '{token}'") from e
+
+_boot_time = None
+
+def process_create_time(pid: int):
+    """Returns when `pid` was started (epoch seconds), or None if it's gone.
+
+    Agrees with psutil.Process.create_time(). On Linux it is read straight
+    from /proc so the launch path doesn't need to import psutil.
+    """
+    global _boot_time
+    if sys.platform.startswith("linux"):
+        try:
+            with open(f"/proc/{pid}/stat", "rb") as f:
+                data = f.read()
+            if _boot_time is None:
+                with open("/proc/stat", "rb") as f:
+                    for line in f:
+                        if line.startswith(b"btime"):
+                            _boot_time = float(line.split()[1])
+                            break
+        except OSError:
+            return None
+        # The command name (field 2) may contain spaces; count from its ")"
+        # starttime is field 22, i.e. index 19 after the state field
+        fields = data[data.rfind(b")") + 2:].split()
+        return int(fields[19]) / os.sysconf("SC_CLK_TCK") + (_boot_time or 0.0)
+
+    import psutil
     try:
-        # DB stores as "YYYY-MM-DD HH:MM:SS" (microseconds optional)
-        if "." in utc_dt_str:
-            utc_dt = datetime.datetime.strptime(utc_dt_str, "%Y-%m-%d %H:%M:%S.%f")
-        else:
-            utc_dt = datetime.datetime.strptime(utc_dt_str, "%Y-%m-%d %H:%M:%S")
-        
-        # Add UTC timezone info
-        utc_dt = utc_dt.replace(tzinfo=datetime.timezone.utc)
-        
-        # Convert to local time
-        local_dt = utc_dt.astimezone()
-        
-        return local_dt.strftime("%Y-%m-%d %H:%M:%S")
-    except ValueError:
-        return utc_dt_str
+        return psutil.Process(pid).create_time()
+    except psutil.Error:
+        return None
 
 def open_file_picker():
     """Opens a file selection dialog and returns the selected file path."""
@@ -1,15 +1,87 @@
 import os
+import sys
+import json
+import shlex
 import subprocess
-import psutil
 import datetime
-from typing import List, Optional
+import contextlib
+from typing import Dict, Iterable, Iterator, List, Optional
+from . import completion
+from .config import (MAX_LAUNCH_WORKERS, PREWARM_VALID_SECONDS, PREWARM_WORKERS, RESOURCE_SAMPLE_SLOTS,
+                     RETENTION_DAYS, STOP_GRACE_SECONDS, TIMING_HISTORY)
 from .database_manager import DatabaseManager
-from .utils import open_file_picker
+from .definitions import DefinitionCache, load_policies
+from .launcher import LaunchEngine, LaunchItem, LaunchResult
+from .locks import remove_locks, workspace_locks
+from .policy import FIELDS as POLICY_FIELDS, ResourcePolicy
+from .models import Workspace
+from .resolver import COMMAND, DOCUMENT, SHELL, Resolution, base_dir, classify, document_opener, resolve_all
+from .tracing import span
+from .utils import decode_cursor, encode_cursor, format_utc_iso, now_epoch, process_create_time, utc_to_epoch
+
+# Sort orders for iter_workspaces: name -> (SQL sort key, direction).
+# Ties are broken by id in the same direction, which also makes keyset
+# cursors unambiguous.
+LIST_SORTS = {
+    "recent": ("IFNULL(w.last_activated_at, 0)", "DESC"),
+    "name": ("w.name", "ASC"),
+    "created": ("w.id", "DESC"),
+}
+
+def _stream(cursor, batch_size: int) -> Iterator[tuple]:
+    """Yields a cursor's rows, fetching `batch_size` per round trip."""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        yield from rows
+
+class _RowGroups:
+    """Walks rows sorted by their first column, handing out one key's rows at a time."""
+
+    def __init__(self, rows: Iterable[tuple]):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+
+    def take(self, key) -> List[tuple]:
+        """Returns the rows for `key`; keys must be asked for in ascending order."""
+        group = []
+        while self._next is not None and self._next[0] <= key:
+            if self._next[0] == key:
+                group.append(self._next)
+            self._next = next(self._rows, None)
+        return group
 
 class WorkspaceManager:
-    def __init__(self):
-        self.db = DatabaseManager()
+    def __init__(self, db: Optional[DatabaseManager] = None):
+        self.db = db or DatabaseManager()
         self.db.initialize_db()
+        self.last_launch_results = []
+        self.last_stop_report = None
+        self.definitions = DefinitionCache(self.db)
+        if not completion.has_index(self.db.db_path):
+            self._refresh_completion(names=True)
+
+    def _definitions_changed(self):
+        """Marks workspace definitions as changed when the current transaction commits (see definitions.py)."""
+        self.db.before_commit("definitions", self.definitions.changed)
+
+    def _refresh_completion(self, names: bool = False):
+        """Rewrites the shell completion index (see completion.py) as the current transaction commits.
+
+        The running list is always rewritten; `names` also rewrites the
+        list of names, for changes that add or remove workspaces.
+        """
+        if names:
+            self.db.before_commit("completion.names", lambda conn: self._write_index(completion.write_names, conn))
+        self.db.before_commit("completion.running", lambda conn: self._write_index(completion.write_running, conn))
+
+    def _write_index(self, writer, conn):
+        try:
+            writer(conn, self.db.db_path)
+        except OSError as e:
+            # Completion is a convenience; it never fails the command
+            print(f"Warning: could not update the completion index: {e}", file=sys.stderr)
 
     def create_workspace(self, name: str, file_paths: List[str]) -> bool:
         """Creates a new workspace with the given files."""
@@ -17,172 +89,1204 @@ class WorkspaceManager:
             return False
 
         try:
-            # Insert workspace
-            workspace_id = self.db.execute_query(
-                "INSERT INTO workspaces (name) VALUES (?)", (name,)
-            )
-
-            # Insert files
-            for path in file_paths:
-                self.db.execute_query(
+            # Workspace row and all file rows are committed together
+            with self.db.transaction():
+                workspace_id = self.db.execute_query(
+                    "INSERT INTO workspaces (name, created_at) VALUES (?, ?)", (name, now_epoch())
+                )
+                self.db.execute_many(
                     "INSERT INTO workspace_files (workspace_id, file_path) VALUES (?, ?)",
-                    (workspace_id, path)
+                    [(workspace_id, path) for path in file_paths]
                 )
+                self._refresh_completion(names=True)
+                self._definitions_changed()
             return True
         except Exception as e:
             # If unique constraint failed (name exists) or other error
             print(f"Error creating workspace: {e}")
             return False
 
-    def list_workspaces(self) -> List[dict]:
-        """Returns a list of all workspaces with their details."""
-        query = """
-        SELECT w.name, w.created_at, w.last_activated_at, w.activate_count, count(wf.id) as file_count, w.total_usage_seconds
+    def get_workspace(self, name: str) -> Optional[Workspace]:
+        """Returns the definition of a workspace (see src/models.py), or None if it doesn't exist.
+
+        Served from the in-process cache while no definition has changed.
+        """
+        return self.get_workspaces([name]).get(name)
+
+    def get_workspaces(self, names: Iterable[str]) -> Dict[str, Workspace]:
+        """Returns {name: Workspace} for those of `names` that exist (exact names, no patterns)."""
+        found = self.definitions.ids(names)
+        workspaces = self.definitions.workspaces(found.values())
+        return {name: workspaces[workspace_id] for name, workspace_id in found.items() if workspace_id in workspaces}
+
+    def list_workspaces(self, **filters) -> List[dict]:
+        """Returns a list of all workspaces with their details.
+
+        Accepts the same filters as iter_workspaces().
+        """
+        return list(self.iter_workspaces(**filters))
+
+    def iter_workspaces(self, limit: Optional[int] = None, offset: int = 0, after: Optional[str] = None,
+                        sort: str = "recent", prefix: Optional[str] = None,
+                        batch_size: int = 500) -> Iterator[dict]:
+        """Yields workspaces one at a time, fetching `batch_size` rows per round trip.
+
+        `sort` is one of LIST_SORTS. Pagination is either `offset` based or,
+        cheaper for deep pages, keyset based: pass the `cursor` of the last
+        row of the previous page as `after`. `prefix` keeps names starting
+        with it.
+        """
+        if sort not in LIST_SORTS:
+            raise ValueError(f"Unknown sort '{sort}', expected one of: {', '.join(LIST_SORTS)}")
+        sort_key, direction = LIST_SORTS[sort]
+
+        conditions, params = [], []
+        if prefix:
+            # A range rather than LIKE, so the UNIQUE index on name is used
+            conditions.append("w.name >= ? AND w.name < ?")
+            params += [prefix, prefix + "\U0010ffff"]
+        if after:
+            key, last_id = decode_cursor(after)
+            # Spelled out rather than as a row value so SQLite turns the
+            # first term into an index range instead of scanning from the top
+            op = "<" if direction == "DESC" else ">"
+            conditions.append(f"{sort_key} {op}= ? AND ({sort_key} {op} ? OR w.id {op} ?)")
+            params += [key, key, last_id]
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        query = f"""
+        SELECT w.id, w.name, w.created_at, w.last_activated_at, w.activate_count, w.file_count,
+               w.total_usage_seconds, {sort_key}
         FROM workspaces w
-        LEFT JOIN workspace_files wf ON w.id = wf.workspace_id
-        GROUP BY w.id
-        ORDER BY w.last_activated_at DESC
+        {where}
+        ORDER BY {sort_key} {direction}, w.id {direction}
+        LIMIT ? OFFSET ?
         """
-        rows = self.db.fetch_all(query)
-        result = []
-        for row in rows:
-            result.append({
-                "name": row[0],
-                "created_at": row[1],
-                "last_activated_at": row[2],
-                "activate_count": row[3],
-                "file_count": row[4],
-                "total_usage_seconds": row[5] if row[5] else 0
-            })
-        return result
+        params += [-1 if limit is None else limit, offset]
+
+        for row in _stream(self.db.connect().execute(query, tuple(params)), batch_size):
+            yield {
+                "name": row[1],
+                "created_at": row[2],
+                "last_activated_at": row[3],
+                "activate_count": row[4],
+                "file_count": row[5],
+                "total_usage_seconds": row[6] if row[6] else 0,
+                "cursor": encode_cursor(row[7], row[0]),
+            }
+
+    def resolve_workspaces(self, patterns: Iterable[str] = (), everything: bool = False,
+                           running: bool = False, idle_before: Optional[int] = None) -> tuple:
+        """Looks up workspaces by name or glob pattern (`*`, `?`, `[...]`) in one query.
+
+        `everything` selects all workspaces instead of `patterns`. `running`
+        keeps those with tracked processes; `idle_before` those not
+        activated since then (epoch seconds) or never. Returns ({name: id} in name order,
+        [patterns that matched nothing]).
+        """
+        patterns = list(dict.fromkeys(patterns))
+        if not (everything or running or idle_before is not None) and \
+                not any(ch in p for p in patterns for ch in "*?["):
+            # Plain names: the definition cache knows them after the first time
+            ids = self.definitions.ids(patterns)
+            return dict(sorted(ids.items())), [p for p in patterns if p not in ids]
+
+        conditions, params = [], []
+        if running:
+            conditions.append("EXISTS (SELECT 1 FROM active_processes ap WHERE ap.workspace_id = w.id)")
+        if idle_before is not None:
+            conditions.append("(w.last_activated_at IS NULL OR w.last_activated_at < ?)")
+            params.append(idle_before)
+        where = " AND ".join(conditions) or "1"
+
+        if everything:
+            rows = self.db.fetch_all(
+                f"SELECT NULL, w.id, w.name FROM workspaces w WHERE {where} ORDER BY w.name", tuple(params)
+            )
+        elif patterns:
+            # Exact names are index lookups; only real patterns pay for a scan
+            globs = [p for p in patterns if any(ch in p for ch in "*?[")]
+            rows = self.db.fetch_all(f"""
+                SELECT j.value, w.id, w.name FROM json_each(?) j JOIN workspaces w ON w.name = j.value
+                WHERE {where}
+                UNION
+                SELECT j.value, w.id, w.name FROM json_each(?) j JOIN workspaces w ON w.name GLOB j.value
+                WHERE {where}
+                ORDER BY 3
+            """, (json.dumps(patterns), *params, json.dumps(globs), *params))
+        else:
+            rows = []
+
+        found = {name: workspace_id for _, workspace_id, name in rows}
+        matched = {pattern for pattern, _, _ in rows}
+        return found, [p for p in patterns if p not in matched]
 
-    def start_workspace(self, name: str) -> bool:
-        """Launches all files in the workspace and tracks processes."""
+    def _report_unmatched(self, patterns: List[str], results: Dict[str, bool]):
+        for pattern in patterns:
+            if any(ch in pattern for ch in "*?["):
+                print(f"No workspaces match '{pattern}'.")
+            else:
+                print(f"Workspace '{pattern}' not found.")
+            results[pattern] = False
+
+    @contextlib.contextmanager
+    def _locked(self, found: Dict[str, int], results: Dict[str, bool]):
+        """Holds the workspace locks of `found` (see locks.py), yielding the part that was locked.
+
+        Workspaces another command kept busy for too long are reported and
+        marked failed in `results`.
+        """
+        with workspace_locks(self.db.db_path, found.values()) as held:
+            held = set(held)
+            for name, workspace_id in found.items():
+                if workspace_id not in held:
+                    print(f"Workspace '{name}' is busy: another qs command is still using it.")
+                    results[name] = False
+            yield {name: workspace_id for name, workspace_id in found.items() if workspace_id in held}
+
+    def start_workspace(self, name: str, max_workers: Optional[int] = None) -> bool:
+        """Launches all files in the workspace and tracks processes.
+
+        Files are launched concurrently, respecting `launch_order` and explicit
+        dependencies. Per-file results are kept in `self.last_launch_results`.
+        """
+        results = self.start_workspaces([name], max_workers=max_workers)
+        return bool(results) and all(results.values())
+
+    def start_workspaces(self, patterns: Iterable[str], max_workers: Optional[int] = None,
+                         cwd: Optional[str] = None, environ: Optional[Dict[str, str]] = None) -> Dict[str, bool]:
+        """Starts every workspace matching `patterns` (names or globs) together.
+
+        The workspaces' files are read in one query, resolved in one
+        transaction and launched by a single LaunchEngine run, so one slow
+        workspace doesn't hold up the next; launch_order stages and
+        dependencies apply within each workspace. The new processes of all
+        of them are recorded in one commit. Returns {name: succeeded};
+        per-file results are kept in `self.last_launch_results` as
+        (workspace, file_path, LaunchResult). A workspace is locked against
+        other start/stop/delete commands until its processes are recorded.
+
+        `cwd` and `environ` are those of the user asking (by default this
+        process's), for a daemon starting workspaces on a client's behalf.
+        Files run in `cwd`, or in their own working directory taken
+        relative to it, with their environment overrides applied on top
+        of `environ`.
+        """
+        found, missing = self.resolve_workspaces(patterns)
+        results: Dict[str, bool] = {}
+        self._report_unmatched(missing, results)
+        self.last_launch_results = []
+        if not found:
+            return results
+
+        with self._locked(found, results) as found:
+            if found:
+                self._start_locked(found, results, max_workers, cwd, environ)
+        return dict(sorted(results.items()))
+
+    def _start_locked(self, found: Dict[str, int], results: Dict[str, bool], max_workers: Optional[int],
+                      cwd: Optional[str] = None, environ: Optional[Dict[str, str]] = None):
+        definitions = self.definitions.workspaces(found.values())
+        workspaces: Dict[int, Workspace] = {}
+        for name, workspace_id in sorted(found.items(), key=lambda item: item[1]):
+            workspace = definitions.get(workspace_id)
+            if workspace is not None and workspace.files:
+                workspaces[workspace_id] = workspace
+            else:
+                print(f"No files found for workspace '{name}'.")
+                results[name] = False
+        if not workspaces:
+            return
+
+        names = {workspace_id: name for name, workspace_id in found.items()}
+        files = {f.id: f for workspace in workspaces.values() for f in workspace.files}
+        owners = {f.id: workspace.id for workspace in workspaces.values() for f in workspace.files}
+        paths = {file_id: f.path for file_id, f in files.items()}
+        # Where each file runs; a relative entry is resolved there too
+        run_dirs = {
+            file_id: os.path.join(cwd, f.cwd) if cwd and f.cwd else f.cwd or cwd
+            for file_id, f in files.items()
+        }
+        keys = {file_id: (path, base_dir(path, run_dirs[file_id])) for file_id, path in paths.items()}
+        with span("start.resolve"):
+            resolved = self.definitions.resolve(keys.values())
+            search_path = (environ or os.environ).get("PATH")
+            if search_path != os.environ.get("PATH"):
+                # Commands were looked up (or not found) on our PATH, not the caller's
+                for key, resolution in resolved.items():
+                    if resolution.kind == COMMAND or not resolution.ok:
+                        resolved[key] = classify(*key, search_path=search_path)
+
+        spawned: Dict[int, subprocess.Popen] = {}
+
+        def spawn(file_id: int) -> subprocess.Popen:
+            f = files[file_id]
+            handle = self._spawn(resolved[keys[file_id]], f.args, run_dirs[file_id], f.env, f.policy, environ)
+            spawned[file_id] = handle
+            return handle
+
+        items = self._build_launch_items(workspaces)
+        engine = LaunchEngine(max_workers or MAX_LAUNCH_WORKERS)
+        aborted = None
+        with span("start.launch", workspaces=len(workspaces), files=len(items)):
+            try:
+                launch_results = engine.run(items, spawn)
+            except BaseException as e:
+                # Still record what did start (e.g. on Ctrl-C), or `qs stop`
+                # could never find it
+                aborted = e
+                launch_results = []
+                for file_id, handle in spawned.items():
+                    result = LaunchResult(file_id)
+                    result.handle, result.pid = handle, handle.pid
+                    launch_results.append(result)
+        self.last_launch_results = [(names[owners[r.key]], paths[r.key], r) for r in launch_results]
+
+        for workspace_id in workspaces:
+            results[names[workspace_id]] = True
+        launched = []
+        timings = {workspace_id: [] for workspace_id in workspaces}
+        for result in launch_results:
+            workspace_id = owners[result.key]
+            if result.ok:
+                launched.append((
+                    workspace_id, result.pid, paths[result.key], process_create_time(result.pid)
+                ))
+                if aborted is None:   # no latency was measured otherwise
+                    timings[workspace_id].append((paths[result.key], result.latency))
+            else:
+                print(f"Failed to open '{paths[result.key]}': {result.error}")
+                results[names[workspace_id]] = False
+
+        # Store PIDs and update usage stats of every workspace in a single commit
+        now = now_epoch()
+        with self.db.transaction():
+            # Launches within PREWARM_VALID_SECONDS of a prewarm, with no launch in between
+            prewarmed = {workspace_id for (workspace_id,) in self.db.fetch_all(
+                "SELECT id FROM workspaces WHERE id IN (SELECT value FROM json_each(?)) "
+                "AND prewarmed_at >= ? AND prewarmed_at >= IFNULL(last_activated_at, 0)",
+                (json.dumps(list(workspaces)), now - PREWARM_VALID_SECONDS)
+            )}
+            self.db.execute_many(
+                "INSERT INTO active_processes (workspace_id, pid, file_path, create_time, started_at, seen_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [row + (now, now) for row in launched]
+            )
+            self.db.execute_query(
+                "UPDATE workspaces SET last_activated_at = ?, activate_count = activate_count + 1 "
+                "WHERE id IN (SELECT value FROM json_each(?))",
+                (now, json.dumps(list(workspaces)))
+            )
+            for workspace_id, file_timings in timings.items():
+                self._record_timings(workspace_id, "launch", now, file_timings,
+                                     prewarmed=workspace_id in prewarmed)
+            self._refresh_completion()
+        if aborted is not None:
+            raise aborted
+
+    def _build_launch_items(self, workspaces: Dict[int, Workspace]) -> List[LaunchItem]:
+        """Turns launch_order stages and explicit dependencies into LaunchItems.
+
+        Stages only order files within the same workspace.
+        """
+        items = []
+        for workspace in workspaces.values():
+            files = workspace.files
+            # Each launch_order stage comes after every file in the previous
+            # stage, but only explicit dependencies have to launch
+            stages = sorted({f.launch_order for f in files})
+            previous = {}
+            for index, stage in enumerate(stages[1:], start=1):
+                previous[stage] = [f.id for f in files if f.launch_order == stages[index - 1]]
+            # A policy is applied by a preexec_fn, which mustn't run while
+            # other launcher threads are busy
+            items.extend(
+                LaunchItem(f.id, list(f.depends_on), after=previous.get(f.launch_order),
+                           exclusive=f.policy is not None and not f.policy.is_empty())
+                for f in files
+            )
+        return items
+
+    def _spawn(self, resolution: Resolution, args: Optional[List[str]] = None, cwd: Optional[str] = None,
+               env: Optional[Dict[str, str]] = None, policy: Optional[ResourcePolicy] = None,
+               environ: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+        """Launches a single workspace file and returns its process handle.
+
+        The resolved program is exec'd directly, so the recorded PID is the
+        application's own. Only entries using shell syntax, and documents on
+        Windows (which rely on the shell's file associations), go through a
+        shell. `args` are extra arguments, `env` overrides the inherited
+        environment (`environ`, or this process's) and `policy` is applied
+        in the child before exec.
+        """
+        if not resolution.ok:
+            raise FileNotFoundError(f"{resolution.entry}: {resolution.error}")
+
+        extra_args = args or []
+        environment = environ
+        if env:
+            environment = dict(os.environ if environ is None else environ)
+            environment.update(env)
+
+        command = resolution.command(extra_args)
+        use_shell = resolution.kind == SHELL or (resolution.kind == DOCUMENT and not document_opener())
+        if use_shell:
+            command = " ".join([resolution.entry] + [shlex.quote(arg) for arg in extra_args])
+
+        # Use DETACHED_PROCESS (0x00000008) to prevent console attachment on Windows
+        creation_flags = 0x00000008 if os.name == 'nt' else 0
+
+        with span("launch.spawn", path=resolution.entry, kind=resolution.kind):
+            try:
+                process = subprocess.Popen(
+                    command,
+                    shell=use_shell,
+                    cwd=cwd or None,
+                    env=environment,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    stdin=subprocess.DEVNULL,
+                    creationflags=creation_flags,
+                    preexec_fn=policy.preexec_fn() if policy else None
+                )
+            except subprocess.SubprocessError as e:
+                raise OSError(f"could not apply resource policy ({policy.describe()}): {e}")
+            if policy and policy.needs_ionice_after_spawn():
+                try:
+                    policy.apply_ionice(process.pid)
+                except Exception as e:
+                    print(f"Could not set I/O priority of '{resolution.entry}': {e}")
+            return process
+
+    def _get_file_id(self, workspace_id: int, file_path: str) -> Optional[int]:
+        row = self.db.fetch_one(
+            "SELECT id FROM workspace_files WHERE workspace_id = ? AND file_path = ?",
+            (workspace_id, file_path)
+        )
+        return row[0] if row else None
+
+    def set_launch_order(self, name: str, file_path: str, order: int) -> bool:
+        """Sets the launch stage of a file; lower stages launch first.
+
+        Refused when a dependency of the file would then launch in a later
+        stage, or a file depending on it in an earlier one.
+        """
         workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
         if not workspace:
             print(f"Workspace '{name}' not found.")
             return False
-        
-        workspace_id = workspace[0]
-        
-        files = self.db.fetch_all("SELECT file_path FROM workspace_files WHERE workspace_id = ?", (workspace_id,))
-        if not files:
-            print(f"No files found for workspace '{name}'.")
+        file_id = self._get_file_id(workspace[0], file_path)
+        if file_id is None:
+            print(f"File '{file_path}' is not part of workspace '{name}'.")
             return False
+        with self.db.transaction():
+            conflict = self.db.fetch_one("""
+                SELECT f.file_path, IFNULL(f.launch_order, 0), d.file_id = ?
+                FROM workspace_file_deps d
+                JOIN workspace_files f ON f.id = CASE WHEN d.file_id = ? THEN d.depends_on_id ELSE d.file_id END
+                WHERE (d.file_id = ? AND IFNULL(f.launch_order, 0) > ?)
+                   OR (d.depends_on_id = ? AND IFNULL(f.launch_order, 0) < ?)
+                LIMIT 1
+            """, (file_id, file_id, file_id, order, file_id, order))
+            if conflict:
+                other, stage, is_dependency = conflict
+                if is_dependency:
+                    print(f"Cannot move '{file_path}' to stage {order}: it depends on '{other}' (stage {stage}).")
+                else:
+                    print(f"Cannot move '{file_path}' to stage {order}: '{other}' (stage {stage}) depends on it.")
+                return False
+            self.db.execute_query("UPDATE workspace_files SET launch_order = ? WHERE id = ?", (order, file_id))
+            self._definitions_changed()
+        return True
 
-        success = True
-        for (path,) in files:
-            try:
-                # Use subprocess.Popen to get PID
-                # shell=True is often needed for opening files with default app on Windows via 'start' logic
-                # But 'start' is a shell command. 
-                # Better: usage of os.startfile is "fire and forget" and doesn't give PID easily.
-                # using Popen with executable might be needed, or 'cmd /c start' which also makes PID tracking hard.
-                # However, for executables, Popen works well. For documents, shell=True works but PID might be the shell.
-                
-                # Plan says: "Switching to subprocess.Popen ... Limitation: ... captured PID will be invalid (dead)"
-                # We will try Popen directly. If it's a non-executable (like .txt), we need shell=True on Windows.
-                
-                # Use DETACHED_PROCESS (0x00000008) to prevent console attachment on Windows
-                creation_flags = 0x00000008 if os.name == 'nt' else 0
-
-                proc = subprocess.Popen(
-                    [path], 
-                    shell=True,
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL,
-                    stdin=subprocess.DEVNULL,
-                    creationflags=creation_flags
-                ) 
-                
-                # Store PID
+    def set_dependency(self, name: str, file_path: str, depends_on: str, remove: bool = False) -> bool:
+        """Makes `file_path` launch only after `depends_on` (or removes that edge).
+
+        An edge that would make the files wait on each other is refused:
+        `depends_on` can't already depend on `file_path`, directly or not,
+        nor be in a later launch stage.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return False
+        file_id = self._get_file_id(workspace[0], file_path)
+        depends_on_id = self._get_file_id(workspace[0], depends_on)
+        for path, fid in ((file_path, file_id), (depends_on, depends_on_id)):
+            if fid is None:
+                print(f"File '{path}' is not part of workspace '{name}'.")
+                return False
+        if file_id == depends_on_id:
+            print("A file cannot depend on itself.")
+            return False
+
+        with self.db.transaction():
+            if remove:
+                self.db.execute_query(
+                    "DELETE FROM workspace_file_deps WHERE file_id = ? AND depends_on_id = ?",
+                    (file_id, depends_on_id)
+                )
+            else:
+                stages = dict(self.db.fetch_all(
+                    "SELECT id, IFNULL(launch_order, 0) FROM workspace_files WHERE id IN (?, ?)",
+                    (file_id, depends_on_id)
+                ))
+                if stages[depends_on_id] > stages[file_id]:
+                    print(f"'{depends_on}' launches in a later stage ({stages[depends_on_id]}) "
+                          f"than '{file_path}' ({stages[file_id]}), so it cannot launch first.")
+                    return False
+                # Everything depends_on waits for, directly or not
+                cycle = self.db.fetch_one("""
+                    WITH RECURSIVE upstream(id) AS (
+                        SELECT ?
+                        UNION
+                        SELECT d.depends_on_id FROM workspace_file_deps d JOIN upstream u ON d.file_id = u.id
+                    )
+                    SELECT 1 FROM upstream WHERE id = ?
+                """, (depends_on_id, file_id))
+                if cycle:
+                    print(f"'{depends_on}' already waits for '{file_path}'; "
+                          "this dependency would make them wait on each other.")
+                    return False
+                self.db.execute_query(
+                    "INSERT OR IGNORE INTO workspace_file_deps (file_id, depends_on_id) VALUES (?, ?)",
+                    (file_id, depends_on_id)
+                )
+            self._definitions_changed()
+        return True
+
+    def set_file_options(self, name: str, file_path: str, args: Optional[List[str]] = None,
+                         cwd: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                         reset: bool = False) -> Optional[dict]:
+        """Updates the launch options of a file and returns the resulting ones.
+
+        Only the options given are changed; `reset` clears all of them first.
+        Returns None if the workspace or file doesn't exist.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+        file_id = self._get_file_id(workspace[0], file_path)
+        if file_id is None:
+            print(f"File '{file_path}' is not part of workspace '{name}'.")
+            return None
+
+        with self.db.transaction():
+            if reset:
+                self.db.execute_query("UPDATE workspace_files SET args = NULL, cwd = NULL, env = NULL WHERE id = ?", (file_id,))
+            if args is not None:
+                self.db.execute_query("UPDATE workspace_files SET args = ? WHERE id = ?", (json.dumps(args) if args else None, file_id))
+            if cwd is not None:
+                self.db.execute_query("UPDATE workspace_files SET cwd = ? WHERE id = ?", (cwd or None, file_id))
+            if env is not None:
+                self.db.execute_query("UPDATE workspace_files SET env = ? WHERE id = ?", (json.dumps(env) if env else None, file_id))
+            row = self.db.fetch_one("SELECT args, cwd, env FROM workspace_files WHERE id = ?", (file_id,))
+            self._definitions_changed()
+        return {
+            "args": json.loads(row[0]) if row[0] else [],
+            "cwd": row[1],
+            "env": json.loads(row[2]) if row[2] else {},
+        }
+
+    def set_policy(self, name: str, file_path: Optional[str] = None, clear: bool = False,
+                   **values) -> Optional[ResourcePolicy]:
+        """Updates the resource policy of a workspace, or of one of its files.
+
+        `values` are ResourcePolicy fields; the ones given replace the stored
+        ones and the rest are kept. `clear` drops the stored policy first.
+        Returns the stored policy for that scope, or None if the workspace or
+        file doesn't exist.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+        file_id = 0
+        if file_path is not None:
+            file_id = self._get_file_id(workspace[0], file_path)
+            if file_id is None:
+                print(f"File '{file_path}' is not part of workspace '{name}'.")
+                return None
+
+        key = (workspace[0], file_id)
+        with self.db.transaction():
+            row = self.db.fetch_one(
+                f"SELECT {', '.join(POLICY_FIELDS)} FROM resource_policies WHERE workspace_id = ? AND file_id = ?", key
+            )
+            policy = ResourcePolicy.from_row(row) if row and not clear else ResourcePolicy()
+            policy = policy.merged(ResourcePolicy(**values))
+            self.db.execute_query("DELETE FROM resource_policies WHERE workspace_id = ? AND file_id = ?", key)
+            if not policy.is_empty():
                 self.db.execute_query(
-                    "INSERT INTO active_processes (workspace_id, pid, file_path) VALUES (?, ?, ?)",
-                    (workspace_id, proc.pid, path)
+                    f"INSERT INTO resource_policies (workspace_id, file_id, {', '.join(POLICY_FIELDS)}) "
+                    f"VALUES (?, ?, {', '.join('?' * len(POLICY_FIELDS))})",
+                    key + policy.to_row()
                 )
-                
-            except OSError as e:
-                print(f"Failed to open '{path}': {e}")
-                success = False
-        
-        # Update usage stats
-        now = datetime.datetime.utcnow()
-        self.db.execute_query(
-            "UPDATE workspaces SET last_activated_at = ?, activate_count = activate_count + 1 WHERE id = ?",
-            (now, workspace_id)
+            self._definitions_changed()
+        return policy
+
+    def get_policies(self, name: str) -> Optional[List[tuple]]:
+        """Returns the stored policies as (file_path or None for the workspace, policy)."""
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+        rows = self.db.fetch_all(f"""
+            SELECT wf.file_path, {', '.join('p.' + field for field in POLICY_FIELDS)}
+            FROM resource_policies p LEFT JOIN workspace_files wf ON wf.id = p.file_id
+            WHERE p.workspace_id = ?
+            ORDER BY p.file_id
+        """, (workspace[0],))
+        return [(row[0], ResourcePolicy.from_row(row[1:])) for row in rows]
+
+    def apply_policies_live(self, name: str) -> Optional[dict]:
+        """Re-applies the stored policies to a running workspace's process trees.
+
+        Returns {"applied": n, "errors": {pid: message}}, or None if the
+        workspace doesn't exist. Processes that exit meanwhile are skipped.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+
+        rows = self.db.fetch_all("""
+            SELECT ap.pid, ap.started_at, ap.create_time, wf.id
+            FROM active_processes ap
+            LEFT JOIN workspace_files wf ON wf.workspace_id = ap.workspace_id AND wf.file_path = ap.file_path
+            WHERE ap.workspace_id = ?
+        """, (workspace[0],))
+        policies = load_policies(self.db, [workspace[0]])
+        result = {"applied": 0, "errors": {}}
+        if not rows or not policies:
+            return result
+
+        import psutil
+        from .process_control import ProcessTable, is_same_process
+
+        table = ProcessTable()
+        for pid, started_at, create_time, file_id in rows:
+            policy = policies.get(file_id)
+            proc = table.get(pid)
+            if policy is None or proc is None:
+                continue
+            try:
+                if not is_same_process(proc.create_time(), create_time, started_at):
+                    continue
+            except (psutil.Error, ValueError):
+                continue
+            for member in table.tree(pid):
+                try:
+                    policy.apply_to(member)
+                    result["applied"] += 1
+                except psutil.NoSuchProcess:
+                    pass
+                except (psutil.Error, OSError, ValueError) as e:
+                    result["errors"][member.pid] = str(e) or type(e).__name__
+        return result
+
+    def check_workspace(self, name: str) -> Optional[List[dict]]:
+        """Validates every file of a workspace without launching anything.
+
+        Each entry is resolved (one stat when the launcher cache is still
+        valid) and its working directory checked. Returns one dict per file
+        with file_path, kind, command, cached and error (None if launchable),
+        or None if the workspace doesn't exist.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+
+        rows = self.db.fetch_all(
+            "SELECT file_path, args, cwd FROM workspace_files WHERE workspace_id = ? ORDER BY launch_order, id",
+            (workspace[0],)
         )
-        return success
+        with self.db.transaction() as conn:
+            resolved = resolve_all(conn, [(path, base_dir(path, cwd)) for path, _, cwd in rows])
+
+        opener = None
+        report = []
+        for path, args, cwd in rows:
+            resolution = resolved[path, base_dir(path, cwd)]
+            error = resolution.error
+            if error is None and cwd and not os.path.isdir(cwd):
+                error = f"working directory '{cwd}' does not exist"
+            if error is None and resolution.kind == DOCUMENT and document_opener():
+                if opener is None:
+                    import shutil
+                    opener = shutil.which(document_opener()[0]) or ""
+                if not opener:
+                    error = f"no document opener '{document_opener()[0]}' (set QS_OPEN_WITH)"
+            report.append({
+                "file_path": path,
+                "kind": resolution.kind,
+                "command": resolution.command(json.loads(args) if args else []) if resolution.ok else None,
+                "cached": resolution.cached,
+                "error": error,
+            })
+        return report
 
-    def stop_workspace(self, name: str) -> bool:
-        """Terminates all running processes for a workspace."""
+    def get_workspace_files(self, name: str) -> Optional[List[dict]]:
+        """Returns the files of a workspace in launch order, with their running processes.
+
+        Each dict has name, path, launch_order, args, cwd, depends_on, pids
+        (tracked PIDs still alive) and started_at (epoch seconds of the
+        earliest of them, None when not running). Processes of files since
+        removed from the workspace get a row of their own, with launch_order
+        None. Returns None if the workspace doesn't exist.
+        """
         workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
         if not workspace:
             print(f"Workspace '{name}' not found.")
-            return False
-            
+            return None
         workspace_id = workspace[0]
-        
-        # Get active processes with start time
-        processes = self.db.fetch_all(
-            "SELECT id, pid, file_path, started_at FROM active_processes WHERE workspace_id = ?", 
+        self.reconcile_processes()
+
+        processes: Dict[str, List[tuple]] = {}
+        for path, pid, started_at in self.db.fetch_all(
+            "SELECT file_path, pid, started_at FROM active_processes WHERE workspace_id = ? ORDER BY id",
             (workspace_id,)
+        ):
+            processes.setdefault(path, []).append((pid, started_at))
+        depends_on: Dict[int, List[str]] = {}
+        for file_id, target in self.db.fetch_all("""
+            SELECT dep.file_id, target.file_path
+            FROM workspace_file_deps dep
+            JOIN workspace_files f ON f.id = dep.file_id
+            JOIN workspace_files target ON target.id = dep.depends_on_id
+            WHERE f.workspace_id = ?
+        """, (workspace_id,)):
+            depends_on.setdefault(file_id, []).append(target)
+
+        def entry(path, launch_order=None, args=None, cwd=None, deps=()) -> dict:
+            running = processes.pop(path, [])
+            return {
+                "name": name,
+                "path": path,
+                "launch_order": launch_order,
+                "args": json.loads(args) if args else [],
+                "cwd": cwd,
+                "depends_on": list(deps),
+                "pids": [pid for pid, _ in running],
+                "started_at": min((started for _, started in running if started is not None), default=None),
+            }
+
+        files = [
+            entry(path, order or 0, args, cwd, depends_on.get(file_id, ()))
+            for file_id, path, order, args, cwd in self.db.fetch_all(
+                "SELECT id, file_path, launch_order, args, cwd FROM workspace_files "
+                "WHERE workspace_id = ? ORDER BY launch_order, id",
+                (workspace_id,)
+            )
+        ]
+        return files + [entry(path) for path in list(processes)]
+
+    def stop_workspace(self, name: str, grace: Optional[float] = None) -> bool:
+        """Terminates all running processes for a workspace.
+
+        Every tracked process tree is signalled at once; whatever is still
+        alive after `grace` seconds is killed. PIDs that now belong to some
+        other process are left alone. The outcome is kept in
+        `self.last_stop_report`.
+        """
+        results = self.stop_workspaces([name], grace=grace)
+        return bool(results) and all(results.values())
+
+    def stop_workspaces(self, patterns: Iterable[str] = (), grace: Optional[float] = None,
+                        everything: bool = False) -> Dict[str, bool]:
+        """Stops every workspace matching `patterns` (or, with `everything`, every running one).
+
+        The process table is scanned once and the trees of all workspaces
+        are signalled and waited on together, so stopping ten workspaces
+        takes about as long as stopping the slowest one. Their sessions are
+        closed in one commit. Returns {name: succeeded}; the combined
+        outcome is kept in `self.last_stop_report`. Like start, it holds
+        the workspaces' locks throughout.
+        """
+        found, missing = self.resolve_workspaces(patterns, everything=everything, running=everything)
+        results: Dict[str, bool] = {}
+        self._report_unmatched(missing, results)
+        self.last_stop_report = None
+        if not found:
+            return results
+
+        with self._locked(found, results) as found:
+            if found:
+                self._stop_locked(found, results, grace)
+        return dict(sorted(results.items()))
+
+    def _stop_locked(self, found: Dict[str, int], results: Dict[str, bool], grace: Optional[float]):
+        processes = self.db.fetch_all(
+            "SELECT workspace_id, pid, started_at, create_time, file_path FROM active_processes "
+            "WHERE workspace_id IN (SELECT value FROM json_each(?)) ORDER BY workspace_id",
+            (json.dumps(list(found.values())),)
         )
-        
-        if not processes:
-            print(f"No active processes found for workspace '{name}'.")
-            return True # Not an error, just nothing to stop
-            
-        now = datetime.datetime.utcnow()
-        earliest_start_time = None
-
-        # Terminate all processes
-        for proc_id, pid, path, started_at_str in processes:
-            try:
-                if psutil.pid_exists(pid):
-                    parent = psutil.Process(pid)
-                    # Kill children (if any)
-                    for child in parent.children(recursive=True):
-                        child.terminate()
-                    parent.terminate()
-            except Exception as e:
-                print(f"Error terminating process {pid}: {e}")
-            
-            # Track earliest start time
-            try:
-                # Handle possible formats
-                if "." in started_at_str:
-                     started_at = datetime.datetime.strptime(started_at_str, "%Y-%m-%d %H:%M:%S.%f")
-                else:
-                     started_at = datetime.datetime.strptime(started_at_str, "%Y-%m-%d %H:%M:%S")
-                
-                if earliest_start_time is None or started_at < earliest_start_time:
-                    earliest_start_time = started_at
-            except Exception as e:
-                print(f"Error parsing start time for pid {pid}: {e}")
-
-        # Cleanup DB
-        self.db.execute_query("DELETE FROM active_processes WHERE workspace_id = ?", (workspace_id,))
-
-        # Record Usage (if we successfully determined a start time)
-        if earliest_start_time:
-            duration = (now - earliest_start_time).total_seconds()
-            
+        groups = _RowGroups(processes)
+        running = {}
+        for name, workspace_id in sorted(found.items(), key=lambda item: item[1]):
+            results[name] = True
+            rows = groups.take(workspace_id)
+            if rows:
+                running[workspace_id] = [row[1:] for row in rows]
+            else:
+                print(f"No active processes found for workspace '{name}'.")
+        if not running:
+            return  # Not an error, just nothing to stop
+
+        import psutil
+        from .process_control import ProcessTable, is_same_process, terminate_trees
+
+        now = now_epoch()
+        table = ProcessTable()
+        roots = {}
+
+        for workspace_id, rows in running.items():
+            roots[workspace_id] = []
+            for pid, started_at, create_time, _ in rows:
+                proc = table.get(pid)
+                if proc is None:
+                    continue
+                try:
+                    # An unreaped zombie has exited; its session ended when last seen
+                    if (proc.status() != psutil.STATUS_ZOMBIE
+                            and is_same_process(proc.create_time(), create_time, started_at)):
+                        roots[workspace_id].append(pid)
+                except psutil.Error:
+                    pass
+
+        # Terminate the processes of all workspaces together
+        all_roots = [pid for pids in roots.values() for pid in pids]
+        report = terminate_trees(all_roots, grace=STOP_GRACE_SECONDS if grace is None else grace, table=table)
+        self.last_stop_report = report
+        for pid, error in report.errors.items():
+            print(f"Error terminating process {pid}: {error}")
+        for pid in report.survivors:
+            print(f"Process {pid} did not exit after being killed.")
+
+        with self.db.transaction():
+            # Sessions are read again under the write lock: a reconcile in
+            # another process (e.g. `qs ls`) may have closed some meanwhile
+            ids = (json.dumps(list(running)),)
+            open_sessions = self.db.fetch_all(
+                "SELECT workspace_id, MIN(started_at), MAX(IFNULL(seen_at, started_at)) FROM active_processes "
+                "WHERE workspace_id IN (SELECT value FROM json_each(?)) GROUP BY workspace_id",
+                ids
+            )
+            self.db.execute_query(
+                "DELETE FROM active_processes WHERE workspace_id IN (SELECT value FROM json_each(?))", ids
+            )
+            for workspace_id, rows in running.items():
+                # A file's stop time is when the last process of its tree went away
+                paths = {row[0]: row[3] for row in rows}
+                self._record_timings(workspace_id, "stop", now, [
+                    (paths[root], max(report.exited.get(proc.pid, report.elapsed) for proc in table.tree(root)))
+                    for root in roots[workspace_id]
+                ])
+
+            # Record Usage (if we successfully determined a start time). A
+            # workspace whose processes had all exited already ended when
+            # they were last seen running, not now.
+            for workspace_id, started_at, seen_at in open_sessions:
+                if started_at is not None:
+                    self._close_session(workspace_id, started_at, now if roots.get(workspace_id) else seen_at)
+            self._refresh_completion()
+
+    def _record_timings(self, workspace_id: int, kind: str, recorded_at: int,
+                        timings: List[tuple], prewarmed: bool = False):
+        """Appends (file_path, seconds) timings, keeping the newest TIMING_HISTORY per file.
+
+        Launches that followed a prewarm are kept apart, so both kinds
+        remain to compare.
+        """
+        if TIMING_HISTORY <= 0 or not timings:
+            return
+        with self.db.transaction():
+            self.db.execute_many(
+                "INSERT INTO launch_timings (workspace_id, file_path, kind, recorded_at, seconds, prewarmed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(workspace_id, path, kind, recorded_at, seconds, int(prewarmed)) for path, seconds in timings]
+            )
+            self.db.execute_query("""
+                DELETE FROM launch_timings WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY file_path, prewarmed ORDER BY id DESC) AS age
+                        FROM launch_timings WHERE workspace_id = ? AND kind = ?
+                    ) WHERE age > ?
+                )
+            """, (workspace_id, kind, TIMING_HISTORY))
+
+    def get_timing_history(self, name: str) -> Optional[List[dict]]:
+        """Summarises the recorded launch/stop timings of a workspace, per file.
+
+        Each row has file_path, kind, runs, last, mean, best, worst (seconds)
+        and `trend`: the last run relative to the mean of the earlier ones
+        (0.5 = 50% slower), None with a single run. Returns None if the
+        workspace doesn't exist.
+        """
+        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
+        if not workspace:
+            print(f"Workspace '{name}' not found.")
+            return None
+
+        rows = self.db.fetch_all(
+            "SELECT file_path, kind, seconds FROM launch_timings WHERE workspace_id = ? ORDER BY file_path, kind, id",
+            (workspace[0],)
+        )
+        series = {}
+        for path, kind, seconds in rows:
+            series.setdefault((path, kind), []).append(seconds)
+
+        summary = []
+        for (path, kind), values in series.items():
+            earlier = values[:-1]
+            baseline = sum(earlier) / len(earlier) if earlier else None
+            summary.append({
+                "file_path": path,
+                "kind": kind,
+                "runs": len(values),
+                "last": values[-1],
+                "mean": sum(values) / len(values),
+                "best": min(values),
+                "worst": max(values),
+                "trend": (values[-1] - baseline) / baseline if baseline else None,
+            })
+        return summary
+
+    def prewarm_workspaces(self, patterns: Iterable[str], libraries: bool = False,
+                           max_workers: Optional[int] = None) -> Optional["PrewarmReport"]:
+        """Reads the files of workspaces into the page cache ahead of a launch (see src/prewarm.py).
+
+        `patterns` are names or globs, as for start. Returns None when none
+        matched.
+        """
+        from .prewarm import prewarm, targets
+
+        found, unmatched = self.resolve_workspaces(patterns)
+        self._report_unmatched(unmatched, {})
+        if not found:
+            return None
+
+        rows = self.db.fetch_all(
+            "SELECT file_path, args, cwd FROM workspace_files WHERE workspace_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(found.values())),)
+        )
+        with self.db.transaction() as conn:
+            resolved = resolve_all(conn, [(path, base_dir(path, cwd)) for path, _, cwd in rows])
+        paths = [
+            target for path, args, cwd in rows
+            for target in targets(resolved[path, base_dir(path, cwd)], json.loads(args) if args else (), cwd)
+        ]
+        with span("prewarm", workspaces=len(found), files=len(paths)):
+            report = prewarm(paths, libraries=libraries, max_workers=max_workers or PREWARM_WORKERS)
+        with self.db.transaction():
+            self.db.execute_query(
+                "UPDATE workspaces SET prewarmed_at = ? WHERE id IN (SELECT value FROM json_each(?))",
+                (now_epoch(), json.dumps(list(found.values())))
+            )
+        report.workspaces = list(found)
+        return report
+
+    def predict_prewarm(self, ahead_minutes: int) -> List[str]:
+        """Names of the workspaces usually started in the next `ahead_minutes` (see prewarm.predict())."""
+        from .prewarm import predict
+        return predict(self.db.connect(), now_epoch(), ahead_minutes)
+
+    def get_prewarm_report(self, names: Iterable[str] = ()) -> List[dict]:
+        """Compares recorded spawn times after a prewarm with cold ones, per workspace.
+
+        `names` limits the report to those workspaces. Each row has name,
+        cold_runs, cold_mean, warm_runs and warm_mean (mean seconds to spawn
+        a file, None without runs) and `delta`: warm relative to cold (-0.3 =
+        30% faster), None unless both were seen.
+
+        A spawn time only covers fork/exec, up to Popen returning. Most of
+        what a warm page cache saves comes later, while the app loads its
+        code and data, so this shows only part of a prewarm's effect.
+        """
+        names = list(names)
+        condition, params = "", ()
+        if names:
+            condition, params = "AND w.name IN (SELECT value FROM json_each(?))", (json.dumps(names),)
+        rows = self.db.fetch_all(f"""
+            SELECT w.name, t.prewarmed, COUNT(DISTINCT t.recorded_at), AVG(t.seconds)
+            FROM launch_timings t JOIN workspaces w ON w.id = t.workspace_id
+            WHERE t.kind = 'launch' {condition}
+            GROUP BY t.workspace_id, t.prewarmed
+            ORDER BY w.name
+        """, params)
+        report: Dict[str, dict] = {}
+        for workspace, prewarmed, runs, mean in rows:
+            row = report.setdefault(workspace, {"name": workspace, "cold_runs": 0, "cold_mean": None,
+                                                "warm_runs": 0, "warm_mean": None, "delta": None})
+            kind = "warm" if prewarmed else "cold"
+            row[f"{kind}_runs"], row[f"{kind}_mean"] = runs, mean
+        for row in report.values():
+            if row["cold_mean"] and row["warm_mean"] is not None:
+                row["delta"] = (row["warm_mean"] - row["cold_mean"]) / row["cold_mean"]
+        return list(report.values())
+
+    def _close_session(self, workspace_id: int, started_at: int, ended_at: int):
+        """Logs a finished session (epoch seconds) and adds it to the workspace's total usage."""
+        from .rollups import UPSERT_ROLLUP, session_buckets
+
+        duration = ended_at - started_at
+        with self.db.transaction():
+            # Resource figures, if the session was sampled
+            resources = self.db.fetch_one(
+                "SELECT cpu_sum / samples, cpu_peak, rss_sum / samples, rss_peak FROM session_resources WHERE workspace_id = ?",
+                (workspace_id,)
+            ) or (None, None, None, None)
+            self.db.execute_query("DELETE FROM session_resources WHERE workspace_id = ?", (workspace_id,))
+
             # Log usage
             self.db.execute_query(
-                "INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds) VALUES (?, ?, ?, ?)",
-                (workspace_id, earliest_start_time, now, int(duration))
+                "INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds, "
+                "avg_cpu, peak_cpu, avg_rss, peak_rss) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (workspace_id, started_at, ended_at, duration) + tuple(resources)
             )
-            
+
             # Update total usage for workspace
             self.db.execute_query(
                 "UPDATE workspaces SET total_usage_seconds = total_usage_seconds + ? WHERE id = ?",
-                (int(duration), workspace_id)
+                (duration, workspace_id)
             )
 
+            # Keep the day/week/month rollups in step with the raw sessions
+            self.db.execute_many(UPSERT_ROLLUP, [
+                (workspace_id, period, bucket, sessions, seconds)
+                for period, bucket, sessions, seconds in session_buckets(started_at, ended_at)
+            ])
+
+    def reconcile_processes(self) -> int:
+        """Drops tracked processes that have exited (or whose PID was reused).
+
+        All tracked PIDs are checked against one listing of the process
+        table; the live ones are marked as seen now. Workspaces left with
+        no live process get their usage session closed, ending when one of
+        their processes was last seen running (so a workspace that died
+        unnoticed isn't charged for the time until this check). Returns the
+        number of rows pruned.
+        """
+        rows = self.db.fetch_all(
+            "SELECT id, workspace_id, pid, started_at, create_time, seen_at FROM active_processes"
+        )
+        if not rows:
+            return 0
+
+        from .process_control import is_same_process, live_create_times
+
+        live = live_create_times(pid for _, _, pid, _, _, _ in rows)
+        now = now_epoch()
+        dead, seen = [], []
+        for row_id, _, pid, started_at, create_time, seen_at in rows:
+            if not is_same_process(live.get(pid), create_time, started_at):
+                dead.append(row_id)
+            elif seen_at is None or seen_at < now:
+                seen.append(row_id)
+        if not dead and not seen:
+            return 0
+
+        with self.db.transaction() as conn:
+            self._mark_seen(seen, now)
+            if not dead:
+                return 0
+            # Decided under the write lock: rows a concurrent stop already
+            # removed are gone (with their session closed), and a concurrent
+            # start may have added live ones
+            ids = (json.dumps(dead),)
+            session_bounds = conn.execute("""
+                SELECT workspace_id, MIN(started_at), MAX(IFNULL(seen_at, started_at)) FROM active_processes
+                WHERE workspace_id IN (SELECT workspace_id FROM active_processes
+                                       WHERE id IN (SELECT value FROM json_each(?)))
+                GROUP BY workspace_id
+            """, ids).fetchall()
+            pruned = conn.execute(
+                "DELETE FROM active_processes WHERE id IN (SELECT value FROM json_each(?))", ids
+            ).rowcount
+            for workspace_id, started_at, seen_at in session_bounds:
+                remaining = conn.execute(
+                    "SELECT 1 FROM active_processes WHERE workspace_id = ? LIMIT 1", (workspace_id,)
+                ).fetchone()
+                if started_at is not None and not remaining:
+                    self._close_session(workspace_id, started_at, seen_at)
+            self._refresh_completion()
+        return pruned
+
+    def _mark_seen(self, row_ids: List[int], now: int):
+        """Records that the given active_processes rows were seen running at `now`."""
+        if row_ids:
+            self.db.execute_query(
+                "UPDATE active_processes SET seen_at = ? WHERE id IN (SELECT value FROM json_each(?))",
+                (now, json.dumps(row_ids))
+            )
+
+    def record_process_exit(self, pid: int, create_time: Optional[float], ended_at: int) -> bool:
+        """Removes an exited process; closes the session if it was the last one.
+
+        Used by the daemon, which reaps the processes it launched and so
+        knows exactly when they ended (`ended_at`, epoch seconds). Only the
+        row of the process created at `create_time` matches, not a stale
+        one whose PID number was reused. Returns False if it wasn't tracked.
+        """
+        from .process_control import is_same_process
+
+        with self.db.transaction():
+            rows = self.db.fetch_all(
+                "SELECT id, workspace_id, started_at, create_time FROM active_processes WHERE pid = ?", (pid,)
+            )
+            row = next((row for row in rows if is_same_process(create_time, row[3], row[2])), None)
+            if not row:
+                return False
+            row_id, workspace_id = row[:2]
+            started = self.db.fetch_all(
+                "SELECT started_at FROM active_processes WHERE workspace_id = ?", (workspace_id,)
+            )
+            self.db.execute_query("DELETE FROM active_processes WHERE id = ?", (row_id,))
+            if len(started) == 1 and started[0][0] is not None:
+                self._close_session(workspace_id, started[0][0], ended_at)
+                self._refresh_completion()
         return True
 
-    def get_active_workspaces(self) -> List[dict]:
-        """Returns a list of workspaces that have active processes."""
+    def sample_resources(self, name: Optional[str] = None, record: bool = False) -> List[dict]:
+        """Samples the resource use of running workspaces (or only `name`).
+
+        Every tracked process tree is read from a single scan of the process
+        table. Returns one dict per workspace with `name`, `usage` (a
+        TreeUsage summed over its trees) and `trees`: the file_path, pid and
+        usage of each tracked tree. With `record`, each workspace's figures
+        also go into the resource_samples ring and the open session's
+        peak/average.
+        """
+        query = """
+        SELECT w.id, w.name, ap.id, ap.pid, ap.file_path, ap.started_at, ap.create_time
+        FROM active_processes ap JOIN workspaces w ON w.id = ap.workspace_id
+        """
+        params: tuple = ()
+        if name:
+            query += " WHERE w.name = ?"
+            params = (name,)
+        rows = self.db.fetch_all(query + " ORDER BY w.name, ap.id", params)
+        if not rows:
+            return []
+
+        import psutil
+        from .process_control import ProcessTable, TreeUsage, is_same_process, sample_tree
+
+        table = ProcessTable()
+        workspaces: Dict[int, dict] = {}
+        seen = []
+        for workspace_id, workspace_name, row_id, pid, path, started_at, create_time in rows:
+            proc = table.get(pid)
+            if proc is None:
+                continue
+            try:
+                if (proc.status() == psutil.STATUS_ZOMBIE
+                        or not is_same_process(proc.create_time(), create_time, started_at)):
+                    continue
+            except (psutil.Error, ValueError):
+                continue
+            seen.append(row_id)
+            usage = sample_tree(table, pid)
+            entry = workspaces.setdefault(workspace_id, {"name": workspace_name, "usage": TreeUsage(), "trees": []})
+            entry["usage"].add(usage)
+            entry["trees"].append({"file_path": path, "pid": pid, "usage": usage})
+
+        if record and workspaces:
+            self._record_samples({workspace_id: entry["usage"] for workspace_id, entry in workspaces.items()}, seen)
+        return list(workspaces.values())
+
+    def _record_samples(self, samples: Dict[int, "TreeUsage"], seen: List[int]):
+        """Writes one sample per workspace into its ring slot and the session totals.
+
+        `seen` are the active_processes rows found running while sampling.
+        """
+        now = now_epoch()
+        marks = ",".join("?" * len(samples))
+        with self.db.transaction():
+            self._mark_seen(seen, now)
+            if RESOURCE_SAMPLE_SLOTS <= 0:
+                return
+            seqs = dict(self.db.fetch_all(
+                f"SELECT id, sample_seq FROM workspaces WHERE id IN ({marks})", tuple(samples)
+            ))
+            self.db.execute_many("""
+                INSERT INTO resource_samples (workspace_id, slot, sampled_at, processes, cpu_percent, rss, threads, fds)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (workspace_id, slot) DO UPDATE SET
+                    sampled_at = excluded.sampled_at, processes = excluded.processes,
+                    cpu_percent = excluded.cpu_percent, rss = excluded.rss,
+                    threads = excluded.threads, fds = excluded.fds
+            """, [
+                (workspace_id, seqs[workspace_id] % RESOURCE_SAMPLE_SLOTS, now,
+                 u.processes, u.cpu_percent, u.rss, u.threads, u.fds)
+                for workspace_id, u in samples.items()
+            ])
+            self.db.execute_many(
+                "UPDATE workspaces SET sample_seq = sample_seq + 1 WHERE id = ?",
+                [(workspace_id,) for workspace_id in samples]
+            )
+            # Slots beyond a since lowered QS_SAMPLE_SLOTS would never be overwritten
+            self.db.execute_query(
+                f"DELETE FROM resource_samples WHERE workspace_id IN ({marks}) AND slot >= ?",
+                tuple(samples) + (RESOURCE_SAMPLE_SLOTS,)
+            )
+            self.db.execute_many("""
+                INSERT INTO session_resources (workspace_id, samples, cpu_sum, cpu_peak, rss_sum, rss_peak)
+                VALUES (?, 1, ?, ?, ?, ?)
+                ON CONFLICT (workspace_id) DO UPDATE SET
+                    samples = samples + 1,
+                    cpu_sum = cpu_sum + excluded.cpu_sum, cpu_peak = MAX(cpu_peak, excluded.cpu_peak),
+                    rss_sum = rss_sum + excluded.rss_sum, rss_peak = MAX(rss_peak, excluded.rss_peak)
+            """, [
+                (workspace_id, u.cpu_percent, u.cpu_percent, u.rss, u.rss)
+                for workspace_id, u in samples.items()
+            ])
+
+    def get_sessions(self, name: Optional[str] = None, since: Optional[datetime.date] = None,
+                     until: Optional[datetime.date] = None, limit: Optional[int] = None) -> List[dict]:
+        """Returns finished sessions, newest first, with their resource figures.
+
+        avg_cpu/peak_cpu (percent of one core) and avg_rss/peak_rss (bytes)
+        are None for sessions that were never sampled.
+        """
+        return list(self.iter_sessions(name=name, since=since, until=until, limit=limit))
+
+    def iter_sessions(self, name: Optional[str] = None, since: Optional[datetime.date] = None,
+                      until: Optional[datetime.date] = None, limit: Optional[int] = None,
+                      batch_size: int = 500) -> Iterator[dict]:
+        """Like get_sessions(), yielding the sessions as they are read."""
+        from .transfer import RESOURCE_FIELDS
+
+        conditions, params = [], []
+        if name:
+            conditions.append("w.name = ?")
+            params.append(name)
+        if since:
+            conditions.append("u.started_at >= ?")
+            params.append(utc_to_epoch(since))
+        if until:
+            conditions.append("u.started_at < ?")
+            params.append(utc_to_epoch(until + datetime.timedelta(days=1)))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        query = f"""
+        SELECT w.name, u.started_at, u.ended_at, u.duration_seconds, u.{", u.".join(RESOURCE_FIELDS)}
+        FROM workspace_usage u JOIN workspaces w ON w.id = u.workspace_id
+        {where}
+        ORDER BY u.started_at DESC
+        """
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        keys = ("name", "started_at", "ended_at", "duration_seconds") + RESOURCE_FIELDS
+        for row in _stream(self.db.connect().execute(query, tuple(params)), batch_size):
+            yield dict(zip(keys, row))
+
+    def get_active_workspaces(self) -> List[str]:
+        """Returns the names of workspaces that have live processes."""
+        self.reconcile_processes()
+
         # Simple distinct check
         query = """
         SELECT DISTINCT w.name 
@@ -192,21 +1296,405 @@ class WorkspaceManager:
         rows = self.db.fetch_all(query)
         return [row[0] for row in rows]
 
+    def get_usage_stats(self, period: Optional[str] = None, since: Optional[datetime.date] = None,
+                        until: Optional[datetime.date] = None, name: Optional[str] = None,
+                        top: Optional[int] = None) -> List[dict]:
+        """Returns usage from the rollup tables.
+
+        With `period` ("day", "week" or "month") there is one row per
+        workspace and bucket, newest bucket first; without it, one total per
+        workspace. `since`/`until` are inclusive dates, `top` keeps only the
+        N workspaces with the most usage in the range.
+        """
+        return list(self.iter_usage_stats(period=period, since=since, until=until, name=name, top=top))
+
+    def iter_usage_stats(self, period: Optional[str] = None, since: Optional[datetime.date] = None,
+                         until: Optional[datetime.date] = None, name: Optional[str] = None,
+                         top: Optional[int] = None, batch_size: int = 500) -> Iterator[dict]:
+        """Like get_usage_stats(), yielding the rows as they are read."""
+        from .rollups import bucket_key
+
+        # Totals are read from the day buckets so date ranges stay exact
+        source_period = period or "day"
+        conditions = ["r.period = ?"]
+        params: list = [source_period]
+        if since:
+            conditions.append("r.bucket >= ?")
+            params.append(bucket_key(source_period, datetime.datetime.combine(since, datetime.time())))
+        if until:
+            conditions.append("r.bucket <= ?")
+            params.append(bucket_key(source_period, datetime.datetime.combine(until, datetime.time())))
+        if name:
+            conditions.append("w.name = ?")
+            params.append(name)
+        where = " AND ".join(conditions)
+
+        if top:
+            conditions.append(f"""r.workspace_id IN (
+                SELECT r.workspace_id FROM usage_rollups r JOIN workspaces w ON w.id = r.workspace_id
+                WHERE {where} GROUP BY r.workspace_id ORDER BY SUM(r.seconds) DESC LIMIT ?
+            )""")
+            params = params + params + [top]
+            where = " AND ".join(conditions)
+
+        if period:
+            query = f"""
+            SELECT w.name, r.bucket, r.sessions, r.seconds
+            FROM usage_rollups r JOIN workspaces w ON w.id = r.workspace_id
+            WHERE {where}
+            ORDER BY r.bucket DESC, r.seconds DESC
+            """
+        else:
+            query = f"""
+            SELECT w.name, NULL, SUM(r.sessions), SUM(r.seconds)
+            FROM usage_rollups r JOIN workspaces w ON w.id = r.workspace_id
+            WHERE {where}
+            GROUP BY r.workspace_id
+            ORDER BY SUM(r.seconds) DESC
+            """
+        for row in _stream(self.db.connect().execute(query, tuple(params)), batch_size):
+            yield {"name": row[0], "bucket": row[1], "sessions": row[2], "seconds": row[3]}
+
+    def rebuild_usage_rollups(self) -> int:
+        """Recomputes the usage rollups from raw sessions; returns the bucket count."""
+        from .rollups import rebuild_rollups
+
+        with self.db.transaction() as conn:
+            return rebuild_rollups(conn)
+
+    def run_maintenance(self, retention_days: Optional[int] = None, archive_path: Optional[str] = None,
+                        full: bool = False):
+        """Prunes, archives, vacuums and analyzes the database (see src/maintenance.py).
+
+        `retention_days` defaults to QS_RETENTION_DAYS. Returns a
+        MaintenanceReport, or None if the run failed.
+        """
+        from . import maintenance
+
+        try:
+            return maintenance.run(self.db, RETENTION_DAYS if retention_days is None else retention_days,
+                                   archive_path=archive_path, full=full)
+        except Exception as e:
+            print(f"Error during maintenance: {e}")
+            return None
+
+    def iter_export_records(self, include_usage: bool = False) -> Iterator[dict]:
+        """Yields every workspace as an export record (see src/transfer.py), by id.
+
+        Workspaces, files, dependencies and usage are each read with a single
+        query ordered by workspace and merged as they stream, so memory use is
+        bounded by the largest workspace rather than the whole database.
+        """
+        from .transfer import RESOURCE_FIELDS
+
+        conn = self.db.connect()
+        workspaces = conn.execute("""
+            SELECT id, name, created_at, last_activated_at, activate_count, total_usage_seconds
+            FROM workspaces ORDER BY id
+        """)
+        files = _RowGroups(conn.execute(
+            "SELECT workspace_id, id, file_path, launch_order, args, cwd, env FROM workspace_files ORDER BY workspace_id, id"
+        ))
+        deps = _RowGroups(conn.execute("""
+            SELECT f.workspace_id, dep.file_id, target.file_path
+            FROM workspace_file_deps dep
+            JOIN workspace_files f ON f.id = dep.file_id
+            JOIN workspace_files target ON target.id = dep.depends_on_id
+            ORDER BY f.workspace_id
+        """))
+        policies = _RowGroups(conn.execute(
+            f"SELECT workspace_id, file_id, {', '.join(POLICY_FIELDS)} FROM resource_policies ORDER BY workspace_id"
+        ))
+        usage = _RowGroups(conn.execute(f"""
+            SELECT workspace_id, started_at, ended_at, duration_seconds, {", ".join(RESOURCE_FIELDS)}
+            FROM workspace_usage ORDER BY workspace_id, id
+        """)) if include_usage else None
+
+        for workspace_id, name, created_at, last_activated_at, activate_count, total in workspaces:
+            depends_on: Dict[int, List[str]] = {}
+            for _, file_id, target in deps.take(workspace_id):
+                depends_on.setdefault(file_id, []).append(target)
+            policy_of = {
+                row[1]: {k: v for k, v in ResourcePolicy.from_row(row[2:]).as_dict().items() if v is not None}
+                for row in policies.take(workspace_id)
+            }
+            record = {
+                "name": name,
+                "created_at": format_utc_iso(created_at),
+                "last_activated_at": format_utc_iso(last_activated_at),
+                "activate_count": activate_count or 0,
+                "total_usage_seconds": total or 0,
+                "files": [
+                    {
+                        "path": path,
+                        "launch_order": order or 0,
+                        "depends_on": depends_on.get(file_id, []),
+                        "args": json.loads(args) if args else [],
+                        "cwd": cwd,
+                        "env": json.loads(env) if env else {},
+                        **({"policy": policy_of[file_id]} if file_id in policy_of else {}),
+                    }
+                    for _, file_id, path, order, args, cwd, env in files.take(workspace_id)
+                ],
+            }
+            if 0 in policy_of:
+                record["policy"] = policy_of[0]
+            if usage is not None:
+                record["usage"] = []
+                for _, started, ended, duration, *resources in usage.take(workspace_id):
+                    session = {"started_at": format_utc_iso(started), "ended_at": format_utc_iso(ended),
+                               "duration_seconds": duration}
+                    session.update((field, value) for field, value in zip(RESOURCE_FIELDS, resources) if value is not None)
+                    record["usage"].append(session)
+            yield record
+
+    def import_workspaces(self, records: Iterable[dict], on_conflict: str = "skip",
+                          batch_size: int = 500) -> dict:
+        """Imports export records in a single transaction.
+
+        `on_conflict` decides what happens to a workspace whose name exists:
+        "skip" leaves it alone, "merge" adds the files, dependencies and usage
+        sessions it doesn't have yet (sessions on a day `qs maintenance`
+        archived for it count as had), and "upsert" replaces its files and
+        counters with the record's (and its usage history, if the record
+        carries one). Records are written in batches with executemany.
+        Returns {"created", "updated", "skipped"} counts; a malformed record
+        raises ValueError and nothing is imported.
+        """
+        from .transfer import normalize_record
+
+        counts = {"created": 0, "updated": 0, "skipped": 0}
+        with self.db.transaction():
+            batch: Dict[str, dict] = {}
+            for position, raw in enumerate(records, 1):
+                record = normalize_record(raw, position)
+                # A repeated name must see the earlier record in the DB
+                if record["name"] in batch or len(batch) >= batch_size:
+                    self._import_batch(list(batch.values()), on_conflict, counts)
+                    batch = {}
+                batch[record["name"]] = record
+            if batch:
+                self._import_batch(list(batch.values()), on_conflict, counts)
+            self._refresh_completion(names=True)
+            self._definitions_changed()
+        return counts
+
+    def _import_batch(self, records: List[dict], on_conflict: str, counts: dict):
+        from .rollups import UPSERT_ROLLUP, accumulate, bucket_key
+        from .transfer import RESOURCE_FIELDS
+        from .utils import epoch_to_utc
+
+        conn = self.db.connect()
+
+        def ids_by_name(names: List[str]) -> Dict[str, int]:
+            marks = ",".join("?" * len(names))
+            return {name: wid for wid, name in conn.execute(
+                f"SELECT id, name FROM workspaces WHERE name IN ({marks})", names
+            )}
+
+        existing = ids_by_name([r["name"] for r in records])
+        new = [r for r in records if r["name"] not in existing]
+        conflicting = [r for r in records if r["name"] in existing]
+        if on_conflict == "skip":
+            counts["skipped"] += len(conflicting)
+            conflicting = []
+        counts["created"] += len(new)
+        counts["updated"] += len(conflicting)
+
+        def usage_total(record: dict) -> int:
+            if record["total_usage_seconds"] is not None:
+                return record["total_usage_seconds"]
+            return sum(session[2] for session in record["usage"] or ())
+
+        conn.executemany("""
+            INSERT INTO workspaces (name, created_at, last_activated_at, activate_count, total_usage_seconds)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (r["name"], r["created_at"] if r["created_at"] is not None else now_epoch(), r["last_activated_at"], r["activate_count"], usage_total(r))
+            for r in new
+        ])
+        ids = ids_by_name([r["name"] for r in new]) if new else {}
+        ids.update((r["name"], existing[r["name"]]) for r in conflicting)
+
+        replaced = [ids[r["name"]] for r in conflicting] if on_conflict == "upsert" else []
+        replaced_usage = [ids[r["name"]] for r in conflicting if on_conflict == "upsert" and r["usage"] is not None]
+        if replaced:
+            marks = ",".join("?" * len(replaced))
+            conn.execute(
+                f"DELETE FROM workspace_file_deps WHERE file_id IN (SELECT id FROM workspace_files WHERE workspace_id IN ({marks}))",
+                replaced
+            )
+            conn.execute(f"DELETE FROM workspace_files WHERE workspace_id IN ({marks})", replaced)
+            conn.executemany("""
+                UPDATE workspaces SET created_at = COALESCE(?, created_at), last_activated_at = ?,
+                    activate_count = ?, total_usage_seconds = COALESCE(?, total_usage_seconds)
+                WHERE id = ?
+            """, [
+                (r["created_at"], r["last_activated_at"], r["activate_count"],
+                 usage_total(r) if r["usage"] is not None else None, ids[r["name"]])
+                for r in conflicting
+            ])
+        if replaced_usage:
+            marks = ",".join("?" * len(replaced_usage))
+            conn.execute(f"DELETE FROM workspace_usage WHERE workspace_id IN ({marks})", replaced_usage)
+            conn.execute(f"DELETE FROM usage_rollups WHERE workspace_id IN ({marks})", replaced_usage)
+            conn.execute(f"DELETE FROM usage_archive WHERE workspace_id IN ({marks})", replaced_usage)
+
+        # Files, dependencies and usage of merged workspaces only add what's missing
+        merged = {ids[r["name"]] for r in conflicting} if on_conflict == "merge" else set()
+        known_files, known_sessions, archived_days = set(), set(), set()
+        if merged:
+            marks = ",".join("?" * len(merged))
+            known_files = set(conn.execute(
+                f"SELECT workspace_id, file_path FROM workspace_files WHERE workspace_id IN ({marks})", list(merged)
+            ))
+            known_sessions = set(conn.execute(
+                f"SELECT workspace_id, started_at FROM workspace_usage WHERE workspace_id IN ({marks})", list(merged)
+            ))
+            # Sessions `qs maintenance` folded away only survive as per-day
+            # counts, so a session starting on such a day may be one of them
+            # (e.g. from an export taken before the maintenance run)
+            archived_days = set(conn.execute(
+                f"SELECT workspace_id, day FROM usage_archive WHERE sessions > 0 AND workspace_id IN ({marks})",
+                list(merged)
+            ))
+
+        touched = new + conflicting
+        conn.executemany(
+            "INSERT INTO workspace_files (workspace_id, file_path, launch_order, args, cwd, env) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (ids[r["name"]], f["path"], f["launch_order"],
+                 json.dumps(f["args"]) if f["args"] else None, f["cwd"],
+                 json.dumps(f["env"]) if f["env"] else None)
+                for r in touched for f in r["files"]
+                if (ids[r["name"]], f["path"]) not in known_files
+            ]
+        )
+
+        if any(f["depends_on"] for r in touched for f in r["files"]):
+            touched_ids = [ids[r["name"]] for r in touched]
+            marks = ",".join("?" * len(touched_ids))
+            file_ids = {(wid, path): fid for fid, wid, path in conn.execute(
+                f"SELECT id, workspace_id, file_path FROM workspace_files WHERE workspace_id IN ({marks})", touched_ids
+            )}
+            edges = []
+            for r in touched:
+                wid = ids[r["name"]]
+                for f in r["files"]:
+                    for dep in f["depends_on"]:
+                        if (wid, dep) not in file_ids:
+                            raise ValueError(f"Workspace '{r['name']}': '{f['path']}' depends on unknown file '{dep}'.")
+                        edges.append((file_ids[(wid, f["path"])], file_ids[(wid, dep)]))
+            conn.executemany("INSERT OR IGNORE INTO workspace_file_deps (file_id, depends_on_id) VALUES (?, ?)", edges)
+
+        self._import_policies(conn, touched, ids, on_conflict)
+
+        sessions, rollups, added = [], {}, {}
+        for r in touched:
+            wid = ids[r["name"]]
+            for started_at, ended_at, duration, resources in r["usage"] or ():
+                if (wid, started_at) in known_sessions:
+                    continue
+                if archived_days and (wid, bucket_key("day", epoch_to_utc(started_at))) in archived_days:
+                    continue
+                sessions.append((wid, started_at, ended_at, duration) + resources)
+                accumulate(rollups, wid, started_at, ended_at)
+                added[wid] = added.get(wid, 0) + duration
+        conn.executemany(f"""
+            INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds, {", ".join(RESOURCE_FIELDS)})
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, sessions)
+        conn.executemany(UPSERT_ROLLUP, [(wid, period, bucket, n, secs) for (wid, period, bucket), (n, secs) in rollups.items()])
+        if merged:
+            conn.executemany(
+                "UPDATE workspaces SET total_usage_seconds = total_usage_seconds + ? WHERE id = ?",
+                [(seconds, wid) for wid, seconds in added.items() if wid in merged]
+            )
+
+    def _import_policies(self, conn, records: List[dict], ids: Dict[str, int], on_conflict: str):
+        """Stores the workspace and file policies of imported records.
+
+        "upsert" replaces the workspace policy (per-file ones went with the
+        replaced files); "merge" only adds policies that don't exist yet.
+        """
+        if on_conflict == "upsert" and records:
+            conn.executemany(
+                "DELETE FROM resource_policies WHERE workspace_id = ? AND file_id = 0",
+                [(ids[r["name"]],) for r in records]
+            )
+        if not any(r["policy"] or any(f["policy"] for f in r["files"]) for r in records):
+            return
+
+        with_file_policies = [ids[r["name"]] for r in records if any(f["policy"] for f in r["files"])]
+        file_ids = {}
+        if with_file_policies:
+            marks = ",".join("?" * len(with_file_policies))
+            file_ids = {(wid, path): fid for fid, wid, path in conn.execute(
+                f"SELECT id, workspace_id, file_path FROM workspace_files WHERE workspace_id IN ({marks})",
+                with_file_policies
+            )}
+
+        rows = []
+        for r in records:
+            wid = ids[r["name"]]
+            if r["policy"]:
+                rows.append((wid, 0) + r["policy"].to_row())
+            for f in r["files"]:
+                if f["policy"]:
+                    rows.append((wid, file_ids[(wid, f["path"])]) + f["policy"].to_row())
+        verb = "INSERT OR IGNORE" if on_conflict == "merge" else "INSERT OR REPLACE"
+        conn.executemany(
+            f"{verb} INTO resource_policies (workspace_id, file_id, {', '.join(POLICY_FIELDS)}) "
+            f"VALUES (?, ?, {', '.join('?' * len(POLICY_FIELDS))})",
+            rows
+        )
+
     def delete_workspace(self, name: str) -> bool:
         """Deletes a workspace and its associated files."""
-        workspace = self.db.fetch_one("SELECT id FROM workspaces WHERE name = ?", (name,))
-        if not workspace:
-             print(f"Workspace '{name}' not found.")
-             return False
-        
-        # Cascading delete is set up in schema, but to be sure we can delete parent
+        results = self.delete_workspaces([name])
+        return bool(results) and all(results.values())
+
+    def delete_workspaces(self, patterns: Iterable[str] = (), everything: bool = False,
+                          idle_before: Optional[int] = None) -> Dict[str, bool]:
+        """Deletes every workspace matching `patterns` (names or globs) and all their history.
+
+        Takes the same selection arguments as resolve_workspaces(). All rows
+        go in one transaction, one statement per table. Returns {name: deleted}.
+        """
+        found, missing = self.resolve_workspaces(patterns, everything=everything, idle_before=idle_before)
+        results: Dict[str, bool] = {}
+        self._report_unmatched(missing, results)
+        if not found:
+            return results
+
+        with self._locked(found, results) as found:
+            if found:
+                self._delete_locked(found, results)
+        return dict(sorted(results.items()))
+
+    def _delete_locked(self, found: Dict[str, int], results: Dict[str, bool]):
+        ids = (json.dumps(list(found.values())),)
+        selected = "workspace_id IN (SELECT value FROM json_each(?))"
         try:
-            # Explicitly delete usage history and files (though schema might cascade, explicit is safer in some sqlite versions/configs)
-            self.db.execute_query("DELETE FROM workspace_usage WHERE workspace_id = ?", (workspace[0],))
-            self.db.execute_query("DELETE FROM workspace_files WHERE workspace_id = ?", (workspace[0],))
-            self.db.execute_query("DELETE FROM active_processes WHERE workspace_id = ?", (workspace[0],))
-            self.db.execute_query("DELETE FROM workspaces WHERE name = ?", (name,))
-            return True
+            # Cascades aren't relied on: every dependent table is cleared explicitly
+            with self.db.transaction():
+                for table in ("workspace_usage", "usage_rollups", "usage_archive", "launch_timings",
+                              "resource_samples", "session_resources", "resource_policies"):
+                    self.db.execute_query(f"DELETE FROM {table} WHERE {selected}", ids)
+                self.db.execute_query(
+                    f"DELETE FROM workspace_file_deps WHERE file_id IN (SELECT id FROM workspace_files WHERE {selected})",
+                    ids
+                )
+                self.db.execute_query(f"DELETE FROM workspace_files WHERE {selected}", ids)
+                self.db.execute_query(f"DELETE FROM active_processes WHERE {selected}", ids)
+                self.db.execute_query("DELETE FROM workspaces WHERE id IN (SELECT value FROM json_each(?))", ids)
+                self._refresh_completion(names=True)
+                self._definitions_changed()
+            results.update((name, True) for name in found)
+            # Still held by this command, see locks.remove_locks()
+            remove_locks(self.db.db_path, found.values())
+            # Hand the freed pages back (no-op until the DB uses incremental auto-vacuum)
+            self.db.fetch_all("PRAGMA incremental_vacuum")
         except Exception as e:
             print(f"Error deleting workspace: {e}")
-            return False
+            results.update((name, False) for name in found)
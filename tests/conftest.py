@@ -0,0 +1,16 @@
+import pytest
+
+from src.database_manager import DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "qs.db")
+
+
+@pytest.fixture
+def manager(db_path):
+    manager = WorkspaceManager(DatabaseManager(db_path))
+    yield manager
+    manager.db.close()
@@ -0,0 +1,114 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from src.launcher import LaunchEngine, LaunchItem
+
+
+class Spawner:
+    """A spawn function that records the order and threads of launches."""
+
+    def __init__(self, fail=(), delay=0.0):
+        self.fail = dict(fail)   # key -> exception to raise
+        self.delay = delay
+        self.order = []
+        self.threads = {}
+        self.running = 0
+        self.concurrent = {}     # key -> launches running alongside it
+        self._lock = threading.Lock()
+
+    def __call__(self, key):
+        with self._lock:
+            self.running += 1
+            self.concurrent[key] = self.running - 1
+            self.threads[key] = threading.current_thread()
+        try:
+            time.sleep(self.delay)
+            if key in self.fail:
+                raise self.fail[key]
+            with self._lock:
+                self.order.append(key)
+            return SimpleNamespace(pid=1000 + len(self.order))
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def by_key(results):
+    return {result.key: result for result in results}
+
+
+def test_results_follow_input_order():
+    items = [LaunchItem(key) for key in "cab"]
+    results = LaunchEngine(4).run(items, Spawner())
+    assert [result.key for result in results] == ["c", "a", "b"]
+    assert all(result.ok and result.pid for result in results)
+
+
+def test_dependencies_launch_first():
+    spawner = Spawner(delay=0.01)
+    items = [LaunchItem("app", depends_on=["db", "cache"]), LaunchItem("db"), LaunchItem("cache", depends_on=["db"])]
+    results = by_key(LaunchEngine(4).run(items, spawner))
+    assert spawner.order == ["db", "cache", "app"]
+    assert results["app"].ready_at >= results["cache"].ready_at >= results["db"].ready_at
+
+
+def test_failed_dependency_skips_only_hard_dependents():
+    spawner = Spawner(fail={"db": OSError("no such file")})
+    items = [
+        LaunchItem("db"),
+        LaunchItem("app", depends_on=["db"]),
+        LaunchItem("worker", depends_on=["app"]),
+        LaunchItem("later", after=["db"]),        # the next stage: only ordered after it
+        LaunchItem("unrelated"),
+    ]
+    results = by_key(LaunchEngine(4).run(items, spawner))
+    assert results["db"].error == "no such file"
+    assert results["app"].error == "a dependency failed to launch"
+    assert results["worker"].error == "a dependency failed to launch"
+    assert results["later"].ok and results["unrelated"].ok
+    assert set(spawner.order) == {"later", "unrelated"}
+
+
+def test_soft_ordering_waits_for_the_attempt():
+    spawner = Spawner(delay=0.01)
+    items = [LaunchItem("second", after=["first"]), LaunchItem("first")]
+    LaunchEngine(4).run(items, spawner)
+    assert spawner.order == ["first", "second"]
+
+
+def test_any_spawn_exception_fails_only_its_item():
+    spawner = Spawner(fail={"bad": ValueError("embedded null byte"), "env": TypeError()})
+    items = [LaunchItem("bad"), LaunchItem("env"), LaunchItem("good")]
+    results = by_key(LaunchEngine(4).run(items, spawner))
+    assert results["bad"].error == "embedded null byte"
+    assert results["env"].error == "TypeError"
+    assert results["good"].ok
+
+
+def test_single_item_failure_is_reported():
+    results = LaunchEngine(4).run([LaunchItem("only")], Spawner(fail={"only": ValueError("bad")}))
+    assert results[0].error == "bad"
+
+
+def test_cycle_is_reported_not_hung():
+    items = [LaunchItem("a", depends_on=["b"]), LaunchItem("b", depends_on=["a"]), LaunchItem("c")]
+    results = by_key(LaunchEngine(4).run(items, Spawner()))
+    assert results["a"].error == results["b"].error == "dependency cycle"
+    assert results["c"].ok
+
+
+def test_unknown_and_self_dependencies_are_ignored():
+    items = [LaunchItem("a", depends_on=["a", "missing"], after=["gone"])]
+    assert LaunchEngine(4).run(items, Spawner())[0].ok
+
+
+def test_exclusive_items_launch_alone_on_the_calling_thread():
+    spawner = Spawner(delay=0.02)
+    items = [LaunchItem(f"plain{i}") for i in range(4)] + [LaunchItem("policy", exclusive=True),
+                                                         LaunchItem("policy2", exclusive=True)]
+    results = LaunchEngine(4).run(items, spawner)
+    assert all(result.ok for result in results)
+    for key in ("policy", "policy2"):
+        assert spawner.threads[key] is threading.main_thread()
+        assert spawner.concurrent[key] == 0
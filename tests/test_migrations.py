@@ -0,0 +1,72 @@
+import sqlite3
+
+from src.database_manager import MIGRATIONS, DatabaseManager
+from src.workspace_manager import WorkspaceManager
+
+# 2024-01-02 10:00:00 UTC and friends, as the pre-epoch schema stored them
+CREATED = ("2024-01-02 10:00:00", 1704189600)
+STARTED = ("2024-03-30 23:30:00", 1711841400)
+ENDED = ("2024-03-31 00:30:00", 1711845000)
+
+
+def legacy_db(path, version=10):
+    """A database migrated only up to `version`, as an older release left it."""
+    conn = sqlite3.connect(path, isolation_level=None)
+    for migration in MIGRATIONS[:version]:
+        migration(conn)
+    conn.execute(f"PRAGMA user_version = {version}")
+    return conn
+
+
+def test_epoch_migration_converts_text_timestamps(db_path):
+    conn = legacy_db(db_path)
+    conn.execute("INSERT INTO workspaces (id, name, created_at, last_activated_at, activate_count, total_usage_seconds) "
+                 "VALUES (1, 'old', ?, ?, 1, 3600)", (CREATED[0], STARTED[0]))
+    conn.execute("INSERT INTO workspaces (id, name, created_at) VALUES (2, 'never', ?)", (CREATED[0],))
+    conn.execute("INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds) VALUES (1, ?, ?, 3600)",
+                 (STARTED[0], ENDED[0]))
+    conn.execute("INSERT INTO launch_timings (workspace_id, file_path, kind, recorded_at, seconds) "
+                 "VALUES (1, '/bin/true', 'launch', ?, 0.01)", (STARTED[0],))
+    # Already numeric values are left alone
+    conn.execute("INSERT INTO workspace_usage (workspace_id, started_at, ended_at, duration_seconds) VALUES (1, ?, ?, 60)",
+                 (ENDED[1], ENDED[1] + 60))
+    conn.close()
+
+    db = DatabaseManager(db_path)
+    db.initialize_db()
+    assert db.fetch_one("PRAGMA user_version")[0] == len(MIGRATIONS)
+    assert db.fetch_all("SELECT id, created_at, last_activated_at FROM workspaces ORDER BY id") == [
+        (1, CREATED[1], STARTED[1]), (2, CREATED[1], None)
+    ]
+    assert db.fetch_all("SELECT started_at, ended_at FROM workspace_usage ORDER BY started_at") == [
+        (STARTED[1], ENDED[1]), (ENDED[1], ENDED[1] + 60)
+    ]
+    assert db.fetch_one("SELECT recorded_at FROM launch_timings") == (STARTED[1],)
+    assert db.fetch_one("SELECT COUNT(*) FROM workspace_usage WHERE typeof(started_at) != 'integer'") == (0,)
+
+    # Rollups are rebuilt from the converted sessions, split at UTC midnight
+    days = db.fetch_all("SELECT bucket, sessions, seconds FROM usage_rollups WHERE period = 'day' ORDER BY bucket")
+    assert days == [("2024-03-30", 1, 1800), ("2024-03-31", 1, 1860)]
+    db.close()
+
+
+def test_migrated_database_lists_in_recent_order(db_path):
+    conn = legacy_db(db_path)
+    conn.execute("INSERT INTO workspaces (name, created_at, last_activated_at) VALUES ('a', ?, ?)", (CREATED[0], CREATED[0]))
+    conn.execute("INSERT INTO workspaces (name, created_at, last_activated_at) VALUES ('b', ?, ?)", (CREATED[0], STARTED[0]))
+    conn.execute("INSERT INTO workspaces (name, created_at) VALUES ('c', ?)", (CREATED[0],))
+    conn.close()
+
+    manager = WorkspaceManager(DatabaseManager(db_path))
+    assert [workspace["name"] for workspace in manager.iter_workspaces(sort="recent")] == ["b", "a", "c"]
+    manager.db.close()
+
+
+def test_migrations_run_once(db_path):
+    db = DatabaseManager(db_path)
+    db.initialize_db()
+    with db.transaction():
+        db.execute_query("INSERT INTO workspaces (name, created_at) VALUES ('kept', 1)")
+    db.initialize_db()
+    assert db.fetch_all("SELECT name, created_at FROM workspaces") == [("kept", 1)]
+    db.close()
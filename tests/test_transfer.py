@@ -0,0 +1,117 @@
+import io
+import json
+
+import pytest
+
+from src import maintenance
+from src.database_manager import DatabaseManager
+from src.transfer import read_records, write_records
+from src.utils import now_epoch
+from src.workspace_manager import WorkspaceManager
+
+DAY = 86400
+
+
+@pytest.fixture
+def populated(manager):
+    manager.create_workspace("proj", ["/bin/true", "/bin/echo", "./run.sh"])
+    manager.set_launch_order("proj", "/bin/echo", 1)
+    manager.set_dependency("proj", "./run.sh", "/bin/true")
+    manager.set_file_options("proj", "/bin/echo", args=["hello", "world"], cwd="/tmp", env={"A": "1"})
+    manager.set_policy("proj", nice=5)
+    manager.set_policy("proj", "/bin/true", rlimit_nofile=256)
+    manager.create_workspace("notes", ["/tmp/notes.txt"])
+    workspace_id = manager.db.fetch_one("SELECT id FROM workspaces WHERE name = 'proj'")[0]
+    now = now_epoch()
+    for started_at in (now - 3 * DAY, now - 2 * DAY - 600, now - DAY):
+        manager._close_session(workspace_id, started_at, started_at + 900)
+    return manager
+
+
+def export(manager, fmt="ndjson"):
+    out = io.StringIO()
+    write_records(manager.iter_export_records(include_usage=True), out, fmt)
+    return out.getvalue()
+
+
+def import_text(manager, text, on_conflict="skip"):
+    return manager.import_workspaces(read_records(io.StringIO(text)), on_conflict)
+
+
+def usage_state(manager):
+    return (
+        manager.db.fetch_all("SELECT name, total_usage_seconds FROM workspaces ORDER BY name"),
+        manager.db.fetch_all("SELECT workspace_id, started_at, ended_at FROM workspace_usage ORDER BY started_at"),
+        manager.db.fetch_all("SELECT workspace_id, period, bucket, sessions, seconds FROM usage_rollups ORDER BY 1, 2, 3"),
+    )
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json"])
+def test_round_trip_into_a_fresh_database(populated, tmp_path, fmt):
+    text = export(populated, fmt)
+    target = WorkspaceManager(DatabaseManager(str(tmp_path / f"copy-{fmt}.db")))
+    assert import_text(target, text) == {"created": 2, "updated": 0, "skipped": 0}
+    assert export(target, fmt) == text
+    assert usage_state(target)[0] == usage_state(populated)[0]
+    assert usage_state(target)[2] == usage_state(populated)[2]
+    target.db.close()
+
+
+def test_merge_of_own_export_changes_nothing(populated):
+    text = export(populated)
+    before = usage_state(populated)
+    assert import_text(populated, text, "merge") == {"created": 0, "updated": 2, "skipped": 0}
+    assert usage_state(populated) == before
+    assert export(populated) == text
+
+
+def test_merge_adds_only_missing_files_and_sessions(populated):
+    records = [json.loads(line) for line in export(populated).splitlines()]
+    proj = next(record for record in records if record["name"] == "proj")
+    proj["files"].append({"path": "/bin/ls", "depends_on": ["/bin/echo"]})
+    extra = dict(proj["usage"][0], started_at="2020-01-01T10:00:00Z", ended_at="2020-01-01T10:10:00Z",
+                 duration_seconds=600)
+    proj["usage"].append(extra)
+    totals_before = dict(usage_state(populated)[0])
+
+    text = "".join(json.dumps(record) + "\n" for record in records)
+    import_text(populated, text, "merge")
+
+    workspace = populated.get_workspace("proj")
+    assert [f.path for f in workspace.files].count("/bin/ls") == 1
+    assert len(workspace.files) == 4
+    assert populated.db.fetch_one("SELECT COUNT(*) FROM workspace_usage")[0] == 4
+    assert dict(usage_state(populated)[0])["proj"] == totals_before["proj"] + 600
+
+
+def test_merge_skips_sessions_maintenance_archived(populated):
+    text = export(populated)
+    before = usage_state(populated)
+    maintenance.run(populated.db, retention_days=1)
+    assert populated.db.fetch_one("SELECT SUM(sessions) FROM usage_archive")[0] >= 2
+
+    import_text(populated, text, "merge")
+    totals, _, rollups = usage_state(populated)
+    assert totals == before[0]
+    assert rollups == before[2]
+
+
+def test_upsert_replaces_files_and_usage(populated):
+    records = [json.loads(line) for line in export(populated).splitlines()]
+    proj = next(record for record in records if record["name"] == "proj")
+    proj["files"] = ["/bin/date"]
+    proj["usage"] = []
+    proj["total_usage_seconds"] = None
+    import_text(populated, json.dumps(proj), "upsert")
+
+    assert [f.path for f in populated.get_workspace("proj").files] == ["/bin/date"]
+    assert dict(usage_state(populated)[0])["proj"] == 0
+
+
+def test_malformed_record_imports_nothing(populated, tmp_path):
+    target = WorkspaceManager(DatabaseManager(str(tmp_path / "copy.db")))
+    text = export(populated) + json.dumps({"name": "broken", "files": [{"nope": 1}]}) + "\n"
+    with pytest.raises(ValueError):
+        import_text(target, text)
+    assert target.db.fetch_one("SELECT COUNT(*) FROM workspaces")[0] == 0
+    target.db.close()